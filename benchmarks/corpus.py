@@ -0,0 +1,182 @@
+import hashlib
+import json
+import subprocess
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterable, List
+
+from mutagen.flac import FLAC, Picture
+
+
+@dataclass(frozen=True)
+class TrackSpec:
+    """Parameters of one synthetic FLAC track."""
+
+    seconds: float
+    sample_rate: int
+    bits_per_sample: int
+    channels: int = 2
+    artwork: bool = True
+
+    @property
+    def name(self) -> str:
+        cover = "cover" if self.artwork else "nocover"
+        return (
+            f"{int(self.seconds)}s_{self.sample_rate // 1000}k_"
+            f"{self.bits_per_sample}bit_{self.channels}ch_{cover}"
+        )
+
+
+@dataclass(frozen=True)
+class CorpusSpec:
+    """A named set of tracks, each repeated ``copies`` times."""
+
+    name: str
+    tracks: tuple
+    copies: int = 1
+
+    def key(self) -> str:
+        payload = json.dumps(asdict(self), sort_keys=True).encode()
+        return hashlib.sha1(payload).hexdigest()[:10]
+
+
+CORPORA = {
+    # A typical CD-quality album.
+    "album": CorpusSpec(
+        "album",
+        tuple(TrackSpec(240, 44100, 16) for _ in range(12)),
+    ),
+    # Hi-res material, the worst case for memory use.
+    "hires": CorpusSpec(
+        "hires",
+        (TrackSpec(300, 96000, 24), TrackSpec(300, 192000, 24)),
+        copies=2,
+    ),
+    # Many short tracks, dominated by per-file overhead.
+    "short": CorpusSpec(
+        "short",
+        (TrackSpec(5, 44100, 16), TrackSpec(5, 44100, 16, artwork=False)),
+        copies=50,
+    ),
+    # A mix of durations and formats, used by the default run.
+    "mixed": CorpusSpec(
+        "mixed",
+        (
+            TrackSpec(30, 44100, 16),
+            TrackSpec(180, 44100, 16),
+            TrackSpec(60, 48000, 24, artwork=False),
+            TrackSpec(120, 96000, 24),
+            TrackSpec(600, 44100, 16),
+        ),
+        copies=2,
+    ),
+}
+
+
+def _generate_track(spec: TrackSpec, path: Path, cover: bytes) -> None:
+    """Render a track of pink noise mixed with a tone, which compresses realistically."""
+    sample_fmt = "s16" if spec.bits_per_sample == 16 else "s32"
+    subprocess.run(
+        [
+            "ffmpeg",
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-y",
+            "-f",
+            "lavfi",
+            "-i",
+            f"anoisesrc=color=pink:amplitude=0.2:sample_rate={spec.sample_rate}"
+            f":duration={spec.seconds}",
+            "-f",
+            "lavfi",
+            "-i",
+            f"sine=frequency=440:sample_rate={spec.sample_rate}:duration={spec.seconds}",
+            "-filter_complex",
+            f"amix=inputs=2,pan={'stereo|c0=c0|c1=c0' if spec.channels == 2 else 'mono|c0=c0'}",
+            "-sample_fmt",
+            sample_fmt,
+            "-bits_per_raw_sample",
+            str(spec.bits_per_sample),
+            "-codec:a",
+            "flac",
+            str(path),
+        ],
+        check=True,
+    )
+
+    flac = FLAC(path)
+    flac["title"] = spec.name
+    flac["artist"] = "Benchmark"
+    flac["album"] = "Synthetic"
+    if spec.artwork:
+        picture = Picture()
+        picture.type = 3
+        picture.mime = "image/jpeg"
+        picture.desc = "Cover"
+        picture.data = cover
+        flac.add_picture(picture)
+    flac.save()
+
+
+def _generate_cover(path: Path) -> bytes:
+    """Render a 1400x1400 noise JPEG, about the size of store artwork."""
+    subprocess.run(
+        [
+            "ffmpeg",
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-y",
+            "-f",
+            "lavfi",
+            "-i",
+            "cellauto=s=1400x1400",
+            "-frames:v",
+            "1",
+            "-q:v",
+            "3",
+            str(path),
+        ],
+        check=True,
+    )
+    return path.read_bytes()
+
+
+def build_corpus(spec: CorpusSpec, root: Path) -> Path:
+    """
+    Generate a corpus, or reuse it if it already exists.
+
+    Corpora are stored under ``root`` in a directory named after the spec and a
+    hash of its parameters, so changing a spec regenerates it.
+
+    Args:
+        spec (CorpusSpec): The corpus to build.
+        root (Path): Directory holding generated corpora.
+
+    Returns:
+        Path: Directory containing the FLAC files.
+    """
+    directory = root / f"{spec.name}-{spec.key()}"
+    marker = directory / ".complete"
+    if marker.exists():
+        return directory
+
+    directory.mkdir(parents=True, exist_ok=True)
+    cover = _generate_cover(directory / "cover.jpg")
+    for copy in range(spec.copies):
+        for index, track in enumerate(spec.tracks):
+            album = directory / f"album{copy:03d}"
+            album.mkdir(exist_ok=True)
+            _generate_track(track, album / f"{index:02d}_{track.name}.flac", cover)
+    (directory / "cover.jpg").unlink()
+    marker.write_text(json.dumps(asdict(spec)))
+    return directory
+
+
+def corpus_files(directory: Path) -> List[Path]:
+    return sorted(directory.rglob("*.flac"))
+
+
+def audio_seconds(files: Iterable[Path]) -> float:
+    return sum(FLAC(path).info.length for path in files)
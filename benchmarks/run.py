@@ -0,0 +1,294 @@
+"""
+Reproducible benchmarks for the conversion pipeline.
+
+Usage::
+
+    python -m benchmarks.run run [--corpus mixed] [--workers 1 4 8] [--backends ffmpeg pydub]
+    python -m benchmarks.run compare OLD.json NEW.json
+
+``run`` generates synthetic FLAC corpora with ffmpeg (cached under
+``benchmarks/corpus``), converts them with ``SingleFileConverter`` and with
+``AudioConverter.convert_directory`` for every worker count and backend, and
+stores the results in ``benchmarks/results`` named after the current commit.
+Every scenario runs in a fresh interpreter so peak RSS and CPU time are not
+polluted by earlier scenarios.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+BENCH_DIR = Path(__file__).resolve().parent
+CORPUS_DIR = BENCH_DIR / "corpus"
+RESULTS_DIR = BENCH_DIR / "results"
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", *args],
+            cwd=BENCH_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _environment() -> Dict[str, Any]:
+    ffmpeg = subprocess.run(
+        ["ffmpeg", "-version"], capture_output=True, text=True
+    ).stdout.splitlines()
+    return {
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "ffmpeg": ffmpeg[0] if ffmpeg else None,
+    }
+
+
+def _usage() -> Dict[str, float]:
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    scale = 1 if sys.platform == "darwin" else 1024
+    return {
+        "cpu_seconds": own.ru_utime
+        + own.ru_stime
+        + children.ru_utime
+        + children.ru_stime,
+        "peak_rss_bytes": own.ru_maxrss * scale,
+        "peak_child_rss_bytes": children.ru_maxrss * scale,
+    }
+
+
+def run_scenario(
+    mode: str, corpus: Path, backend: str, workers: int, preset: Optional[str]
+) -> Dict[str, Any]:
+    """
+    Convert a corpus once and measure it. Runs inside the scenario subprocess.
+
+    Args:
+        mode (str): ``single`` converts files one by one with
+            SingleFileConverter, ``directory`` uses convert_directory.
+        corpus (Path): Directory with the FLAC files.
+        backend (str): Transcode backend name.
+        workers (int): Worker count for directory mode.
+        preset (Optional[str]): Encoder preset name.
+
+    Returns:
+        Dict[str, Any]: Measurements of the run.
+    """
+    from benchmarks.corpus import audio_seconds, corpus_files
+    from src.core.converter import AudioConverter, SingleFileConverter
+    from src.core.encoders import get_encoder
+    from src.utils.enums import AudioFormat, ConversionBackend
+
+    files = corpus_files(corpus)
+    seconds_of_audio = audio_seconds(files)
+    output_format = get_encoder(preset).output_format if preset else AudioFormat.MP3
+    output_dir = Path(tempfile.mkdtemp(prefix="flac-bench-"))
+
+    before = _usage()
+    started = time.perf_counter()
+    try:
+        if mode == "single":
+            converter = SingleFileConverter(
+                output_format, True, ConversionBackend(backend), preset=preset
+            )
+            for index, path in enumerate(files):
+                converter.convert(
+                    path, output_dir / f"{index}.{converter.encoder.extension}"
+                )
+        else:
+            AudioConverter(
+                output_format,
+                num_threads=workers,
+                backend=ConversionBackend(backend),
+                preset=preset,
+            ).convert_directory(corpus, output_dir)
+        wall = time.perf_counter() - started
+        after = _usage()
+        output_bytes = sum(
+            p.stat().st_size for p in output_dir.rglob("*") if p.is_file()
+        )
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    cpu_seconds = after["cpu_seconds"] - before["cpu_seconds"]
+    return {
+        "files": len(files),
+        "audio_seconds": round(seconds_of_audio, 3),
+        "wall_seconds": round(wall, 3),
+        "files_per_second": round(len(files) / wall, 3),
+        "audio_seconds_per_second": round(seconds_of_audio / wall, 3),
+        "cpu_seconds": round(cpu_seconds, 3),
+        "cpu_utilization": round(cpu_seconds / wall / (os.cpu_count() or 1), 3),
+        "peak_rss_bytes": after["peak_rss_bytes"],
+        "peak_child_rss_bytes": after["peak_child_rss_bytes"],
+        "output_bytes": output_bytes,
+    }
+
+
+def _run_isolated(
+    mode: str, corpus: Path, backend: str, workers: int, preset: Optional[str]
+) -> Dict[str, Any]:
+    command = [
+        sys.executable,
+        "-m",
+        "benchmarks.run",
+        "scenario",
+        mode,
+        str(corpus),
+        "--backend",
+        backend,
+        "--workers",
+        str(workers),
+    ]
+    if preset:
+        command += ["--preset", preset]
+    completed = subprocess.run(
+        command,
+        cwd=BENCH_DIR.parent,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(completed.stdout.splitlines()[-1])
+
+
+def run(args: argparse.Namespace) -> Path:
+    """Run the benchmark matrix and store the results."""
+    from benchmarks.corpus import CORPORA, build_corpus
+
+    results: Dict[str, Any] = {"environment": _environment(), "scenarios": []}
+    for corpus_name in args.corpus:
+        corpus = build_corpus(CORPORA[corpus_name], CORPUS_DIR)
+        for backend in args.backends:
+            matrix = [("single", 1)] + [("directory", w) for w in args.workers]
+            for mode, workers in matrix:
+                for repeat in range(args.repeat):
+                    name = f"{corpus_name}/{backend}/{mode}/{workers}"
+                    print(f"{name} (run {repeat + 1}/{args.repeat})", file=sys.stderr)
+                    measurement = _run_isolated(
+                        mode, corpus, backend, workers, args.preset
+                    )
+                    results["scenarios"].append(
+                        {
+                            "name": name,
+                            "corpus": corpus_name,
+                            "backend": backend,
+                            "mode": mode,
+                            "workers": workers,
+                            "preset": args.preset,
+                            "repeat": repeat,
+                            **measurement,
+                        }
+                    )
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    commit = results["environment"]["commit"] or "unknown"
+    suffix = "-dirty" if results["environment"]["dirty"] else ""
+    path = (
+        args.output
+        or RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}-{commit}{suffix}.json"
+    )
+    path.write_text(json.dumps(results, indent=2))
+    print(path)
+    return path
+
+
+def _best(scenarios: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Keep the fastest repeat of every scenario."""
+    best: Dict[str, Dict[str, Any]] = {}
+    for scenario in scenarios:
+        current = best.get(scenario["name"])
+        if current is None or scenario["wall_seconds"] < current["wall_seconds"]:
+            best[scenario["name"]] = scenario
+    return best
+
+
+def compare(args: argparse.Namespace) -> None:
+    """Print the change in throughput, RSS and CPU between two result files."""
+    old = _best(json.loads(args.old.read_text())["scenarios"])
+    new = _best(json.loads(args.new.read_text())["scenarios"])
+
+    header = f"{'scenario':40} {'audio s/s':>22} {'peak RSS MiB':>22} {'CPU util':>16}"
+    print(header)
+    print("-" * len(header))
+    for name in sorted(old.keys() & new.keys()):
+        a, b = old[name], new[name]
+        rss_a = max(a["peak_rss_bytes"], a["peak_child_rss_bytes"]) / 2**20
+        rss_b = max(b["peak_rss_bytes"], b["peak_child_rss_bytes"]) / 2**20
+        speedup = b["audio_seconds_per_second"] / a["audio_seconds_per_second"]
+        print(
+            f"{name:40} "
+            f"{a['audio_seconds_per_second']:8.1f} -> {b['audio_seconds_per_second']:8.1f} "
+            f"{speedup:4.2f}x "
+            f"{rss_a:8.1f} -> {rss_b:8.1f}   "
+            f"{a['cpu_utilization']:5.2f} -> {b['cpu_utilization']:5.2f}"
+        )
+    for name in sorted(old.keys() ^ new.keys()):
+        print(f"{name:40} only in {'old' if name in old else 'new'} results")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from benchmarks.corpus import CORPORA
+
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmark matrix")
+    run_parser.add_argument(
+        "--corpus", nargs="+", choices=sorted(CORPORA), default=["mixed"]
+    )
+    run_parser.add_argument(
+        "--workers", nargs="+", type=int, default=[1, os.cpu_count() or 1]
+    )
+    run_parser.add_argument(
+        "--backends",
+        nargs="+",
+        choices=["ffmpeg", "pydub"],
+        default=["ffmpeg", "pydub"],
+    )
+    run_parser.add_argument("--preset", help="encoder preset (default: mp3 default)")
+    run_parser.add_argument("--repeat", type=int, default=1)
+    run_parser.add_argument("--output", type=Path, help="result file path")
+
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("old", type=Path)
+    compare_parser.add_argument("new", type=Path)
+
+    scenario_parser = commands.add_parser("scenario", help=argparse.SUPPRESS)
+    scenario_parser.add_argument("mode", choices=["single", "directory"])
+    scenario_parser.add_argument("corpus", type=Path)
+    scenario_parser.add_argument("--backend", default="ffmpeg")
+    scenario_parser.add_argument("--workers", type=int, default=1)
+    scenario_parser.add_argument("--preset")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        run(args)
+    elif args.command == "compare":
+        compare(args)
+    else:
+        result = run_scenario(
+            args.mode, args.corpus, args.backend, args.workers, args.preset
+        )
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
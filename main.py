@@ -1,6 +1,3 @@
-import tkinter as tk
-
-from src.gui.app import ConverterApp
 from src.utils.logging_config import get_logger
 from src.utils.startup import check_ffmpeg
 
@@ -8,6 +5,11 @@ logger = get_logger(__name__)
 
 
 def main():
+    # Imported here so the ffmpeg check fails before Tk is loaded.
+    import tkinter as tk
+
+    from src.gui.app import ConverterApp
+
     root = tk.Tk()
     app = ConverterApp(root)
     logger.info("Application started")
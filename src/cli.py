@@ -0,0 +1,490 @@
+"""
+Headless batch entry point.
+
+Usage::
+
+    python -m src.cli INPUT_DIR [-o OUTPUT_DIR] [options]
+    python -m src.cli INPUT_DIR [-o OUTPUT_DIR] --coordinator SPOOL [options]
+    python -m src.cli --worker SPOOL [-j JOBS] [--encoders N] [--memory-budget SIZE]
+    python -m src.cli INPUT_DIR [-o OUTPUT_DIR] --watch [options]
+
+Progress is written to stdout as newline-delimited JSON, one object per event,
+so the converter can run under cron or a job queue. Besides one event per file,
+an aggregated ``progress`` event with throughput, ETA and worker state is
+written at most once per ``--progress-interval``. Logs go to stderr.
+"""
+
+import argparse
+import importlib.util
+import json
+import signal
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from threading import Event
+from typing import Any, Dict, Iterator, List, Optional
+
+from src.core.artwork import ArtworkOptions
+from src.core.chunking import ChunkingOptions
+from src.core.converter import AudioConverter, SingleFileConverter
+from src.core.distributed import run_worker, wait_for_run
+from src.core.downconvert import RESAMPLERS, DownconvertOptions
+from src.core.encoders import available_encoders, get_encoder, parse_target
+from src.core.memory import parse_size
+from src.core.progress import ProgressTracker
+from src.core.results import ConversionResult, ConversionStatus
+from src.core.spool import DEFAULT_LEASE_SECONDS
+from src.core.watcher import DEFAULT_SETTLE_SECONDS
+from src.utils.enums import AudioFormat, ConversionBackend, JobOrder
+from src.utils.logging_config import configure_logging, get_logger
+from src.utils.profiling import CpuProfiler, RunProfile
+from src.utils.startup import check_ffmpeg
+
+logger = get_logger(__name__)
+
+EXIT_OK = 0
+EXIT_FAILURES = 1
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Create the command line parser."""
+    parser = argparse.ArgumentParser(
+        prog="python -m src.cli",
+        description="Convert a FLAC library to Apple Music compatible formats.",
+    )
+    parser.add_argument(
+        "input_dir",
+        type=Path,
+        nargs="?",
+        help="directory containing FLAC files (not used with --worker)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output-dir",
+        type=Path,
+        help="output directory (default: next to the source files)",
+    )
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=[fmt.value for fmt in AudioFormat],
+        default=AudioFormat.MP3.value,
+        help="output format (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-p",
+        "--preset",
+        choices=available_encoders(),
+        help="encoder preset (default: the format's default preset)",
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, help="parallel jobs (default: CPU count)"
+    )
+    parser.add_argument(
+        "--encoders", type=int, help="concurrent encoder processes (default: --jobs)"
+    )
+    parser.add_argument(
+        "--backend",
+        choices=[backend.value for backend in ConversionBackend],
+        default=ConversionBackend.FFMPEG.value,
+        help="transcode backend (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--no-cover", action="store_true", help="do not embed cover art"
+    )
+    parser.add_argument(
+        "--cover-max-size", type=int, metavar="PIXELS", help="downscale larger covers"
+    )
+    parser.add_argument(
+        "--cover-max-bytes", type=int, metavar="BYTES", help="recompress larger covers"
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="glob pattern of files or directories to skip (repeatable)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="skip unchanged files and remove outputs of deleted sources",
+    )
+    parser.add_argument(
+        "--order",
+        choices=[order.value for order in JobOrder],
+        default=JobOrder.SCAN.value,
+        help="job order: scan order, which starts converting while the library "
+        "is still being scanned, or biggest estimated cost, longest duration "
+        "or biggest album first after a full scan (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--split-long",
+        type=float,
+        metavar="SECONDS",
+        help="encode files at least this long as parallel segments",
+    )
+    parser.add_argument(
+        "--segment-seconds",
+        type=float,
+        default=300.0,
+        metavar="SECONDS",
+        help="segment length for --split-long (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--also",
+        dest="targets",
+        type=parse_target,
+        action="append",
+        default=[],
+        metavar="PRESET=DIR",
+        help="also encode every file with PRESET into a mirror tree under DIR, "
+        "from the same decode (repeatable)",
+    )
+    parser.add_argument(
+        "--probe-cache",
+        action="store_true",
+        help="cache source tags and cover keys so later runs skip parsing them",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=parse_size,
+        metavar="SIZE",
+        help="admit jobs only while their estimated memory fits SIZE (e.g. 1.5G); "
+        "files too big for pydub are streamed through ffmpeg",
+    )
+    parser.add_argument(
+        "--dedupe",
+        action="store_true",
+        help="encode identical audio (same FLAC MD5) once and link or copy it",
+    )
+    parser.add_argument(
+        "--split-cue",
+        action="store_true",
+        help="split album images with a cue sheet into a directory of tracks",
+    )
+    parser.add_argument(
+        "--loudness",
+        action="store_true",
+        help="measure EBU R128 loudness while converting and write Sound Check "
+        "and ReplayGain track and album tags",
+    )
+    parser.add_argument(
+        "--downconvert",
+        action="store_true",
+        help="resample hi-res sources to 44.1 or 48 kHz and dither them to "
+        "16 bits before encoding",
+    )
+    parser.add_argument(
+        "--target-rate",
+        type=int,
+        metavar="HZ",
+        help="highest sample rate passed to the encoders; implies --downconvert "
+        "(default: 44100 or 48000, whichever divides the source rate)",
+    )
+    parser.add_argument(
+        "--target-bits",
+        type=int,
+        choices=[16, 24],
+        help="bit depth passed to the encoders; 24 keeps the resampler's "
+        "precision, as for Mastered for iTunes; implies --downconvert "
+        "(default: 16)",
+    )
+    parser.add_argument(
+        "--resampler",
+        choices=RESAMPLERS,
+        default=RESAMPLERS[0],
+        help="ffmpeg resampler for --downconvert (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--no-resume",
+        dest="resume",
+        action="store_false",
+        help="start over instead of resuming an interrupted run",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="list what would be converted without writing anything",
+    )
+    parser.add_argument(
+        "--fsync", action="store_true", help="flush every output file to disk"
+    )
+    parser.add_argument(
+        "--stats-json",
+        type=Path,
+        metavar="PATH",
+        help="write per-stage timings and throughput of the run as JSON",
+    )
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        metavar="PATH",
+        help="write a cProfile dump of the run (open with pstats or snakeviz)",
+    )
+    parser.add_argument(
+        "--progress-interval",
+        type=float,
+        default=1.0,
+        metavar="SECONDS",
+        help="minimum time between aggregated progress events (default: %(default)s)",
+    )
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--coordinator",
+        type=Path,
+        metavar="SPOOL",
+        help="queue the jobs in the shared directory SPOOL for --worker "
+        "processes and collect their results",
+    )
+    mode.add_argument(
+        "--worker",
+        type=Path,
+        metavar="SPOOL",
+        help="convert jobs queued in SPOOL by a coordinator until its run ends; "
+        "conversion settings come from the coordinator",
+    )
+    mode.add_argument(
+        "--watch",
+        action="store_true",
+        help="keep running and convert FLAC files as they are added or changed, "
+        "until interrupted; implies --incremental",
+    )
+    parser.add_argument(
+        "--lease",
+        type=float,
+        default=DEFAULT_LEASE_SECONDS,
+        metavar="SECONDS",
+        help="time after which jobs of an unresponsive worker are reassigned "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--settle",
+        type=float,
+        default=DEFAULT_SETTLE_SECONDS,
+        metavar="SECONDS",
+        help="with --watch, time a file must be unchanged before it is "
+        "converted (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--poll",
+        type=float,
+        metavar="SECONDS",
+        help="with --watch, poll the directory at this interval instead of "
+        "using inotify (for network filesystems)",
+    )
+    parser.add_argument(
+        "--log-level",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="minimum level written to the log file (default: DEBUG)",
+    )
+    parser.add_argument(
+        "--log-file", metavar="PATH", help="log file path (default: app.log)"
+    )
+    parser.add_argument(
+        "--log-json",
+        action="store_true",
+        default=None,
+        help="write the log file as JSON lines",
+    )
+    return parser
+
+
+def emit(event: str, **fields: Any) -> None:
+    """Write one NDJSON event to stdout."""
+    record: Dict[str, Any] = {"event": event, "time": round(time.time(), 3)}
+    record.update(fields)
+    sys.stdout.write(json.dumps(record) + "\n")
+    sys.stdout.flush()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Run a batch conversion from the command line.
+
+    Args:
+        argv (Optional[List[str]]): Arguments, defaults to ``sys.argv[1:]``.
+
+    Returns:
+        int: Process exit code, non-zero if any file failed.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.log_level or args.log_file or args.log_json:
+        configure_logging(
+            level=args.log_level, log_file=args.log_file, json_format=args.log_json
+        )
+
+    if args.worker:
+        return run_worker_command(args)
+
+    output_format = AudioFormat(args.format)
+    if args.preset and get_encoder(args.preset).output_format != output_format:
+        parser.error(f"preset {args.preset} does not produce {output_format.value}")
+    if args.input_dir is None or not args.input_dir.is_dir():
+        parser.error(f"input directory {args.input_dir} does not exist")
+    if args.coordinator and (args.probe_cache or args.dedupe):
+        # Both are SQLite databases, which do not work on shared storage.
+        parser.error("--probe-cache and --dedupe cannot be used with --coordinator")
+    if args.loudness and importlib.util.find_spec("numpy") is None:
+        parser.error("--loudness needs NumPy (pip install numpy)")
+    cover_options = args.cover_max_size or args.cover_max_bytes
+    if cover_options and importlib.util.find_spec("PIL") is None:
+        parser.error(
+            "--cover-max-size and --cover-max-bytes need Pillow (pip install Pillow)"
+        )
+
+    converter = AudioConverter(
+        output_format,
+        num_threads=args.jobs,
+        include_cover=not args.no_cover,
+        backend=ConversionBackend(args.backend),
+        max_encoders=args.encoders,
+        incremental=args.incremental or args.watch,
+        exclude=args.exclude,
+        artwork_options=ArtworkOptions(args.cover_max_size, args.cover_max_bytes),
+        preset=args.preset,
+        sync_output=args.fsync,
+        resumable=args.resume,
+        order=JobOrder(args.order),
+        chunking=(
+            ChunkingOptions(args.split_long, args.segment_seconds)
+            if args.split_long
+            else None
+        ),
+        split_cue=args.split_cue,
+        extra_targets=args.targets,
+        probe_cache=args.probe_cache,
+        deduplicate=args.dedupe,
+        memory_budget=args.memory_budget,
+        loudness=args.loudness,
+        downconvert=(
+            DownconvertOptions(args.target_rate, args.target_bits or 16, args.resampler)
+            if args.downconvert or args.target_rate or args.target_bits
+            else None
+        ),
+    )
+    if not args.dry_run:
+        check_ffmpeg(*converter.ffmpeg_requirements())
+    profile = RunProfile()
+    tracker = ProgressTracker(interval=args.progress_interval)
+    profiler = CpuProfiler() if args.profile else None
+
+    counts = {status.value: 0 for status in ConversionStatus}
+    progress = {"done": 0, "found": 0}
+
+    def on_progress(current: int, total: int) -> None:
+        progress.update(done=current, found=total)
+
+    def on_result(result: ConversionResult) -> None:
+        counts[result.status.value] += 1
+        emit("file", **progress, **result.to_dict())
+        snapshot = tracker.tick()
+        if snapshot:
+            emit("progress", **snapshot.to_dict())
+
+    emit(
+        "start",
+        input_dir=str(args.input_dir),
+        output_dir=str(args.output_dir) if args.output_dir else None,
+        preset=converter.encoder.name,
+        dry_run=args.dry_run,
+    )
+    with profiler or nullcontext():
+        if args.watch and not args.dry_run:
+            stop = Event()
+            with _stop_on_signals(stop):
+                converter.watch_directory(
+                    args.input_dir,
+                    args.output_dir,
+                    result_callback=on_result,
+                    stop=stop,
+                    settle_seconds=args.settle,
+                    poll_interval=args.poll,
+                )
+        elif args.coordinator and not args.dry_run:
+            converter.convert_directory_distributed(
+                args.input_dir,
+                args.coordinator,
+                args.output_dir,
+                progress_callback=on_progress,
+                result_callback=on_result,
+                profile=profile,
+                progress=tracker,
+                lease_seconds=args.lease,
+            )
+        else:
+            converter.convert_directory(
+                args.input_dir,
+                args.output_dir,
+                progress_callback=on_progress,
+                result_callback=on_result,
+                dry_run=args.dry_run,
+                profile=profile,
+                profiler=profiler,
+                progress=tracker,
+            )
+    if profiler:
+        profiler.dump(args.profile)
+    if args.stats_json:
+        profile.write_json(args.stats_json)
+
+    emit(
+        "summary",
+        seconds=round(profile.wall_seconds, 3),
+        total=sum(counts.values()),
+        **counts,
+        stats=profile.summary(),
+    )
+    return EXIT_FAILURES if counts[ConversionStatus.FAILED.value] else EXIT_OK
+
+
+@contextmanager
+def _stop_on_signals(stop: Event) -> Iterator[None]:
+    """Set ``stop`` on SIGINT and SIGTERM instead of interrupting the run."""
+    handlers = {
+        signum: signal.signal(signum, lambda *_: stop.set())
+        for signum in (signal.SIGINT, signal.SIGTERM)
+    }
+    try:
+        yield
+    finally:
+        for signum, handler in handlers.items():
+            signal.signal(signum, handler)
+
+
+def run_worker_command(args: argparse.Namespace) -> int:
+    """Run as a worker of a coordinator's job spool."""
+    # Check this host's ffmpeg against the coordinator's settings before any
+    # job is claimed, so a host that cannot run them does not fail them all.
+    spool = wait_for_run(args.worker)
+    converter = SingleFileConverter.from_config(spool.converter_config)
+    check_ffmpeg(*converter.ffmpeg_requirements())
+    counts = {status.value: 0 for status in ConversionStatus}
+
+    def on_result(result: ConversionResult) -> None:
+        counts[result.status.value] += 1
+        emit("file", **result.to_dict())
+
+    started = time.perf_counter()
+    emit("start", spool=str(args.worker))
+    run_worker(
+        args.worker,
+        max_workers=args.jobs,
+        max_encoders=args.encoders,
+        memory_budget=args.memory_budget,
+        result_callback=on_result,
+    )
+    emit(
+        "summary",
+        seconds=round(time.perf_counter() - started, 3),
+        total=sum(counts.values()),
+        **counts,
+    )
+    return EXIT_FAILURES if counts[ConversionStatus.FAILED.value] else EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
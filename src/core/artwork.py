@@ -0,0 +1,220 @@
+import hashlib
+import io
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+from src.utils.exceptions import ConversionError
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+# JPEG qualities tried, in order, when recompressing to fit a size limit.
+_JPEG_QUALITIES = (90, 80, 70, 60, 50)
+_MIN_DIMENSION = 300
+
+
+@dataclass(frozen=True)
+class ArtworkOptions:
+    """
+    Limits applied to embedded cover art.
+
+    Attributes:
+        max_dimension (Optional[int]): Longest side in pixels; larger images
+            are downscaled.
+        max_bytes (Optional[int]): Size limit; larger images are recompressed
+            as JPEG.
+    """
+
+    max_dimension: Optional[int] = None
+    max_bytes: Optional[int] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_dimension is not None or self.max_bytes is not None
+
+    def key(self) -> str:
+        return f"{self.max_dimension or 0}x{self.max_bytes or 0}"
+
+
+@dataclass(frozen=True)
+class Artwork:
+    """Image bytes ready to be embedded in an output file."""
+
+    data: bytes
+    mime: str
+
+
+def artwork_key(data: bytes) -> str:
+    """Return the content key ``ArtworkCache`` stores an image under."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class ArtworkCache:
+    """
+    A content-hash keyed LRU cache of processed cover art.
+
+    Tracks of an album usually embed the same picture, so the image is
+    processed once and the same bytes object is shared by every track. The
+    cache is bounded by the total size of the stored images. It is safe to use
+    from several threads.
+    """
+
+    def __init__(
+        self,
+        options: Optional[ArtworkOptions] = None,
+        max_bytes: int = DEFAULT_CACHE_BYTES,
+    ):
+        self.options = options or ArtworkOptions()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Artwork]" = OrderedDict()
+        self._size = 0
+        self._lock = Lock()
+
+    def get(self, data: bytes, mime: str) -> Artwork:
+        """
+        Return the processed version of an image, processing it on first use.
+
+        Args:
+            data (bytes): Original image bytes.
+            mime (str): Original MIME type.
+
+        Returns:
+            Artwork: The image to embed.
+        """
+        key = artwork_key(data)
+        with self._lock:
+            artwork = self._entries.get(key)
+            if artwork is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return artwork
+            self.misses += 1
+
+        artwork = process_artwork(data, mime, self.options)
+
+        with self._lock:
+            if key not in self._entries and len(artwork.data) <= self.max_bytes:
+                self._entries[key] = artwork
+                self._size += len(artwork.data)
+                while self._size > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._size -= len(evicted.data)
+        return artwork
+
+    def lookup(self, key: str) -> Optional[Artwork]:
+        """
+        Return the processed image stored under a content key, if cached.
+
+        Args:
+            key (str): Content key of the original image, from ``artwork_key``.
+
+        Returns:
+            Optional[Artwork]: The image to embed, or None if not cached.
+        """
+        with self._lock:
+            artwork = self._entries.get(key)
+            if artwork is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return artwork
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def process_artwork(data: bytes, mime: str, options: ArtworkOptions) -> Artwork:
+    """
+    Downscale and recompress an image to fit the given limits.
+
+    Images already within the limits are returned unchanged. Resizing needs
+    Pillow, which is an optional dependency.
+
+    Args:
+        data (bytes): Original image bytes.
+        mime (str): Original MIME type.
+        options (ArtworkOptions): Limits to apply.
+
+    Returns:
+        Artwork: The processed image.
+
+    Raises:
+        ConversionError: If Pillow is missing or the image cannot be decoded.
+    """
+    if not options.enabled:
+        return Artwork(data, mime)
+
+    try:
+        from PIL import Image
+    except ImportError:
+        raise ConversionError("Pillow is required to resize or recompress cover art")
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except Exception as e:
+        raise ConversionError(f"Failed to decode cover art: {str(e)}")
+
+    too_large = options.max_dimension and max(image.size) > options.max_dimension
+    too_heavy = options.max_bytes and len(data) > options.max_bytes
+    if not too_large and not too_heavy:
+        return Artwork(data, mime)
+
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    if too_large:
+        image.thumbnail((options.max_dimension, options.max_dimension), Image.LANCZOS)
+
+    while True:
+        for quality in _JPEG_QUALITIES:
+            encoded = _encode_jpeg(image, quality)
+            if not options.max_bytes or len(encoded) <= options.max_bytes:
+                return Artwork(encoded, "image/jpeg")
+        if max(image.size) <= _MIN_DIMENSION:
+            logger.warning(
+                f"Cover art still {len(encoded)} bytes at {image.size}, "
+                f"above the {options.max_bytes} byte limit"
+            )
+            return Artwork(encoded, "image/jpeg")
+        width, height = image.size
+        image = image.resize(
+            (max(1, width * 3 // 4), max(1, height * 3 // 4)), Image.LANCZOS
+        )
+
+
+def _encode_jpeg(image, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+# One cache per process and option set, so conversions running in the same
+# worker process share processed covers.
+_caches: Dict[Tuple[ArtworkOptions, int], ArtworkCache] = {}
+_caches_lock = Lock()
+
+
+def get_artwork_cache(
+    options: Optional[ArtworkOptions] = None, max_bytes: int = DEFAULT_CACHE_BYTES
+) -> ArtworkCache:
+    """
+    Return the shared artwork cache for this process and option set.
+
+    Args:
+        options (Optional[ArtworkOptions]): Limits applied to cached images.
+        max_bytes (int): Byte budget of the cache.
+
+    Returns:
+        ArtworkCache: The shared cache.
+    """
+    key = (options or ArtworkOptions(), max_bytes)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = ArtworkCache(key[0], max_bytes)
+        return cache
@@ -0,0 +1,394 @@
+import asyncio
+import contextvars
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from functools import partial
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from src.core.atomic import atomic_outputs
+from src.core.backends import (
+    PCM_CHUNK_BYTES,
+    FFmpegBackend,
+    ProcessGroup,
+    current_processes,
+)
+from src.core.loudness import Loudness, PcmAnalyzer, measure_transcode
+from src.core.memory import MemoryGovernor
+from src.core.progress import WAITING, ProgressTracker
+from src.core.results import ConversionResult, ConversionStatus
+from src.core.scheduler import default_worker_count
+from src.utils.exceptions import ConversionError
+from src.utils.logging_config import get_logger
+from src.utils.profiling import ENCODE, METADATA, StageTimings
+
+logger = get_logger(__name__)
+
+
+class _Cancelled(Exception):
+    """Raised inside a job when the run is cancelled while it is in flight."""
+
+
+class AsyncConversionEngine:
+    """
+    Run conversions on an asyncio event loop.
+
+    Jobs are pulled from a plain iterator on a background thread and passed to
+    the encoder workers through a bounded ``asyncio.Queue``, so a slow encoder
+    stalls the scan instead of letting pending jobs pile up in memory. The
+    ffmpeg backend is driven with ``asyncio.create_subprocess_exec``; other
+    backends, segmented and split encodes and tag writing run in an executor.
+
+    ``pause``, ``resume`` and ``cancel`` may be called from any thread.
+    Pausing stops new jobs from starting and, where the platform supports it,
+    suspends in-flight encoders. Cancelling kills in-flight encoders right away;
+    since outputs are written under a temporary name, nothing partial is left.
+    Both reach the ffmpeg processes that executor jobs start through
+    ``FFmpegBackend.run``, but not the ones pydub starts internally.
+    """
+
+    def __init__(
+        self,
+        max_encoders: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        metadata_processes: Optional[int] = None,
+    ):
+        """
+        Args:
+            max_encoders (Optional[int]): Number of jobs running at once.
+                Defaults to ``os.cpu_count()``.
+            queue_size (Optional[int]): Number of jobs buffered ahead of the
+                workers. Defaults to four per encoder.
+            metadata_processes (Optional[int]): Size of the process pool used
+                for transcodes of in-process backends such as pydub. Defaults
+                to ``0``, which uses the event loop's default thread pool, as
+                tag writing always does.
+        """
+        self.max_encoders = max_encoders or default_worker_count()
+        self.queue_size = queue_size or self.max_encoders * 4
+        self.metadata_processes = metadata_processes or 0
+        self.cancelled = False
+        self.paused = False
+
+        self._stopped = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._resumed: Optional[asyncio.Event] = None
+        self._processes = ProcessGroup()
+        self._executor: Optional[Executor] = None
+        self._progress: Optional[ProgressTracker] = None
+        self._memory: Optional[MemoryGovernor] = None
+        self._memory_freed: Optional[asyncio.Event] = None
+
+    async def run(
+        self,
+        converter,
+        jobs: Iterable[Tuple[Path, Path]],
+        on_result: Callable[[ConversionResult], None],
+        progress: Optional[ProgressTracker] = None,
+        memory: Optional[MemoryGovernor] = None,
+    ) -> None:
+        """
+        Convert every (source, output) pair produced by ``jobs``.
+
+        Args:
+            converter (SingleFileConverter): Converter configured for the jobs.
+            jobs (Iterable[Tuple[Path, Path]]): Source and output paths. Iterated
+                lazily on a background thread.
+            on_result (Callable[[ConversionResult], None]): Called on the event
+                loop with the outcome of every job that was started.
+            progress (Optional[ProgressTracker]): Receives the stage each
+                worker is in.
+            memory (Optional[MemoryGovernor]): Holds jobs back until their
+                estimated memory fits its budget.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._processes = ProcessGroup()
+        if self.paused:
+            self._processes.pause()
+        processes_token = current_processes.set(self._processes)
+        self._progress = progress
+        self._memory = memory
+        self._memory_freed = asyncio.Event()
+        self._stopped = False
+        self._resumed = asyncio.Event()
+        if not self.paused:
+            self._resumed.set()
+        if self.metadata_processes > 0:
+            self._executor = ProcessPoolExecutor(max_workers=self.metadata_processes)
+
+        queue: "asyncio.Queue[Optional[Tuple[Path, Path]]]" = asyncio.Queue(
+            maxsize=self.queue_size
+        )
+        workers = [
+            asyncio.create_task(
+                self._work(f"encoder-{index}", converter, queue, on_result)
+            )
+            for index in range(self.max_encoders)
+        ]
+        try:
+            await self._loop.run_in_executor(None, self._produce, jobs, queue)
+            await asyncio.gather(*workers)
+        finally:
+            self._stopped = True
+            for worker in workers:
+                worker.cancel()
+            self._processes.kill()
+            current_processes.reset(processes_token)
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+    def pause(self) -> None:
+        """Stop starting new jobs and suspend running encoders."""
+        self.paused = True
+        self._call_soon(self._pause)
+
+    def resume(self) -> None:
+        """Resume a paused run."""
+        self.paused = False
+        self._call_soon(self._resume)
+
+    def cancel(self) -> None:
+        """Cancel the run, killing in-flight encoders."""
+        self.cancelled = True
+        self._call_soon(self._cancel)
+
+    def _call_soon(self, callback: Callable[[], None]) -> None:
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(callback)
+
+    def _pause(self) -> None:
+        self._resumed.clear()
+        self._processes.pause()
+
+    def _resume(self) -> None:
+        self._processes.resume()
+        self._resumed.set()
+
+    def _cancel(self) -> None:
+        self._processes.kill()
+        # Let paused workers wake up and drain the queue.
+        self._resumed.set()
+
+    def _produce(
+        self,
+        jobs: Iterable[Tuple[Path, Path]],
+        queue: "asyncio.Queue[Optional[Tuple[Path, Path]]]",
+    ) -> None:
+        """Feed jobs into the queue from a background thread."""
+
+        def put(item: Optional[Tuple[Path, Path]]) -> bool:
+            future = asyncio.run_coroutine_threadsafe(queue.put(item), self._loop)
+            while True:
+                try:
+                    future.result(timeout=0.1)
+                    return True
+                except FutureTimeoutError:
+                    # The workers are gone if the run itself was cancelled.
+                    if self._stopped:
+                        future.cancel()
+                        return False
+
+        try:
+            for job in jobs:
+                if self.cancelled or not put(job):
+                    break
+        finally:
+            for _ in range(self.max_encoders):
+                if not put(None):
+                    break
+
+    async def _work(
+        self,
+        worker: str,
+        converter,
+        queue: "asyncio.Queue[Optional[Tuple[Path, Path]]]",
+        on_result: Callable[[ConversionResult], None],
+    ) -> None:
+        while True:
+            job = await queue.get()
+            if job is None:
+                return
+            await self._resumed.wait()
+            if self.cancelled:
+                continue
+
+            input_path, output_path = job
+            started = time.perf_counter()
+            if self._progress:
+                self._progress.worker_started(
+                    worker, input_path, WAITING if self._memory else ENCODE
+                )
+            reserved = 0
+            try:
+                if self._memory:
+                    reserved = await self._reserve_memory(converter, input_path)
+                    if self._progress:
+                        self._progress.worker_stage(worker, ENCODE)
+                outputs = [output_path, *converter.extra_outputs(output_path)]
+                with atomic_outputs(outputs, sync=converter.sync_output) as partials:
+                    timings, loudness = await self._convert(
+                        worker, converter, input_path, partials
+                    )
+                result = ConversionResult(
+                    input_path,
+                    output_path,
+                    ConversionStatus.CONVERTED,
+                    seconds=time.perf_counter() - started,
+                    timings=timings,
+                    loudness=loudness,
+                )
+                logger.info(
+                    f"Converted {input_path} to {output_path} ({timings.describe()})"
+                )
+            except _Cancelled:
+                result = ConversionResult(
+                    input_path, output_path, ConversionStatus.CANCELLED
+                )
+            except Exception as e:
+                logger.error(f"Error converting {input_path}: {str(e)}")
+                result = ConversionResult(
+                    input_path,
+                    output_path,
+                    ConversionStatus.FAILED,
+                    seconds=time.perf_counter() - started,
+                    error=f"Failed to convert {input_path}: {str(e)}",
+                )
+            finally:
+                self._release_memory(reserved)
+            if self._progress:
+                self._progress.worker_finished(worker)
+            on_result(result)
+
+    async def _reserve_memory(self, converter, input_path: Path) -> int:
+        """Wait until the job's estimated memory fits the budget."""
+        cost = converter.memory_estimate(input_path)
+        # Reservations are taken and returned on the loop thread only, so
+        # clearing the event after a failed attempt cannot miss a release.
+        while not self._memory.try_acquire(cost):
+            self._memory_freed.clear()
+            await self._memory_freed.wait()
+        return cost
+
+    def _release_memory(self, cost: int) -> None:
+        if cost:
+            self._memory.release(cost)
+            self._memory_freed.set()
+
+    async def _convert(
+        self, worker: str, converter, input_path: Path, outputs: List[Path]
+    ) -> Tuple[StageTimings, Optional[List[Loudness]]]:
+        analyzer = converter.loudness_analyzer(input_path)
+        if converter.uses_custom_transcode(input_path, outputs):
+            # Segmented encodes and album splits manage their own processes.
+            timings, analyzer = await self._transcode(
+                None, converter, input_path, outputs, analyzer
+            )
+        elif isinstance(converter.backend, FFmpegBackend):
+            timings = StageTimings()
+            timings.add_bytes("input", input_path.stat().st_size)
+            encoders = converter.encoders_for(input_path)
+            command = converter.backend.build_command(
+                input_path,
+                outputs[0],
+                encoders[0],
+                list(zip(outputs[1:], encoders[1:])),
+                pcm=analyzer is not None,
+            )
+            with timings.stage(ENCODE):
+                await self._run_process(command, analyzer)
+        else:
+            timings, analyzer = await self._transcode(
+                self._executor, converter, input_path, outputs, analyzer
+            )
+
+        if self.cancelled:
+            raise _Cancelled()
+        write_metadata = converter.write_metadata
+        if timings.linked:
+            write_metadata = partial(write_metadata, linked=True)
+        loudness = None
+        if analyzer is not None:
+            loudness = analyzer.results()
+            write_metadata = partial(write_metadata, loudness=loudness)
+        if self._progress:
+            self._progress.worker_stage(worker, METADATA)
+        timings.merge(
+            await self._loop.run_in_executor(None, write_metadata, input_path, *outputs)
+        )
+        return timings, loudness
+
+    async def _transcode(
+        self,
+        executor: Optional[Executor],
+        converter,
+        input_path: Path,
+        outputs: List[Path],
+        analyzer: Optional[PcmAnalyzer],
+    ) -> Tuple[StageTimings, Optional[PcmAnalyzer]]:
+        """Run ``converter.transcode`` in an executor; see ``measure_transcode``."""
+        if analyzer is None:
+            function = partial(converter.transcode, input_path, *outputs)
+        else:
+            function = partial(
+                measure_transcode, converter, input_path, outputs, analyzer
+            )
+        if executor is None:
+            # The thread's ffmpeg processes join this run's process group.
+            function = partial(contextvars.copy_context().run, function)
+        try:
+            result = await self._loop.run_in_executor(executor, function)
+        except Exception:
+            # A killed ffmpeg fails the transcode; report the cancellation.
+            if self.cancelled:
+                raise _Cancelled()
+            raise
+        return (result, None) if analyzer is None else result
+
+    async def _run_process(
+        self, command, analyzer: Optional[PcmAnalyzer] = None
+    ) -> None:
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *command,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=(
+                    asyncio.subprocess.PIPE if analyzer else asyncio.subprocess.DEVNULL
+                ),
+                stderr=asyncio.subprocess.PIPE,
+            )
+        except FileNotFoundError:
+            raise ConversionError(f"ffmpeg executable not found: {command[0]}")
+
+        self._processes.add(process)
+        try:
+            if analyzer is None:
+                _, stderr = await process.communicate()
+            else:
+                _, stderr = await asyncio.gather(
+                    self._feed(process.stdout, analyzer), process.stderr.read()
+                )
+                await process.wait()
+        finally:
+            self._processes.discard(process)
+
+        if self.cancelled:
+            raise _Cancelled()
+        if process.returncode != 0:
+            message = stderr.decode(errors="replace").strip()
+            raise ConversionError(
+                f"ffmpeg exited with code {process.returncode}: {message}"
+            )
+
+    async def _feed(self, stdout: asyncio.StreamReader, analyzer: PcmAnalyzer) -> None:
+        """Pass the PCM an encoder writes to stdout to the analyzer."""
+        while True:
+            try:
+                chunk = await stdout.readexactly(PCM_CHUNK_BYTES)
+            except asyncio.IncompleteReadError as e:
+                chunk = e.partial
+            if not chunk:
+                return
+            # Measuring is NumPy work; keep it off the event loop.
+            await self._loop.run_in_executor(None, analyzer.feed_bytes, chunk)
@@ -0,0 +1,145 @@
+import os
+import shutil
+import uuid
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import Iterator, List, Sequence
+
+PARTIAL_SUFFIX = ".partial"
+# Prefix of the temporary directories that segmented encodes write to.
+SEGMENTS_PREFIX = ".flac2apple-segments-"
+
+
+def partial_path(output_path: Path, unique: bool = False) -> Path:
+    """
+    Return a hidden temporary path next to ``output_path``.
+
+    Keeping the file in the destination directory makes the final rename
+    atomic, since both paths are on the same filesystem. The name is the same
+    every time, so a retry overwrites the partial file of an earlier attempt
+    instead of leaving it behind.
+
+    Args:
+        output_path (Path): Final path of the file.
+        unique (bool): Add a random part to the name, for files that several
+            writers may write at once.
+    """
+    name = output_path.name
+    if unique:
+        name += f".{uuid.uuid4().hex[:8]}"
+    return output_path.with_name(f".{name}{PARTIAL_SUFFIX}")
+
+
+def final_path(path: Path) -> Path:
+    """Return the output a path from ``partial_path`` is renamed to; others as is."""
+    name = path.name
+    if not _is_partial(name):
+        return path
+    return path.with_name(name[1 : -len(PARTIAL_SUFFIX)])
+
+
+def remove_partials(root: Path) -> int:
+    """
+    Delete the temporary files and directories a killed run left under ``root``.
+
+    Only call this while nothing else writes under ``root``.
+
+    Args:
+        root (Path): Directory to clean, recursively.
+
+    Returns:
+        int: Number of files and directories removed.
+    """
+    removed = 0
+    for directory, dirnames, filenames in os.walk(root):
+        kept = []
+        for name in dirnames:
+            if name.startswith(SEGMENTS_PREFIX) or _is_partial(name):
+                shutil.rmtree(Path(directory) / name, ignore_errors=True)
+                removed += 1
+            else:
+                kept.append(name)
+        dirnames[:] = kept
+        for name in filenames:
+            if _is_partial(name):
+                (Path(directory) / name).unlink(missing_ok=True)
+                removed += 1
+    return removed
+
+
+def _is_partial(name: str) -> bool:
+    return name.startswith(".") and name.endswith(PARTIAL_SUFFIX)
+
+
+@contextmanager
+def atomic_output(output_path: Path, sync: bool = False) -> Iterator[Path]:
+    """
+    Write a file under a temporary name and rename it into place on success.
+
+    The body receives the temporary path to write to. If it raises, or the run
+    is interrupted, the temporary file is removed and ``output_path`` is left
+    untouched, so a truncated file can never look finished.
+
+    The body may also create a directory at the temporary path (the tracks of
+    a split album image). A previous directory at ``output_path`` is moved
+    aside and removed only once the new one is in place.
+
+    Args:
+        output_path (Path): Final path of the file.
+        sync (bool): Also flush the directory entry after the rename. The file
+            itself must already have been flushed by the caller.
+    """
+    temporary = partial_path(output_path)
+    # A directory left by an earlier attempt would keep its stale tracks.
+    if temporary.is_dir():
+        shutil.rmtree(temporary)
+    try:
+        yield temporary
+        if temporary.is_dir():
+            _replace_directory(temporary, output_path)
+        else:
+            os.replace(temporary, output_path)
+    except BaseException:
+        if temporary.is_dir():
+            shutil.rmtree(temporary, ignore_errors=True)
+        else:
+            temporary.unlink(missing_ok=True)
+        raise
+
+    if sync and hasattr(os, "O_DIRECTORY"):
+        fd = os.open(output_path.parent, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+@contextmanager
+def atomic_outputs(
+    output_paths: Sequence[Path], sync: bool = False
+) -> Iterator[List[Path]]:
+    """
+    Like ``atomic_output`` for several files produced by one job.
+
+    The body receives one temporary path per output. Nothing is renamed into
+    place unless the body completes, so a failed job leaves no new outputs.
+
+    Args:
+        output_paths (Sequence[Path]): Final paths of the files.
+        sync (bool): Also flush the directory entries after the renames.
+    """
+    with ExitStack() as stack:
+        yield [
+            stack.enter_context(atomic_output(path, sync=sync)) for path in output_paths
+        ]
+
+
+def _replace_directory(temporary: Path, output_path: Path) -> None:
+    # os.replace only overwrites empty directories, so swap via a third name.
+    previous = None
+    if output_path.is_dir():
+        previous = partial_path(output_path, unique=True)
+        os.replace(output_path, previous)
+    os.replace(temporary, output_path)
+    if previous is not None:
+        shutil.rmtree(previous, ignore_errors=True)
@@ -0,0 +1,450 @@
+import signal
+import subprocess
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+
+from src.core.encoders import EncoderProfile
+from src.core.loudness import PcmAnalyzer
+from src.utils.enums import ConversionBackend
+from src.utils.exceptions import ConversionError
+from src.utils.logging_config import get_logger
+from src.utils.profiling import DECODE, ENCODE, StageTimings
+
+logger = get_logger(__name__)
+
+# An extra output of the decoded audio as raw float PCM on stdout, for the
+# loudness meter.
+PCM_OUTPUT = ["-map", "0:a:0", "-c:a", "pcm_f32le", "-f", "f32le", "pipe:1"]
+PCM_CHUNK_BYTES = 1 << 20
+
+
+class ProcessGroup:
+    """
+    Child processes of a run, suspended, resumed or killed together.
+
+    Processes may be added and removed from any thread. One added while the
+    group is paused is suspended right away and one added after ``kill`` is
+    killed, so a child started on a worker thread cannot slip past a pause or
+    a cancel. Both ``subprocess.Popen`` and asyncio processes are accepted.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._processes = set()
+        self.paused = False
+        self.killed = False
+
+    def add(self, process) -> None:
+        with self._lock:
+            self._processes.add(process)
+            if self.killed:
+                self._kill(process)
+            elif self.paused:
+                self._signal(process, getattr(signal, "SIGSTOP", None))
+
+    def discard(self, process) -> None:
+        with self._lock:
+            self._processes.discard(process)
+
+    def pause(self) -> None:
+        """Suspend every process, where the platform supports it."""
+        with self._lock:
+            self.paused = True
+            for process in self._processes:
+                self._signal(process, getattr(signal, "SIGSTOP", None))
+
+    def resume(self) -> None:
+        with self._lock:
+            self.paused = False
+            for process in self._processes:
+                self._signal(process, getattr(signal, "SIGCONT", None))
+
+    def kill(self) -> None:
+        """Kill every process, and any added from now on."""
+        with self._lock:
+            self.killed = True
+            for process in self._processes:
+                self._kill(process)
+
+    @staticmethod
+    def _signal(process, signum: Optional[int]) -> None:
+        if signum is None or process.returncode is not None:
+            return
+        try:
+            process.send_signal(signum)
+        except ProcessLookupError:
+            pass
+
+    @staticmethod
+    def _kill(process) -> None:
+        if process.returncode is not None:
+            return
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+
+
+# Group that ffmpeg processes started by FFmpegBackend.run join, if any. Set
+# by the async engine so pause and cancel reach encodes that run on threads.
+current_processes: ContextVar[Optional[ProcessGroup]] = ContextVar(
+    "current_processes", default=None
+)
+
+
+class TranscodeBackend(ABC):
+    """Base class for engines that turn a FLAC file into an encoded audio file."""
+
+    name: str = ""
+    # True when the heavy lifting happens in a child process rather than in
+    # Python, so the backend does not need a process pool to scale.
+    runs_in_subprocess: bool = True
+
+    @abstractmethod
+    def transcode(
+        self,
+        input_path: Path,
+        output_path: Path,
+        encoder: EncoderProfile,
+        timings: StageTimings,
+        extra_outputs: Sequence[Tuple[Path, EncoderProfile]] = (),
+        analyzer: Optional[PcmAnalyzer] = None,
+    ) -> None:
+        """
+        Encode the audio stream of a FLAC file with the given encoder preset.
+
+        Only audio is written; tags and artwork are handled separately. The
+        source is decoded once, however many outputs are requested.
+
+        Args:
+            input_path (Path): Path to the input FLAC file.
+            output_path (Path): Path for the encoded file.
+            encoder (EncoderProfile): Encoder preset to use.
+            timings (StageTimings): Receives the decode and encode times.
+            extra_outputs (Sequence[Tuple[Path, EncoderProfile]]): Further
+                outputs encoded from the same decoded audio.
+            analyzer (Optional[PcmAnalyzer]): Measures the loudness of the
+                decoded audio on its way to the encoders.
+
+        Raises:
+            ConversionError: If the audio could not be encoded.
+        """
+
+
+class FFmpegBackend(TranscodeBackend):
+    """
+    Transcode with a single ffmpeg process.
+
+    ffmpeg decodes the FLAC and feeds the PCM directly to the encoder, so the
+    samples never enter the Python process and no intermediate WAV is written.
+    """
+
+    name = ConversionBackend.FFMPEG.value
+
+    def __init__(self, ffmpeg_path: str = "ffmpeg"):
+        self.ffmpeg_path = ffmpeg_path
+
+    def build_command(
+        self,
+        input_path: Path,
+        output_path: Path,
+        encoder: EncoderProfile,
+        extra_outputs: Sequence[Tuple[Path, EncoderProfile]] = (),
+        pcm: bool = False,
+    ) -> List[str]:
+        """
+        Build the ffmpeg command line for a single transcode.
+
+        Every extra output maps the same input stream, so ffmpeg decodes the
+        FLAC once and feeds the PCM to one encoder per output.
+
+        Args:
+            input_path (Path): Path to the input FLAC file.
+            output_path (Path): Path for the encoded file.
+            encoder (EncoderProfile): Encoder preset to use.
+            extra_outputs (Sequence[Tuple[Path, EncoderProfile]]): Further
+                outputs and their encoder presets.
+            pcm (bool): Also write the decoded audio to stdout as float PCM.
+
+        Returns:
+            List[str]: The command and its arguments.
+        """
+        outputs: List[str] = []
+        for path, profile in [(output_path, encoder), *extra_outputs]:
+            outputs += [
+                "-map",
+                "0:a:0",
+                "-map_metadata",
+                "-1",
+                *profile.filter_args,
+                *profile.codec_args,
+                "-f",
+                profile.container,
+                str(path),
+            ]
+        if pcm:
+            outputs += PCM_OUTPUT
+        return [
+            self.ffmpeg_path,
+            "-hide_banner",
+            "-nostdin",
+            "-loglevel",
+            "error",
+            "-y",
+            "-i",
+            str(input_path),
+            *outputs,
+        ]
+
+    def build_decode_command(self, input_path: Path) -> List[str]:
+        """
+        Build an ffmpeg command that only decodes a file to float PCM.
+
+        Args:
+            input_path (Path): Path to the input FLAC file.
+
+        Returns:
+            List[str]: The command and its arguments.
+        """
+        return [
+            self.ffmpeg_path,
+            "-hide_banner",
+            "-nostdin",
+            "-loglevel",
+            "error",
+            "-i",
+            str(input_path),
+            *PCM_OUTPUT,
+        ]
+
+    def build_split_command(
+        self,
+        input_path: Path,
+        tracks: List[Tuple[int, Optional[int], Path]],
+        encoder: EncoderProfile,
+        pcm: bool = False,
+    ) -> List[str]:
+        """
+        Build an ffmpeg command that cuts one input into several outputs.
+
+        The input is decoded once; ``asplit`` hands the PCM to one trim and
+        encoder chain per output, all inside the same process.
+
+        Args:
+            input_path (Path): Path to the input FLAC file.
+            tracks (List[Tuple[int, Optional[int], Path]]): First sample,
+                end sample (None for the end of the input) and output path of
+                every track.
+            encoder (EncoderProfile): Encoder preset to use.
+            pcm (bool): Also write the whole decoded input to stdout as float
+                PCM.
+
+        Returns:
+            List[str]: The command and its arguments.
+        """
+        chains = []
+        outputs: List[str] = []
+        for index, (start, end, path) in enumerate(tracks):
+            trim = f"start_sample={start}"
+            if end is not None:
+                trim += f":end_sample={end}"
+            chain = f"[s{index}]atrim={trim},asetpts=PTS-STARTPTS"
+            # A stream fed by a filter graph cannot take -af, so the encoder's
+            # filter joins the chain.
+            if encoder.audio_filter:
+                chain += f",{encoder.audio_filter}"
+            chains.append(f"{chain}[t{index}]")
+            outputs += [
+                "-map",
+                f"[t{index}]",
+                "-map_metadata",
+                "-1",
+                *encoder.codec_args,
+                "-f",
+                encoder.container,
+                str(path),
+            ]
+        branches = len(tracks) + 1 if pcm else len(tracks)
+        split = f"[0:a:0]asplit={branches}" + "".join(
+            f"[s{index}]" for index in range(branches)
+        )
+        if pcm:
+            outputs += ["-map", f"[s{len(tracks)}]", *PCM_OUTPUT[2:]]
+        return [
+            self.ffmpeg_path,
+            "-hide_banner",
+            "-nostdin",
+            "-loglevel",
+            "error",
+            "-y",
+            "-i",
+            str(input_path),
+            "-filter_complex",
+            ";".join([split, *chains]),
+            *outputs,
+        ]
+
+    def transcode(
+        self,
+        input_path: Path,
+        output_path: Path,
+        encoder: EncoderProfile,
+        timings: StageTimings,
+        extra_outputs: Sequence[Tuple[Path, EncoderProfile]] = (),
+        analyzer: Optional[PcmAnalyzer] = None,
+    ) -> None:
+        command = self.build_command(
+            input_path,
+            output_path,
+            encoder,
+            extra_outputs,
+            pcm=analyzer is not None,
+        )
+        # Decoding and encoding overlap in one process; the time is reported
+        # as encode.
+        with timings.stage(ENCODE):
+            self.run(command, analyzer.feed_bytes if analyzer else None)
+
+    def run(
+        self,
+        command: List[str],
+        pcm_sink: Optional[Callable[[bytes], None]] = None,
+    ) -> None:
+        """
+        Run an ffmpeg command to completion.
+
+        Args:
+            command (List[str]): The command and its arguments.
+            pcm_sink (Optional[Callable[[bytes], None]]): Receives what ffmpeg
+                writes to stdout, chunk by chunk, for commands that write PCM
+                there.
+
+        Raises:
+            ConversionError: If ffmpeg is missing or exits with an error.
+        """
+        try:
+            if pcm_sink is None:
+                with self._popen(command, subprocess.PIPE) as process:
+                    _, stderr = process.communicate()
+                returncode = process.returncode
+            else:
+                returncode, stderr = self._stream(command, pcm_sink)
+        except FileNotFoundError:
+            raise ConversionError(f"ffmpeg executable not found: {self.ffmpeg_path}")
+
+        if returncode != 0:
+            message = stderr.decode(errors="replace").strip()
+            raise ConversionError(f"ffmpeg exited with code {returncode}: {message}")
+
+    @classmethod
+    def _stream(
+        cls, command: List[str], pcm_sink: Callable[[bytes], None]
+    ) -> Tuple[int, bytes]:
+        # stderr goes to a file, so a chatty ffmpeg cannot block on a full
+        # pipe while stdout is being read.
+        with tempfile.TemporaryFile() as stderr:
+            with cls._popen(command, stderr, stdout=subprocess.PIPE) as process:
+                while True:
+                    chunk = process.stdout.read(PCM_CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    pcm_sink(chunk)
+            stderr.seek(0)
+            return process.returncode, stderr.read()
+
+    @staticmethod
+    @contextmanager
+    def _popen(
+        command: List[str], stderr, stdout=subprocess.DEVNULL
+    ) -> Iterator[subprocess.Popen]:
+        """Start a process in the current process group and wait for it."""
+        process = subprocess.Popen(
+            command, stdin=subprocess.DEVNULL, stdout=stdout, stderr=stderr
+        )
+        processes = current_processes.get()
+        if processes is not None:
+            processes.add(process)
+        try:
+            with process:
+                try:
+                    yield process
+                except BaseException:
+                    process.kill()
+                    raise
+        finally:
+            if processes is not None:
+                processes.discard(process)
+
+
+class PydubBackend(TranscodeBackend):
+    """
+    Transcode through pydub.
+
+    The whole track is decoded into an in-memory AudioSegment and exported
+    again, which costs two ffmpeg runs and the full PCM in RAM. Kept as a
+    fallback for setups where the direct ffmpeg path misbehaves.
+    """
+
+    name = ConversionBackend.PYDUB.value
+    runs_in_subprocess = False
+
+    def transcode(
+        self,
+        input_path: Path,
+        output_path: Path,
+        encoder: EncoderProfile,
+        timings: StageTimings,
+        extra_outputs: Sequence[Tuple[Path, EncoderProfile]] = (),
+        analyzer: Optional[PcmAnalyzer] = None,
+    ) -> None:
+        # Imported here: pydub is slow to import and only this fallback needs it.
+        from pydub import AudioSegment
+
+        with timings.stage(DECODE):
+            audio = AudioSegment.from_file(input_path, format="flac")
+        timings.add_bytes("pcm", len(audio.raw_data))
+        if analyzer is not None:
+            self._feed(audio, analyzer)
+        with timings.stage(ENCODE):
+            for path, profile in [(output_path, encoder), *extra_outputs]:
+                audio.export(
+                    path,
+                    format=profile.container,
+                    codec=profile.codec,
+                    parameters=profile.encoder_options,
+                )
+
+    @staticmethod
+    def _feed(audio, analyzer: PcmAnalyzer) -> None:
+        """Pass the samples of an AudioSegment to the analyzer as floats."""
+        import numpy as np
+
+        samples = audio.get_array_of_samples()
+        frames = np.frombuffer(samples, dtype=samples.typecode)
+        frames = frames.reshape(-1, audio.channels)
+        scale = 2.0 ** (8 * audio.sample_width - 1)
+        # Converted a second at a time, so the floats never double the PCM.
+        for start in range(0, len(frames), audio.frame_rate):
+            analyzer.feed(frames[start : start + audio.frame_rate] / scale)
+
+
+def get_backend(backend: ConversionBackend) -> TranscodeBackend:
+    """
+    Create the transcode backend for the given backend type.
+
+    Args:
+        backend (ConversionBackend): The backend to create.
+
+    Returns:
+        TranscodeBackend: A ready to use backend instance.
+    """
+    if backend == ConversionBackend.FFMPEG:
+        return FFmpegBackend()
+    if backend == ConversionBackend.PYDUB:
+        return PydubBackend()
+    raise ValueError(f"Unknown conversion backend: {backend}")
@@ -0,0 +1,567 @@
+"""
+Parallel encoding of long files in segments.
+
+A long input is cut into segments at boundaries that fall on frames of the
+output codec. The segments are encoded by concurrent ffmpeg processes and
+their packets are joined into one stream without re-encoding.
+
+Lossy codecs prime their output with ``encoder_delay`` samples and every frame
+overlaps its neighbours, so a segment cannot simply be encoded on its own.
+Each segment after the first starts a few frames early (pre-roll) and every
+segment but the last runs a few frames long (post-roll). The packets covering
+the pre- and post-roll are dropped when joining. Pre-roll plus encoder delay is
+a whole number of frames, so the packets that are kept decode to exactly the
+samples a single-pass encode would have put there. The joined file carries
+the gapless information of a single encode: a LAME/Info header for MP3 and an
+``iTunSMPB`` atom for AAC. ALAC frames are independent and have no delay, so
+ALAC segments are concatenated as they are.
+"""
+
+import contextvars
+import os
+import shutil
+import struct
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+from threading import BoundedSemaphore
+from typing import Iterator, List, Optional, Tuple
+
+from mutagen.flac import StreamInfo
+from mutagen.mp4 import MP4, MP4FreeForm
+
+from src.core.atomic import SEGMENTS_PREFIX
+from src.core.backends import FFmpegBackend
+from src.core.encoders import EncoderProfile
+from src.core.metadata import ITUNSMPB_KEY
+from src.utils.exceptions import ConversionError
+from src.utils.logging_config import get_logger
+from src.utils.profiling import ENCODE, StageTimings
+
+logger = get_logger(__name__)
+
+# Frames encoded before a segment's start and after its end so the kept
+# frames see the same neighbouring audio as in a single-pass encode.
+PREROLL_FRAMES = 2
+POSTROLL_FRAMES = 2
+
+# Decoder delay that the LAME header's delay field leaves out.
+MP3_DECODER_DELAY = 529
+MP3_SAMPLE_RATES = (44100, 48000, 32000)
+MP3_BITRATES = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)
+
+# Encoder slots of the run, one of which the calling thread holds. Set by the
+# scheduler around a transcode so segments share its encoder limit.
+held_encoder_slot: ContextVar[Optional[BoundedSemaphore]] = ContextVar(
+    "held_encoder_slot", default=None
+)
+
+
+@dataclass(frozen=True)
+class ChunkingOptions:
+    """
+    When and how to split long files.
+
+    Attributes:
+        min_seconds (float): Files shorter than this are encoded in one piece.
+        segment_seconds (float): Target length of a segment.
+        max_parallel (Optional[int]): Segments encoded at once per file.
+            Defaults to ``os.cpu_count()``.
+    """
+
+    min_seconds: float = 1200.0
+    segment_seconds: float = 300.0
+    max_parallel: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class CodecFraming:
+    """
+    Frame layout of an output codec as produced by ffmpeg.
+
+    Attributes:
+        frame_size (int): Samples per packet.
+        encoder_delay (int): Priming samples at the start of the decoded
+            stream (ffmpeg's ``initial_padding``).
+        segment_format (str): ffmpeg muxer used for the segments.
+        segment_args (Tuple[str, ...]): Extra arguments for the segments.
+    """
+
+    frame_size: int
+    encoder_delay: int
+    segment_format: str
+    segment_args: Tuple[str, ...] = ()
+
+
+CODEC_FRAMING = {
+    # The bit reservoir lets a frame borrow bytes of earlier frames, which
+    # would point into dropped pre-roll frames after joining.
+    "libmp3lame": CodecFraming(
+        1152,
+        576 + MP3_DECODER_DELAY,
+        "mp3",
+        ("-reservoir", "0", "-write_xing", "0", "-id3v2_version", "0"),
+    ),
+    "aac": CodecFraming(1024, 1024, "adts"),
+    "alac": CodecFraming(4096, 0, "ipod"),
+}
+
+
+@dataclass(frozen=True)
+class Segment:
+    """
+    One piece of a split encode.
+
+    Attributes:
+        start (int): First input sample fed to the encoder.
+        end (int): Input sample after the last one fed to the encoder.
+        skip (int): Leading packets to drop, covering pre-roll and priming.
+        keep (Optional[int]): Packets to keep after ``skip``; None for all.
+    """
+
+    start: int
+    end: int
+    skip: int
+    keep: Optional[int]
+
+
+def plan_segments(
+    total_samples: int, framing: CodecFraming, segment_samples: int
+) -> List[Segment]:
+    """
+    Split an input into segments that join into a seamless stream.
+
+    Segment boundaries are placed on frames of the joined output. With a
+    delay of D samples, output frame j decodes input samples from
+    ``j * frame_size - D``, so a segment producing output frames ``a`` to
+    ``b`` starts feeding the encoder ``skip`` whole frames before frame ``a``.
+
+    Args:
+        total_samples (int): Length of the input in samples.
+        framing (CodecFraming): Frame layout of the output codec.
+        segment_samples (int): Target length of a segment in samples.
+
+    Returns:
+        List[Segment]: The segments in order.
+    """
+    size = framing.frame_size
+    delay = framing.encoder_delay
+    total_frames = -(-(total_samples + delay) // size)
+    count = max(1, round(total_frames * size / segment_samples))
+    # Spread the frames evenly rather than leaving a short last segment.
+    bounds = [index * total_frames // count for index in range(count + 1)]
+    preroll = -(-(delay + PREROLL_FRAMES * size) // size) if delay else 0
+    postroll = POSTROLL_FRAMES * size if delay else 0
+
+    segments = []
+    for first, last in zip(bounds, bounds[1:]):
+        skip = min(preroll, first)
+        if last == total_frames:
+            segments.append(Segment((first - skip) * size, total_samples, skip, None))
+        else:
+            end = min(last * size - delay + postroll, total_samples)
+            segments.append(Segment((first - skip) * size, end, skip, last - first))
+    return segments
+
+
+def _mp3_frame_length(data: bytes, offset: int) -> int:
+    header = data[offset : offset + 4]
+    if (
+        len(header) < 4
+        or header[0] != 0xFF
+        or header[1] & 0xFE != 0xFA
+        or header[2] >> 4 in (0, 15)
+        or (header[2] >> 2) & 3 == 3
+    ):
+        raise ConversionError(f"Expected an MPEG-1 Layer III frame at byte {offset}")
+    bitrate = MP3_BITRATES[header[2] >> 4] * 1000
+    sample_rate = MP3_SAMPLE_RATES[(header[2] >> 2) & 3]
+    padding = (header[2] >> 1) & 1
+    return 144 * bitrate // sample_rate + padding
+
+
+def _adts_frame_length(data: bytes, offset: int) -> int:
+    header = data[offset : offset + 7]
+    if len(header) < 7 or header[0] != 0xFF or header[1] & 0xF6 != 0xF0:
+        raise ConversionError(f"Expected an ADTS frame at byte {offset}")
+    return ((header[3] & 0x03) << 11) | (header[4] << 3) | (header[5] >> 5)
+
+
+_FRAME_PARSERS = {"mp3": _mp3_frame_length, "adts": _adts_frame_length}
+
+
+def split_frames(data: bytes, segment_format: str) -> List[Tuple[int, int]]:
+    """
+    Return the (offset, length) of every frame of a raw MP3 or ADTS stream.
+
+    Raises:
+        ConversionError: If the data is not a sequence of frames.
+    """
+    frame_length = _FRAME_PARSERS[segment_format]
+    frames = []
+    offset = 0
+    while offset < len(data):
+        length = frame_length(data, offset)
+        if length <= 0 or offset + length > len(data):
+            raise ConversionError(f"Truncated frame at byte {offset}")
+        frames.append((offset, length))
+        offset += length
+    return frames
+
+
+def _crc16(data: bytes) -> int:
+    """CRC-16/ARC, as used by the LAME tag."""
+    crc = 0
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return crc
+
+
+def build_mp3_info_frame(
+    first_header: bytes,
+    frame_sizes: List[int],
+    constant_bitrate: Optional[int],
+    delay: int,
+    padding: int,
+) -> bytes:
+    """
+    Build the Xing/Info frame with a LAME extension that precedes the audio.
+
+    Players use it for the frame count, seeking and the gapless delay and
+    padding of the stream.
+
+    Args:
+        first_header (bytes): Header of the first audio frame.
+        frame_sizes (List[int]): Byte size of every audio frame.
+        constant_bitrate (Optional[int]): Bitrate in kbit/s for CBR streams,
+            None for VBR.
+        delay (int): Samples to skip at the start, excluding decoder delay.
+        padding (int): Samples to drop at the end, plus the decoder delay.
+
+    Returns:
+        bytes: The complete frame.
+    """
+    mono = (first_header[3] >> 6) == 3
+    tag_offset = 21 if mono else 36
+    needed = tag_offset + 120 + 36
+    sample_rate = MP3_SAMPLE_RATES[(first_header[2] >> 2) & 3]
+
+    # Smallest bitrate whose frame fits the tag, no padding, no CRC.
+    for index in range(1, len(MP3_BITRATES)):
+        length = 144 * MP3_BITRATES[index] * 1000 // sample_rate
+        if length >= needed:
+            break
+    header = bytes(
+        [
+            0xFF,
+            first_header[1] | 0x01,
+            (index << 4) | (first_header[2] & 0x0C),
+            first_header[3],
+        ]
+    )
+    frame = bytearray(length)
+    frame[:4] = header
+
+    total_bytes = length + sum(frame_sizes)
+    toc = bytearray(100)
+    offsets = [length]
+    for size in frame_sizes:
+        offsets.append(offsets[-1] + size)
+    for i in range(100):
+        offset = offsets[i * len(frame_sizes) // 100]
+        toc[i] = min(255, offset * 256 // total_bytes)
+
+    xing = (
+        (b"Info" if constant_bitrate else b"Xing")
+        + struct.pack(">III", 0x0F, len(frame_sizes), total_bytes)
+        + bytes(toc)
+        + struct.pack(">I", 0)
+    )
+    source_frequency = {44100: 1, 48000: 2}.get(sample_rate, 0)
+    lame = (
+        b"LAME3.100"
+        + bytes([0x01 if constant_bitrate else 0x04, 0])
+        + bytes(8)  # peak, track and album gain
+        + bytes([0, min(constant_bitrate or 0, 255)])
+        + ((min(delay, 4095) << 12) | min(padding, 4095)).to_bytes(3, "big")
+        + bytes([source_frequency << 6, 0, 0, 0])
+        + struct.pack(">IH", total_bytes, 0)
+    )
+    frame[tag_offset : tag_offset + len(xing)] = xing
+    lame_offset = tag_offset + len(xing)
+    frame[lame_offset : lame_offset + len(lame)] = lame
+    crc_offset = lame_offset + len(lame)
+    frame[crc_offset : crc_offset + 2] = _crc16(frame[:crc_offset]).to_bytes(2, "big")
+    return bytes(frame)
+
+
+def itunsmpb(delay: int, padding: int, samples: int) -> str:
+    """Format the iTunes gapless playback atom."""
+    return f" 00000000 {delay:08X} {padding:08X} {samples:016X}" + " 00000000" * 8
+
+
+class ChunkedTranscoder:
+    """Encode long files as parallel segments joined into one output."""
+
+    def __init__(self, backend: FFmpegBackend, options: ChunkingOptions):
+        """
+        Args:
+            backend (FFmpegBackend): Backend whose ffmpeg runs the segments.
+            options (ChunkingOptions): When and how to split.
+        """
+        self.backend = backend
+        self.options = options
+
+    def plan(
+        self, encoder: EncoderProfile, info: Optional[StreamInfo]
+    ) -> Optional[List[Segment]]:
+        """
+        Return the segments for a file, or None if it should not be split.
+
+        Args:
+            encoder (EncoderProfile): Encoder preset of the output.
+            info (Optional[StreamInfo]): Stream properties of the input.
+        """
+        framing = CODEC_FRAMING.get(encoder.codec)
+        if framing is None or info is None or not info.total_samples:
+            return None
+        if info.length < self.options.min_seconds:
+            return None
+        if framing.segment_format == "mp3" and info.sample_rate not in MP3_SAMPLE_RATES:
+            return None
+        segments = plan_segments(
+            info.total_samples,
+            framing,
+            int(self.options.segment_seconds * info.sample_rate),
+        )
+        return segments if len(segments) > 1 else None
+
+    def transcode(
+        self,
+        input_path: Path,
+        output_path: Path,
+        encoder: EncoderProfile,
+        info: StreamInfo,
+        segments: List[Segment],
+        timings: StageTimings,
+    ) -> None:
+        """
+        Encode ``input_path`` segment by segment and join the result.
+
+        Args:
+            input_path (Path): Path to the input FLAC file.
+            output_path (Path): Path for the encoded file.
+            encoder (EncoderProfile): Encoder preset to use.
+            info (StreamInfo): Stream properties of the input.
+            segments (List[Segment]): Segments returned by ``plan``.
+            timings (StageTimings): Receives the encode time.
+
+        Raises:
+            ConversionError: If a segment fails or cannot be joined.
+        """
+        framing = CODEC_FRAMING[encoder.codec]
+        logger.info(
+            f"Encoding {input_path} in {len(segments)} parallel segments "
+            f"({info.length:.0f} s)"
+        )
+        with tempfile.TemporaryDirectory(
+            dir=output_path.parent, prefix=SEGMENTS_PREFIX
+        ) as directory:
+            paths = [
+                Path(directory) / f"{index:04d}.{framing.segment_format}"
+                for index in range(len(segments))
+            ]
+            commands = [
+                self._segment_command(
+                    input_path, path, encoder, framing, segment, info.sample_rate
+                )
+                for segment, path in zip(segments, paths)
+            ]
+            with timings.stage(ENCODE):
+                self._run_segments(commands)
+
+                if framing.segment_format == "mp3":
+                    self._join_mp3(paths, segments, framing, info, output_path)
+                elif framing.segment_format == "adts":
+                    self._join_aac(paths, segments, framing, info, output_path)
+                else:
+                    self._concat(paths, Path(directory), encoder, output_path)
+
+    def _run_segments(self, commands: List[List[str]]) -> None:
+        """
+        Run the segment encodes, ``max_parallel`` at a time.
+
+        If the calling thread holds an encoder slot (see
+        ``held_encoder_slot``), it gives the slot up while the segments run
+        and every segment takes a slot of its own, so segments count against
+        the same limit as whole-file encodes.
+        """
+        slots = held_encoder_slot.get()
+        workers = self.options.max_parallel or os.cpu_count() or 1
+
+        def run(context: contextvars.Context, command: List[str]) -> None:
+            with slots if slots is not None else nullcontext():
+                context.run(self.backend.run, command)
+
+        # Each segment runs in a copy of this thread's context, so its ffmpeg
+        # joins the caller's process group.
+        contexts = [contextvars.copy_context() for _ in commands]
+        if slots is not None:
+            slots.release()
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(run, contexts, commands))
+        finally:
+            if slots is not None:
+                slots.acquire()
+
+    def _segment_command(
+        self,
+        input_path: Path,
+        output_path: Path,
+        encoder: EncoderProfile,
+        framing: CodecFraming,
+        segment: Segment,
+        sample_rate: int,
+    ) -> List[str]:
+        # Microsecond precision maps back to the exact sample at any rate.
+        seek = ["-ss", f"{segment.start / sample_rate:.6f}"] if segment.start else []
+        return [
+            self.backend.ffmpeg_path,
+            "-hide_banner",
+            "-nostdin",
+            "-loglevel",
+            "error",
+            "-y",
+            *seek,
+            "-t",
+            f"{(segment.end - segment.start) / sample_rate:.6f}",
+            "-i",
+            str(input_path),
+            "-map",
+            "0:a:0",
+            "-map_metadata",
+            "-1",
+            *encoder.filter_args,
+            *encoder.codec_args,
+            *framing.segment_args,
+            "-f",
+            framing.segment_format,
+            str(output_path),
+        ]
+
+    @staticmethod
+    def _kept_frames(
+        paths: List[Path], segments: List[Segment], segment_format: str
+    ) -> Iterator[bytes]:
+        """Yield the packets of every segment that end up in the output."""
+        for path, segment in zip(paths, segments):
+            data = path.read_bytes()
+            frames = split_frames(data, segment_format)
+            end = len(frames) if segment.keep is None else segment.skip + segment.keep
+            if end > len(frames) or segment.skip >= len(frames):
+                raise ConversionError(
+                    f"Segment {path.name} has {len(frames)} frames, expected {end}"
+                )
+            for offset, length in frames[segment.skip : end]:
+                yield data[offset : offset + length]
+
+    def _join_mp3(
+        self,
+        paths: List[Path],
+        segments: List[Segment],
+        framing: CodecFraming,
+        info: StreamInfo,
+        output_path: Path,
+    ) -> None:
+        body_path = paths[0].parent / "joined.mp3"
+        sizes: List[int] = []
+        bitrates = set()
+        first_header = b""
+        with open(body_path, "wb") as body:
+            for frame in self._kept_frames(paths, segments, "mp3"):
+                if not first_header:
+                    first_header = frame[:4]
+                bitrates.add(frame[2] >> 4)
+                sizes.append(len(frame))
+                body.write(frame)
+
+        # LAME convention: the decoder delay is left out of the delay field
+        # and counted in the padding field instead.
+        delay = framing.encoder_delay - MP3_DECODER_DELAY
+        padding = len(sizes) * framing.frame_size - delay - info.total_samples
+        constant = MP3_BITRATES[bitrates.pop()] if len(bitrates) == 1 else None
+        info_frame = build_mp3_info_frame(first_header, sizes, constant, delay, padding)
+        with open(output_path, "wb") as output, open(body_path, "rb") as body:
+            output.write(info_frame)
+            shutil.copyfileobj(body, output, 1024 * 1024)
+
+    def _join_aac(
+        self,
+        paths: List[Path],
+        segments: List[Segment],
+        framing: CodecFraming,
+        info: StreamInfo,
+        output_path: Path,
+    ) -> None:
+        joined_path = paths[0].parent / "joined.aac"
+        frames = 0
+        with open(joined_path, "wb") as joined:
+            for frame in self._kept_frames(paths, segments, "adts"):
+                joined.write(frame)
+                frames += 1
+
+        self.backend.run(
+            self._remux_command(["-f", "aac", "-i", str(joined_path)], output_path)
+        )
+        padding = frames * framing.frame_size - framing.encoder_delay
+        padding -= info.total_samples
+        mp4 = MP4(output_path)
+        if mp4.tags is None:
+            mp4.add_tags()
+        mp4.tags[ITUNSMPB_KEY] = [
+            MP4FreeForm(
+                itunsmpb(framing.encoder_delay, padding, info.total_samples).encode()
+            )
+        ]
+        mp4.save()
+
+    def _concat(
+        self,
+        paths: List[Path],
+        directory: Path,
+        encoder: EncoderProfile,
+        output_path: Path,
+    ) -> None:
+        listing = directory / "segments.txt"
+        listing.write_text(
+            "".join(f"file '{path.name}'\n" for path in paths), encoding="utf-8"
+        )
+        self.backend.run(
+            self._remux_command(
+                ["-f", "concat", "-safe", "0", "-i", str(listing)], output_path
+            )
+        )
+
+    def _remux_command(self, input_args: List[str], output_path: Path) -> List[str]:
+        return [
+            self.backend.ffmpeg_path,
+            "-hide_banner",
+            "-nostdin",
+            "-loglevel",
+            "error",
+            "-y",
+            *input_args,
+            "-map",
+            "0:a:0",
+            "-codec",
+            "copy",
+            "-f",
+            "ipod",
+            str(output_path),
+        ]
@@ -1,32 +1,443 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import os
+import shutil
+import time
+from dataclasses import asdict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Callable, List, Optional
+from queue import Queue
+from threading import Event, Lock
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 
 from mutagen import File as MutagenFile
-from mutagen.easyid3 import EasyID3
-from mutagen.flac import FLAC
-from mutagen.id3 import APIC, ID3
+from mutagen.flac import FLAC, StreamInfo
+from mutagen.id3 import ID3
 from mutagen.mp4 import MP4
-from pydub import AudioSegment
 
-from src.utils.enums import AudioFormat
+from src.core.artwork import ArtworkOptions, get_artwork_cache
+from src.core.atomic import (
+    atomic_outputs,
+    final_path,
+    partial_path,
+    remove_partials,
+)
+from src.core.async_engine import AsyncConversionEngine
+from src.core.backends import FFmpegBackend, PydubBackend, get_backend
+from src.core.chunking import ChunkedTranscoder, ChunkingOptions
+from src.core.cuesheet import AlbumImage, load_album_image
+from src.core.downconvert import (
+    Downconversion,
+    DownconvertOptions,
+    converted_info,
+    plan_downconversion,
+)
+from src.core.duplicates import (
+    DUPLICATE_INDEX_FILENAME,
+    DuplicateIndex,
+    audio_md5,
+    get_duplicate_index,
+)
+from src.core.loudness import Loudness, PcmAnalyzer, loudness_tags
+from src.core.manifest import MANIFEST_FILENAME, ConversionManifest
+from src.core.memory import (
+    PYDUB_PEAK_FACTOR,
+    MemoryGovernor,
+    pcm_bytes,
+    streaming_bytes,
+)
+from src.core.ordering import order_jobs
+from src.core.probe_cache import PROBE_CACHE_FILENAME, get_probe_cache
+from src.core.progress import ProgressTracker
+from src.core.journal import RunJournal
+from src.core.encoders import (
+    EncoderProfile,
+    OutputTarget,
+    get_encoder,
+    resolve_encoder,
+)
+from src.core.metadata import (
+    read_source_metadata,
+    read_stream_info,
+    resolve_cover,
+    update_loudness_tags,
+    write_tags,
+)
+from src.core.results import ConversionResult, ConversionStatus
+from src.core.scanner import LibraryScanner
+from src.core.scheduler import MAX_PENDING_JOBS, ConversionScheduler
+from src.core.spool import DEFAULT_LEASE_SECONDS, DEFAULT_MAX_QUEUED, JobSpool
+from src.core.watcher import (
+    BUSY_TICK_SECONDS,
+    DEFAULT_SETTLE_SECONDS,
+    IDLE_TICK_SECONDS,
+    SettledFiles,
+    create_watcher,
+)
+from src.utils.enums import AudioFormat, ConversionBackend, JobOrder
 from src.utils.exceptions import ConversionError
 from src.utils.logging_config import get_logger
+from src.utils.profiling import (
+    COVER,
+    ENCODE,
+    FSYNC,
+    LOUDNESS,
+    METADATA,
+    REUSE,
+    SCAN,
+    CpuProfiler,
+    RunProfile,
+    StageTimings,
+)
 
 logger = get_logger(__name__)
 
 
+def _optional_path(value: Optional[str]) -> Optional[Path]:
+    return Path(value) if value else None
+
+
 class SingleFileConverter:
     """A class for converting a single FLAC file to another audio format."""
 
-    def __init__(self, output_format: AudioFormat, include_cover: bool):
+    def __init__(
+        self,
+        output_format: AudioFormat,
+        include_cover: bool,
+        backend: ConversionBackend = ConversionBackend.FFMPEG,
+        artwork_options: Optional[ArtworkOptions] = None,
+        preset: Optional[str] = None,
+        sync_output: bool = False,
+        chunking: Optional[ChunkingOptions] = None,
+        split_cue: bool = False,
+        extra_targets: Sequence[OutputTarget] = (),
+        output_root: Optional[Path] = None,
+        probe_cache: Optional[Path] = None,
+        duplicate_index: Optional[Path] = None,
+        memory_budget: Optional[int] = None,
+        loudness: bool = False,
+        downconvert: Optional[DownconvertOptions] = None,
+    ):
         self.output_format = output_format
         self.include_cover = include_cover
+        self.sync_output = sync_output
+        self.loudness = loudness
+        self.downconvert = downconvert
+        self.extra_targets = list(extra_targets)
+        # Root the main outputs are laid out under, mirrored by extra targets.
+        # Also kept resolved, like the outputs in the duplicate index.
+        self.output_root = output_root
+        self._resolved_output_root = output_root.resolve() if output_root else None
+        self.probe_cache = probe_cache
+        self.duplicate_index = duplicate_index
+        self.memory_budget = memory_budget
+        self.backend = get_backend(backend)
+        # Cutting an image needs ffmpeg's filter graph.
+        self.split_cue = split_cue and isinstance(self.backend, FFmpegBackend)
+        self.chunker: Optional[ChunkedTranscoder] = None
+        if chunking and isinstance(self.backend, FFmpegBackend):
+            self.chunker = ChunkedTranscoder(self.backend, chunking)
+        self.artwork_options = artwork_options or ArtworkOptions()
+        self.encoder: EncoderProfile = resolve_encoder(output_format, preset)
+
+    def to_config(self) -> Dict[str, Any]:
+        """Return the settings of this converter as JSON-serializable data."""
+        return {
+            "output_format": self.output_format.value,
+            "include_cover": self.include_cover,
+            "backend": self.backend.name,
+            "artwork_options": [
+                self.artwork_options.max_dimension,
+                self.artwork_options.max_bytes,
+            ],
+            "preset": self.encoder.name,
+            "sync_output": self.sync_output,
+            "chunking": asdict(self.chunker.options) if self.chunker else None,
+            "split_cue": self.split_cue,
+            "extra_targets": [
+                [target.encoder.name, str(target.directory)]
+                for target in self.extra_targets
+            ],
+            "output_root": str(self.output_root) if self.output_root else None,
+            "probe_cache": str(self.probe_cache) if self.probe_cache else None,
+            "duplicate_index": (
+                str(self.duplicate_index) if self.duplicate_index else None
+            ),
+            "memory_budget": self.memory_budget,
+            "loudness": self.loudness,
+            "downconvert": asdict(self.downconvert) if self.downconvert else None,
+        }
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "SingleFileConverter":
+        """Create a converter from the output of ``to_config``."""
+        return cls(
+            AudioFormat(config["output_format"]),
+            config["include_cover"],
+            ConversionBackend(config["backend"]),
+            artwork_options=ArtworkOptions(*config["artwork_options"]),
+            preset=config["preset"],
+            sync_output=config["sync_output"],
+            chunking=(
+                ChunkingOptions(**config["chunking"]) if config["chunking"] else None
+            ),
+            split_cue=config["split_cue"],
+            extra_targets=[
+                OutputTarget(get_encoder(preset), Path(directory))
+                for preset, directory in config["extra_targets"]
+            ],
+            output_root=_optional_path(config["output_root"]),
+            probe_cache=_optional_path(config["probe_cache"]),
+            duplicate_index=_optional_path(config["duplicate_index"]),
+            memory_budget=config["memory_budget"],
+            loudness=config.get("loudness", False),
+            downconvert=(
+                DownconvertOptions(**config["downconvert"])
+                if config.get("downconvert")
+                else None
+            ),
+        )
+
+    def settings_key(self) -> str:
+        """Return a string identifying every setting that affects the output."""
+        return (
+            f"encoder={self.encoder.name};"
+            f"cover={int(self.include_cover)};"
+            f"backend={self.backend.name};"
+            f"artwork={self.artwork_options.key()}"
+            + (f";chunked={self.chunker.options.min_seconds:g}" if self.chunker else "")
+            + (";cue=1" if self.split_cue else "")
+            + (";loudness=1" if self.loudness else "")
+            + (f";downconvert={self.downconvert.key()}" if self.downconvert else "")
+            + "".join(
+                f";target={target.encoder.name}@{target.directory}"
+                for target in self.extra_targets
+            )
+        )
+
+    def extra_outputs(self, output_path: Path) -> List[Path]:
+        """
+        Return the paths the extra targets write for a main output path.
+
+        Each target mirrors the layout of the main output under its own
+        directory, with its own file extension.
+        """
+        if not self.extra_targets:
+            return []
+        relative = self._relative_output(output_path)
+        # The tracks of a split album image are a directory without extension.
+        is_file = relative.suffix == f".{self.encoder.extension}"
+        return [
+            target.directory
+            / (
+                relative.with_suffix(f".{target.encoder.extension}")
+                if is_file
+                else relative
+            )
+            for target in self.extra_targets
+        ]
+
+    def _outputs(
+        self, output_path: Path, extra_outputs: Sequence[Path]
+    ) -> List[Tuple[Path, EncoderProfile]]:
+        encoders = [target.encoder for target in self.extra_targets]
+        return [(output_path, self.encoder), *zip(extra_outputs, encoders)]
+
+    def ffmpeg_requirements(self) -> Tuple[List[str], List[str], List[str]]:
+        """
+        Return the ffmpeg encoders, filters and libraries this converter uses.
+
+        Workers of a distributed run check these against their own ffmpeg
+        before claiming jobs.
+
+        Returns:
+            Tuple[List[str], List[str], List[str]]: Encoder names, filter names
+                and names of external libraries ffmpeg must be built with.
+        """
+        encoders = [self.encoder.codec]
+        encoders += [target.encoder.codec for target in self.extra_targets]
+        filters = ["asplit", "atrim"] if self.split_cue else []
+        libraries = []
+        if self.downconvert:
+            filters.append("aresample")
+            if self.downconvert.resampler == "soxr":
+                libraries.append("libsoxr")
+        return sorted(set(encoders)), filters, libraries
+
+    def _downconversion(self, info: Optional[StreamInfo]) -> Optional[Downconversion]:
+        if not self.downconvert:
+            return None
+        return plan_downconversion(self.downconvert, info)
+
+    def encoders_for(self, input_path: Path) -> List[EncoderProfile]:
+        """
+        Return the encoder presets of the main output and the extra targets.
+
+        With downconversion, hi-res inputs get presets that resample and
+        dither on the way into the encoder; other inputs the plain presets.
+        """
+        encoders = [self.encoder] + [target.encoder for target in self.extra_targets]
+        conversion = self._downconversion(
+            read_stream_info(input_path) if self.downconvert else None
+        )
+        if conversion is None:
+            return encoders
+        return [encoder.with_filter(conversion.audio_filter) for encoder in encoders]
+
+    def _segment_info(self, info: Optional[StreamInfo]) -> Optional[StreamInfo]:
+        """
+        Return the stream the encoders see, for planning segments.
+
+        Returns None when the input must not be segmented: with a resampling
+        ratio that is not whole, segment boundaries would fall between
+        source samples.
+        """
+        conversion = self._downconversion(info)
+        if conversion is None:
+            return info
+        if not conversion.whole_ratio:
+            return None
+        return converted_info(info, conversion.sample_rate)
+
+    def album_image(self, input_path: Path) -> Optional[AlbumImage]:
+        """Return the cue layout of the input if it is an album image to split."""
+        return load_album_image(input_path) if self.split_cue else None
+
+    def _streams_instead(self, input_path: Path) -> bool:
+        """Check whether an in-memory backend would not fit the memory budget."""
+        if not self.memory_budget or not isinstance(self.backend, PydubBackend):
+            return False
+        pcm = pcm_bytes(read_stream_info(input_path), input_path.stat().st_size)
+        return pcm * PYDUB_PEAK_FACTOR > self.memory_budget
+
+    def memory_estimate(self, input_path: Path) -> int:
+        """
+        Estimate the peak memory of transcoding the input, from STREAMINFO.
+
+        In-memory backends need the whole decoded track; streaming through
+        ffmpeg needs a fixed amount per process, whatever the track length.
+
+        Returns:
+            int: Estimated bytes.
+        """
+        info = read_stream_info(input_path)
+        if isinstance(self.backend, PydubBackend) and not self._streams_instead(
+            input_path
+        ):
+            pcm = pcm_bytes(info, input_path.stat().st_size)
+            return pcm * PYDUB_PEAK_FACTOR
+        processes = 1
+        if self.chunker:
+            segments = self.chunker.plan(self.encoder, self._segment_info(info))
+            if segments:
+                workers = self.chunker.options.max_parallel or os.cpu_count() or 1
+                processes = min(len(segments), workers)
+        return streaming_bytes(processes, len(self.extra_targets))
+
+    def _relative_output(self, output_path: Path) -> Path:
+        """Return an output's path under ``output_root``, or its name if outside."""
+        if self.output_root is None:
+            return Path(output_path.name)
+        try:
+            return output_path.relative_to(self.output_root)
+        except ValueError:
+            pass
+        # Reused outputs come resolved from the duplicate index.
+        try:
+            return output_path.resolve().relative_to(self._resolved_output_root)
+        except ValueError:
+            return Path(output_path.name)
+
+    def find_duplicate(
+        self, input_path: Path, own_outputs: Sequence[Path] = ()
+    ) -> Optional[Tuple[Path, bool]]:
+        """
+        Look up an earlier encode of the same audio in the duplicate index.
+
+        Args:
+            input_path (Path): Path to the input FLAC file.
+            own_outputs (Sequence[Path]): Outputs of this job. An earlier
+                encode written to one of them is this job's own output from a
+                previous run, which is not reused.
+
+        Returns:
+            Optional[Tuple[Path, bool]]: The output to reuse and whether its
+            source had the same tags, or None if the input must be encoded.
+        """
+        if not self.duplicate_index or self.album_image(input_path):
+            return None
+        index = get_duplicate_index(self.duplicate_index)
+        if index is None:
+            return None
+        duplicate = index.lookup(input_path, self.settings_key())
+        if duplicate and duplicate[0].resolve() in {
+            path.resolve() for path in own_outputs
+        }:
+            return None
+        return duplicate
+
+    def uses_custom_transcode(
+        self, input_path: Path, outputs: Sequence[Path] = ()
+    ) -> bool:
+        """
+        Check whether the input is handled by more than a single ffmpeg run.
+
+        True for album images cut into tracks, for long files encoded in
+        segments and for copies of already encoded audio; those run through
+        ``transcode`` rather than a plain command.
+
+        Args:
+            input_path (Path): Path to the input FLAC file.
+            outputs (Sequence[Path]): The paths the job writes, as passed to
+                ``transcode``.
+        """
+        if self.album_image(input_path) or self._job_duplicate(input_path, outputs):
+            return True
+        if not self.chunker:
+            return False
+        info = self._segment_info(read_stream_info(input_path))
+        encoders = [self.encoder] + [target.encoder for target in self.extra_targets]
+        return any(self.chunker.plan(encoder, info) for encoder in encoders)
+
+    def _job_duplicate(
+        self, input_path: Path, outputs: Sequence[Path]
+    ) -> Optional[Tuple[Path, bool]]:
+        """``find_duplicate`` for a job writing to ``outputs`` or their partials."""
+        return self.find_duplicate(input_path, [final_path(path) for path in outputs])
+
+    def loudness_analyzer(self, input_path: Path) -> Optional[PcmAnalyzer]:
+        """
+        Return an analyzer for the loudness of the input, if it is measured.
+
+        An album image gets one meter per track of its cue sheet.
+        """
+        if not self.loudness:
+            return None
+        info = read_stream_info(input_path)
+        if info is None:
+            logger.warning(f"Not measuring loudness of {input_path}: no STREAMINFO")
+            return None
+        image = self.album_image(input_path)
+        starts = [track.start for track in image.tracks[1:]] if image else []
+        return PcmAnalyzer(info.sample_rate, info.channels, starts)
 
     def convert(self, input_path: Path, output_path: Path) -> Path:
         """
         Convert a single FLAC file to the specified output format.
 
+        The file is encoded and tagged under a temporary name in the output
+        directory and renamed to ``output_path`` only once it is complete. The
+        outputs of extra targets are written alongside in the same way.
+
         Args:
             input_path (Path): Path to the input FLAC file.
             output_path (Path): Path for the output file.
@@ -38,42 +449,286 @@ class SingleFileConverter:
             ConversionError: If there's an error during conversion.
         """
         try:
-            audio = AudioSegment.from_file(input_path, format="flac")
-            audio.export(output_path, format=self.output_format.value)
-            self._copy_metadata(input_path, output_path)
-            logger.info(f"Converted {input_path} to {output_path}")
+            outputs = [output_path, *self.extra_outputs(output_path)]
+            for path in outputs[1:]:
+                path.parent.mkdir(parents=True, exist_ok=True)
+            with atomic_outputs(outputs, sync=self.sync_output) as partials:
+                analyzer = self.loudness_analyzer(input_path)
+                timings = self.transcode(input_path, *partials, analyzer=analyzer)
+                loudness = analyzer.results() if analyzer else []
+                timings.merge(
+                    self.write_metadata(
+                        input_path,
+                        *partials,
+                        loudness=loudness,
+                        linked=timings.linked,
+                    )
+                )
+            logger.info(
+                f"Converted {input_path} to {output_path} ({timings.describe()})"
+            )
             return output_path
         except Exception as e:
             logger.error(f"Error converting {input_path}: {str(e)}")
             raise ConversionError(f"Failed to convert {input_path}: {str(e)}")
 
-    def _copy_metadata(self, src_path: Path, dest_path: Path) -> None:
-        """Copy metadata from the source FLAC file to the destination file."""
-        src_audio = FLAC(src_path)
-        dest_audio = MutagenFile(dest_path, easy=True)
-        for tag in src_audio:
-            if tag in EasyID3.valid_keys.keys():
-                dest_audio[tag] = src_audio[tag]
-        dest_audio.save()
+    def transcode(
+        self,
+        input_path: Path,
+        output_path: Path,
+        *extra_outputs: Path,
+        analyzer: Optional[PcmAnalyzer] = None,
+    ) -> StageTimings:
+        """
+        Encode the audio of the input file to the output path, without tags.
+
+        ``extra_outputs`` receive the audio for the extra targets, in order;
+        the backend decodes the source once and feeds every encoder from it.
+        With chunking enabled, long files are encoded as parallel segments. An
+        album image with a cue sheet is decoded once and cut into one file per
+        track inside ``output_path``, which is then a directory. Segmented and
+        split encodes run once per target. Audio found in the duplicate index
+        is not encoded again; the earlier output is linked or copied instead.
+
+        The ``analyzer`` is fed the PCM the encoders get from the same decode.
+        Segmented encodes and reused outputs never decode the whole input in
+        one process, so for those it costs one extra decode.
+
+        Returns:
+            StageTimings: Decode and encode times and the input size.
+        """
+        timings = StageTimings()
+        timings.add_bytes("input", input_path.stat().st_size)
+        outputs = list(
+            zip([output_path, *extra_outputs], self.encoders_for(input_path))
+        )
+        duplicate = self._job_duplicate(input_path, [path for path, _ in outputs])
+        if duplicate and self._reuse(input_path, outputs, *duplicate, timings):
+            self._measure(input_path, analyzer, timings)
+            return timings
+        image = self.album_image(input_path)
+        if image:
+            logger.info(f"Splitting {input_path} into {len(image.tracks)} tracks")
+            for index, (path, encoder) in enumerate(outputs):
+                path.mkdir(parents=True, exist_ok=True)
+                tracks = [
+                    (
+                        track.start,
+                        track.end,
+                        path / image.track_filename(track, encoder.extension),
+                    )
+                    for track in image.tracks
+                ]
+                # The first split also hands the decoded image to the analyzer.
+                pcm = analyzer is not None and index == 0
+                with timings.stage(ENCODE):
+                    self.backend.run(
+                        self.backend.build_split_command(
+                            input_path, tracks, encoder, pcm=pcm
+                        ),
+                        analyzer.feed_bytes if pcm else None,
+                    )
+            return timings
+        if self.chunker:
+            info = self._segment_info(read_stream_info(input_path))
+            plans = [
+                (path, encoder, self.chunker.plan(encoder, info))
+                for path, encoder in outputs
+            ]
+            if any(segments for _, _, segments in plans):
+                for path, encoder, segments in plans:
+                    if segments:
+                        self.chunker.transcode(
+                            input_path, path, encoder, info, segments, timings
+                        )
+                    else:
+                        self.backend.transcode(input_path, path, encoder, timings)
+                self._measure(input_path, analyzer, timings)
+                return timings
+        backend = self.backend
+        if self._streams_instead(input_path):
+            logger.info(
+                f"Streaming {input_path} through ffmpeg to fit the memory budget"
+            )
+            backend = FFmpegBackend()
+        backend.transcode(input_path, *outputs[0], timings, outputs[1:], analyzer)
+        return timings
+
+    @staticmethod
+    def _measure(
+        input_path: Path, analyzer: Optional[PcmAnalyzer], timings: StageTimings
+    ) -> None:
+        """Decode the input only to measure its loudness."""
+        if analyzer is None:
+            return
+        backend = FFmpegBackend()
+        with timings.stage(LOUDNESS):
+            backend.run(backend.build_decode_command(input_path), analyzer.feed_bytes)
+
+    def _reuse(
+        self,
+        input_path: Path,
+        outputs: List[Tuple[Path, EncoderProfile]],
+        existing: Path,
+        same_tags: bool,
+        timings: StageTimings,
+    ) -> bool:
+        """
+        Fill the outputs from an earlier encode of the same audio.
+
+        A source with the same tags gets a hard link, since its converted file
+        would be byte for byte identical, and ``timings.linked`` is set so
+        ``write_metadata`` leaves the outputs alone. Otherwise the file is
+        copied and retagged.
+        """
+        sources = [existing, *self.extra_outputs(existing)]
+        if not all(source.is_file() for source in sources):
+            return False
+        with timings.stage(REUSE):
+            for (path, _), source in zip(outputs, sources):
+                if same_tags:
+                    try:
+                        os.link(source, path)
+                        continue
+                    except OSError:
+                        pass
+                shutil.copyfile(source, path)
+        timings.linked = same_tags
+        logger.info(
+            f"Reusing the encode of {existing} for identical audio {input_path}"
+        )
+        return True
+
+    def write_metadata(
+        self,
+        src_path: Path,
+        dest_path: Path,
+        *extra_outputs: Path,
+        loudness: Sequence[Loudness] = (),
+        linked: bool = False,
+    ) -> StageTimings:
+        """
+        Copy tags and, if enabled, cover art to the encoded files.
+
+        The source is parsed once, or not at all when the probe cache has it,
+        and the destination tags are built in memory and written with a single
+        save per output. With ``sync_output`` the files are then flushed to
+        disk. For an album image, every track in the ``dest_path`` directory
+        gets the image's tags merged with its tags from the cue.
+
+        ``loudness`` holds the measured loudness of every track, written as
+        ReplayGain and Sound Check tags in the same save. The tracks of an
+        album image also get the album gain of the whole image. With
+        ``linked`` the outputs were filled from an identically tagged earlier
+        encode (see ``_reuse``) and are left unchanged.
 
+        Returns:
+            StageTimings: Metadata, cover and fsync times, the output size and
+            the audio duration.
+        """
+        timings = StageTimings()
+        cache = get_probe_cache(self.probe_cache) if self.probe_cache else None
+        with timings.stage(METADATA):
+            metadata = cache.read(src_path) if cache else read_source_metadata(src_path)
+        timings.audio_seconds = metadata.duration
+
+        cover = None
         if self.include_cover:
-            self._copy_cover_art(src_path, dest_path)
-
-    def _copy_cover_art(self, src_path: Path, dest_path: Path) -> None:
-        """Copy cover art from the source FLAC file to the destination file."""
-        src_audio = FLAC(src_path)
-        dest_audio = ID3(dest_path)
-        for picture in src_audio.pictures:
-            dest_audio.add(
-                APIC(
-                    encoding=3,  # 3 is for utf-8
-                    mime=picture.mime,
-                    type=3,  # 3 is for the cover(front) image
-                    desc="Cover",
-                    data=picture.data,
+            with timings.stage(COVER):
+                cover = resolve_cover(metadata, get_artwork_cache(self.artwork_options))
+            if cover is not None:
+                timings.add_bytes("cover", len(cover.data))
+
+        tags = loudness_tags(loudness[0]) if loudness else {}
+        files = [
+            (metadata, path, encoder, tags)
+            for path, encoder in self._outputs(dest_path, extra_outputs)
+        ]
+        image = self.album_image(src_path)
+        if image:
+            sample_rate = read_stream_info(src_path).sample_rate
+            album = Loudness.combine(loudness) if loudness else None
+            tracks = [
+                (
+                    track,
+                    image.track_metadata(metadata, track, sample_rate),
+                    loudness_tags(loudness[index], album) if loudness else {},
                 )
-            )
-        dest_audio.save(v2_version=3)
+                for index, track in enumerate(image.tracks)
+            ]
+            files = [
+                (
+                    track_metadata,
+                    path / image.track_filename(track, encoder.extension),
+                    encoder,
+                    track_tags,
+                )
+                for _, path, encoder, _ in files
+                for track, track_metadata, track_tags in tracks
+            ]
+
+        for file_metadata, target_path, encoder, file_tags in files:
+            if linked:
+                timings.add_bytes("output", target_path.stat().st_size)
+                continue
+            with timings.stage(METADATA):
+                write_tags(
+                    file_metadata, target_path, cover, encoder.tag_format, file_tags
+                )
+            self._sync(target_path, timings)
+            timings.add_bytes("output", target_path.stat().st_size)
+        return timings
+
+    def write_album_loudness(self, output_path: Path, album: Loudness) -> None:
+        """
+        Add the album gain to a converted track and its extra target copies.
+
+        Called once every track of the album is measured. The tags are
+        written in place; a directory run records the track only afterwards,
+        so an update cut short leaves a track the next run converts again. A
+        file hard linked to the encode of a duplicate is split from it first,
+        so the other album keeps its own gain.
+
+        Args:
+            output_path (Path): The main output of the track.
+            album (Loudness): Loudness of the whole album.
+        """
+        tags = loudness_tags(None, album)
+        if not tags:
+            return
+        timings = StageTimings()
+        for path, encoder in self._outputs(
+            output_path, self.extra_outputs(output_path)
+        ):
+            try:
+                if path.stat().st_nlink > 1:
+                    self._split_link(path)
+                update_loudness_tags(path, tags, encoder.tag_format)
+                self._sync(path, timings)
+            except Exception as e:
+                logger.warning(f"Could not write album gain to {path}: {str(e)}")
+
+    @staticmethod
+    def _split_link(path: Path) -> None:
+        """Give a hard linked file a copy of the data of its own."""
+        temporary = partial_path(path)
+        try:
+            shutil.copyfile(path, temporary)
+            os.replace(temporary, path)
+        except BaseException:
+            temporary.unlink(missing_ok=True)
+            raise
+
+    def _sync(self, path: Path, timings: StageTimings) -> None:
+        """Flush a written file to disk if ``sync_output`` is on."""
+        if not self.sync_output:
+            return
+        with timings.stage(FSYNC):
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
 
     @staticmethod
     def has_cover(audio_file: Path) -> bool:
@@ -104,56 +759,471 @@ class AudioConverter:
     def __init__(
         self,
         output_format: AudioFormat = AudioFormat.MP3,
-        num_threads: int = 4,
+        num_threads: Optional[int] = None,
         include_cover: bool = True,
+        backend: ConversionBackend = ConversionBackend.FFMPEG,
+        max_encoders: Optional[int] = None,
+        metadata_processes: Optional[int] = None,
+        incremental: bool = False,
+        exclude: Iterable[str] = (),
+        artwork_options: Optional[ArtworkOptions] = None,
+        preset: Optional[str] = None,
+        sync_output: bool = False,
+        resumable: bool = True,
+        order: JobOrder = JobOrder.SCAN,
+        chunking: Optional[ChunkingOptions] = None,
+        split_cue: bool = False,
+        extra_targets: Sequence[OutputTarget] = (),
+        probe_cache: bool = False,
+        deduplicate: bool = False,
+        memory_budget: Optional[int] = None,
+        loudness: bool = False,
+        downconvert: Optional[DownconvertOptions] = None,
     ):
         self.output_format = output_format
+        self.encoder = resolve_encoder(output_format, preset)
+        self.loudness = loudness
+        self.downconvert = downconvert
+        self.extra_targets = list(extra_targets)
+        self.probe_cache = probe_cache
+        self.deduplicate = deduplicate
+        self.memory_budget = memory_budget
+        self.sync_output = sync_output
+        self.resumable = resumable
+        self.order = order
         self.num_threads = num_threads
+        self.max_encoders = max_encoders
+        self.metadata_processes = metadata_processes
         self.include_cover = include_cover
+        self.backend = backend
+        self.incremental = incremental
+        self.exclude = tuple(exclude)
+        self.artwork_options = artwork_options
+        self.chunking = chunking
+        # Album images become a directory of tracks; only ffmpeg can cut them.
+        self.split_cue = split_cue and backend == ConversionBackend.FFMPEG
+
+    def ffmpeg_requirements(self) -> Tuple[List[str], List[str], List[str]]:
+        """
+        Return the ffmpeg encoders, filters and libraries this configuration uses.
+
+        Returns:
+            Tuple[List[str], List[str], List[str]]: Encoder names, filter names
+                and names of external libraries ffmpeg must be built with.
+        """
+        return self.create_file_converter().ffmpeg_requirements()
+
+    def create_file_converter(
+        self,
+        output_root: Optional[Path] = None,
+        probe_cache: Optional[Path] = None,
+        duplicate_index: Optional[Path] = None,
+    ) -> SingleFileConverter:
+        """
+        Create the per-file converter configured like this converter.
+
+        Args:
+            output_root (Optional[Path]): Root of the main output tree, which
+                the extra targets mirror.
+            probe_cache (Optional[Path]): Probe cache database to use.
+            duplicate_index (Optional[Path]): Duplicate index database to use.
+        """
+        return SingleFileConverter(
+            self.output_format,
+            self.include_cover,
+            self.backend,
+            artwork_options=self.artwork_options,
+            preset=self.encoder.name,
+            sync_output=self.sync_output,
+            chunking=self.chunking,
+            split_cue=self.split_cue,
+            extra_targets=self.extra_targets,
+            output_root=output_root,
+            probe_cache=probe_cache,
+            duplicate_index=duplicate_index,
+            memory_budget=self.memory_budget,
+            loudness=self.loudness,
+            downconvert=self.downconvert,
+        )
 
     def convert_directory(
         self,
         input_dir: Path,
         output_dir: Optional[Path] = None,
         progress_callback: Optional[Callable[[int, int], None]] = None,
+        result_callback: Optional[Callable[[ConversionResult], None]] = None,
+        dry_run: bool = False,
+        profile: Optional[RunProfile] = None,
+        profiler: Optional[CpuProfiler] = None,
+        progress: Optional[ProgressTracker] = None,
     ) -> List[Path]:
         """
         Convert all FLAC files in a directory to the specified output format using parallel processing.
 
+        By default files are handed to the workers as soon as the scanner
+        finds them, and while the scan is still running the total passed to
+        ``progress_callback`` is the number of files found so far. At most
+        ``MAX_PENDING_JOBS`` files are queued at once. Other values of
+        ``order`` scan the whole library first and start the biggest jobs
+        first, so one long file does not hold up the end of the run.
+
+        In incremental mode a manifest next to the output is consulted, files
+        whose content and settings are unchanged are skipped, and outputs of
+        sources that no longer exist are deleted.
+
+        Every output is written under a temporary name and renamed into place
+        once complete. Unless ``resumable`` is off, finished files are also
+        recorded in a journal next to the output, so a run that is interrupted
+        picks up where it stopped; the journal is removed when a run completes.
+
+        Args:
+            input_dir (Path): Input directory containing FLAC files.
+            output_dir (Optional[Path]): Output directory for converted files.
+            progress_callback (Optional[Callable[[int, int], None]]): Callback function to report progress.
+            result_callback (Optional[Callable[[ConversionResult], None]]): Called
+                with the outcome of every file, including skipped and failed ones.
+            dry_run (bool): Only report which files would be converted; nothing
+                is written and the manifest is left untouched.
+            profile (Optional[RunProfile]): Receives scan time and the stage
+                timings of every converted file.
+            profiler (Optional[CpuProfiler]): Collects a cProfile of the run.
+            progress (Optional[ProgressTracker]): Aggregates throughput, ETA and
+                worker state for front ends that redraw on a timer.
+
+        Returns:
+            List[Path]: List of paths to converted files.
+        """
+        run = _DirectoryRun(
+            self,
+            input_dir,
+            output_dir,
+            progress_callback,
+            result_callback,
+            dry_run,
+            profile,
+            progress,
+        )
+        scheduler = ConversionScheduler(
+            max_workers=self.num_threads,
+            max_encoders=self.max_encoders,
+            metadata_processes=self.metadata_processes,
+            profiler=profiler,
+            progress=progress,
+            memory=self._memory_governor(),
+        )
+        completed: "Queue[Future]" = Queue()
+        pending: Dict[Future, Tuple[Path, Path]] = {}
+
+        def collect(future: Future) -> None:
+            flac_file, output_path = pending.pop(future)
+            try:
+                result = future.result()
+            except ConversionError as e:
+                result = ConversionResult(
+                    flac_file, output_path, ConversionStatus.FAILED, error=str(e)
+                )
+            run.complete(result)
+
+        try:
+            with scheduler:
+                for flac_file, output_path in run.plan():
+                    future = scheduler.submit(run.converter, flac_file, output_path)
+                    pending[future] = (flac_file, output_path)
+                    future.add_done_callback(completed.put)
+
+                    # Report work finished while the scan is still running,
+                    # and stop scanning ahead while the queue is full.
+                    while not completed.empty() or len(pending) >= MAX_PENDING_JOBS:
+                        collect(completed.get())
+
+                while pending:
+                    collect(completed.get())
+            run.finish()
+        finally:
+            run.close()
+
+        return run.converted_files
+
+    async def convert_directory_async(
+        self,
+        input_dir: Path,
+        output_dir: Optional[Path] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        result_callback: Optional[Callable[[ConversionResult], None]] = None,
+        engine: Optional[AsyncConversionEngine] = None,
+        profile: Optional[RunProfile] = None,
+        progress: Optional[ProgressTracker] = None,
+    ) -> List[Path]:
+        """
+        Convert a directory like ``convert_directory``, driven by asyncio.
+
+        Encoders run as asyncio subprocesses fed from a bounded queue. Pass an
+        ``engine`` to be able to pause, resume or cancel the run from another
+        thread; cancelling kills in-flight encoders, discards their partial
+        output and keeps the journal so the next run resumes.
+
         Args:
             input_dir (Path): Input directory containing FLAC files.
             output_dir (Optional[Path]): Output directory for converted files.
             progress_callback (Optional[Callable[[int, int], None]]): Callback function to report progress.
+            result_callback (Optional[Callable[[ConversionResult], None]]): Called
+                with the outcome of every file.
+            engine (Optional[AsyncConversionEngine]): Engine to run on.
+            profile (Optional[RunProfile]): Receives scan time and the stage
+                timings of every converted file.
+            progress (Optional[ProgressTracker]): Aggregates throughput, ETA and
+                worker state for front ends that redraw on a timer.
 
         Returns:
             List[Path]: List of paths to converted files.
         """
-        flac_files = list(input_dir.glob("**/*.flac"))
-        total_files = len(flac_files)
-        converted_files = []
+        engine = engine or AsyncConversionEngine(
+            max_encoders=self.max_encoders or self.num_threads,
+            metadata_processes=self.metadata_processes,
+        )
+        run = _DirectoryRun(
+            self,
+            input_dir,
+            output_dir,
+            progress_callback,
+            result_callback,
+            False,
+            profile,
+            progress,
+        )
+        try:
+            await engine.run(
+                run.converter,
+                run.plan(),
+                run.complete,
+                progress,
+                self._memory_governor(),
+            )
+            if not engine.cancelled:
+                run.finish()
+        finally:
+            run.close()
 
-        with ThreadPoolExecutor(max_workers=self.num_threads) as executor:
-            future_to_file = {}
-            for flac_file in flac_files:
-                output_path = self._get_output_path(flac_file, input_dir, output_dir)
-                output_path.parent.mkdir(parents=True, exist_ok=True)
+        return run.converted_files
 
-                converter = SingleFileConverter(self.output_format, self.include_cover)
-                future = executor.submit(converter.convert, flac_file, output_path)
-                future_to_file[future] = flac_file
+    def convert_directory_distributed(
+        self,
+        input_dir: Path,
+        spool_dir: Path,
+        output_dir: Optional[Path] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        result_callback: Optional[Callable[[ConversionResult], None]] = None,
+        profile: Optional[RunProfile] = None,
+        progress: Optional[ProgressTracker] = None,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        poll_interval: float = 1.0,
+        max_queued: int = DEFAULT_MAX_QUEUED,
+    ) -> List[Path]:
+        """
+        Convert a directory with workers on other processes or hosts.
+
+        This process plans the jobs like ``convert_directory`` (scan, order,
+        manifest and journal checks) into a job spool and collects the results
+        that workers started with ``run_worker`` report back. Workers on hosts
+        that mount the library, the output and the spool at the same paths
+        can join or leave at any time; jobs of workers that stop responding
+        are handed to others once their lease expires.
 
-            for i, future in enumerate(as_completed(future_to_file)):
-                flac_file = future_to_file[future]
+        The probe cache and the duplicate index are SQLite databases, which
+        cannot be shared safely over network filesystems, so neither can be
+        enabled for a distributed run.
+
+        Args:
+            input_dir (Path): Input directory containing FLAC files.
+            spool_dir (Path): Shared directory holding the job queue.
+            output_dir (Optional[Path]): Output directory for converted files.
+            progress_callback (Optional[Callable[[int, int], None]]): Callback function to report progress.
+            result_callback (Optional[Callable[[ConversionResult], None]]): Called
+                with the outcome of every file.
+            profile (Optional[RunProfile]): Receives scan time and the stage
+                timings of every converted file.
+            progress (Optional[ProgressTracker]): Aggregates throughput, ETA and
+                worker state for front ends that redraw on a timer.
+            lease_seconds (float): Time after which a silent worker's job is
+                reclaimed.
+            poll_interval (float): Seconds between checks for results.
+            max_queued (int): Jobs kept in the spool at once; more are queued
+                as results come in.
+
+        Returns:
+            List[Path]: List of paths to converted files.
+
+        Raises:
+            ValueError: If the probe cache or duplicate detection is enabled.
+        """
+        if self.probe_cache or self.deduplicate:
+            logger.error(
+                "The probe cache and duplicate detection need a local SQLite "
+                "database and cannot be used with distributed workers"
+            )
+            raise ValueError(
+                "probe_cache and deduplicate are not supported for distributed runs"
+            )
+        run = _DirectoryRun(
+            self,
+            input_dir,
+            output_dir,
+            progress_callback,
+            result_callback,
+            False,
+            profile,
+            progress,
+        )
+        try:
+            spool = JobSpool.create(
+                spool_dir, run.converter.to_config(), lease_seconds=lease_seconds
+            )
+            outstanding: Set[str] = set()
+
+            def collect() -> None:
+                for job_id, result in spool.collect():
+                    if job_id in outstanding:
+                        outstanding.discard(job_id)
+                        run.complete(result)
+
+            def wait(limit: int) -> None:
+                while len(outstanding) > limit:
+                    time.sleep(poll_interval)
+                    spool.reclaim_expired()
+                    collect()
+
+            for flac_file, output_path in run.plan():
+                wait(max_queued - 1)
+                outstanding.add(spool.enqueue(flac_file, output_path))
+                collect()
+            spool.close()
+            logger.info(f"Queued all jobs in {spool_dir}; waiting for workers")
+            wait(0)
+            run.finish()
+        finally:
+            run.close()
+
+        return run.converted_files
+
+    def watch_directory(
+        self,
+        input_dir: Path,
+        output_dir: Optional[Path] = None,
+        result_callback: Optional[Callable[[ConversionResult], None]] = None,
+        stop: Optional[Event] = None,
+        settle_seconds: float = DEFAULT_SETTLE_SECONDS,
+        poll_interval: Optional[float] = None,
+        catch_up: bool = True,
+    ) -> List[Path]:
+        """
+        Convert FLAC files as they are added to or changed in a directory.
+
+        Runs until ``stop`` is set. The directory is watched with inotify, or
+        polled where that is not available, and each file is converted once it
+        stopped changing for ``settle_seconds``, so files still being copied
+        or ripped are left alone. Only the files that changed are looked at;
+        the library is not scanned again. With ``catch_up``, files added while
+        nothing was watching are converted first by ``convert_directory``.
+
+        Combine with ``incremental`` so restarts do not convert files again;
+        the manifest, not a run journal, is what a restart picks up from.
+        Outputs of deleted sources are removed by the next catch-up run.
+
+        Args:
+            input_dir (Path): Directory to watch.
+            output_dir (Optional[Path]): Output directory for converted files.
+            result_callback (Optional[Callable[[ConversionResult], None]]): Called
+                with the outcome of every file.
+            stop (Optional[Event]): Set to stop watching; conversions in
+                progress are finished first.
+            settle_seconds (float): Time a file must be unchanged for.
+            poll_interval (Optional[float]): Poll every this many seconds
+                instead of using inotify.
+            catch_up (bool): Convert files that are not up to date before
+                watching.
+
+        Returns:
+            List[Path]: List of paths to converted files.
+        """
+        converted_files: List[Path] = []
+        # Watching starts before catching up, so no file falls in between.
+        with create_watcher(input_dir, self.exclude, poll_interval) as watcher:
+            if catch_up:
+                converted_files += self.convert_directory(
+                    input_dir, output_dir, result_callback=result_callback
+                )
+            # No journal: a daemon's would grow with every file and be replayed
+            # on restart, while the manifest already records each conversion
+            # as it completes. Partial outputs of a killed daemon are removed
+            # here instead of on resume.
+            run = _DirectoryRun(
+                self,
+                input_dir,
+                output_dir,
+                None,
+                result_callback,
+                False,
+                None,
+                journal=False,
+            )
+            run._remove_partials(output_dir or input_dir)
+            settled = SettledFiles(settle_seconds)
+            running: Dict[Future, Tuple[Path, Path]] = {}
+            scheduler = ConversionScheduler(
+                max_workers=self.num_threads,
+                max_encoders=self.max_encoders,
+                metadata_processes=self.metadata_processes,
+                memory=self._memory_governor(),
+            )
+
+            def collect(future: Future) -> None:
+                flac_file, output_path = running.pop(future)
                 try:
-                    converted_file = future.result()
-                    converted_files.append(converted_file)
+                    result = future.result()
                 except ConversionError as e:
-                    logger.warning(f"Skipping file due to conversion error: {str(e)}")
+                    result = ConversionResult(
+                        flac_file, output_path, ConversionStatus.FAILED, error=str(e)
+                    )
+                run.complete(result)
+
+            logger.info(f"Watching {input_dir} for new FLAC files")
+            try:
+                with scheduler:
+                    while not (stop and stop.is_set()):
+                        timeout = (
+                            BUSY_TICK_SECONDS
+                            if settled or running
+                            else IDLE_TICK_SECONDS
+                        )
+                        for path in watcher.changes(timeout):
+                            settled.touch(path)
+
+                        in_flight = {source for source, _ in running.values()}
+                        ready = []
+                        for path in settled.ready():
+                            if path in in_flight:
+                                # Looked at again once the running job is done.
+                                settled.touch(path)
+                            else:
+                                ready.append(path)
+                        for flac_file, output_path in run.plan_files(ready):
+                            future = scheduler.submit(
+                                run.converter, flac_file, output_path
+                            )
+                            running[future] = (flac_file, output_path)
+
+                        for future in [f for f in running if f.done()]:
+                            collect(future)
+                    wait(list(running))
+                    for future in list(running):
+                        collect(future)
+            finally:
+                run.close()
 
-                if progress_callback:
-                    progress_callback(i + 1, total_files)
+        return converted_files + run.converted_files
 
-        return converted_files
+    def _memory_governor(self) -> Optional[MemoryGovernor]:
+        return MemoryGovernor(self.memory_budget) if self.memory_budget else None
 
     def _get_output_path(
         self, flac_file: Path, input_dir: Path, output_dir: Optional[Path]
@@ -167,12 +1237,318 @@ class AudioConverter:
             output_dir (Optional[Path]): Output directory path, if specified.
 
         Returns:
-            Path: Output path for the converted file.
+            Path: Output path for the converted file, or the directory of its
+            tracks if it is an album image to split.
         """
+        suffix = f".{self.encoder.extension}"
+        if self.split_cue and load_album_image(flac_file):
+            suffix = ""
         if output_dir:
             relative_path = flac_file.relative_to(input_dir)
-            return output_dir / relative_path.with_suffix(
-                f".{self.output_format.value}"
-            )
+            return output_dir / relative_path.with_suffix(suffix)
         else:
-            return flac_file.with_suffix(f".{self.output_format.value}")
+            return flac_file.with_suffix(suffix)
+
+
+class _DirectoryRun:
+    """
+    Bookkeeping of one directory conversion.
+
+    Plans the jobs (scan, output paths, manifest checks), reports results to
+    the callbacks, the manifest, the run profile and the progress tracker, and
+    cleans up at the end. When loudness is measured, it also writes the album
+    gain once every track of an album (a source directory) is converted.
+    Shared by the thread pool and asyncio runners; ``plan`` may run on a
+    different thread than ``complete``.
+    """
+
+    def __init__(
+        self,
+        owner: AudioConverter,
+        input_dir: Path,
+        output_dir: Optional[Path],
+        progress_callback: Optional[Callable[[int, int], None]],
+        result_callback: Optional[Callable[[ConversionResult], None]],
+        dry_run: bool,
+        profile: Optional[RunProfile],
+        progress: Optional[ProgressTracker] = None,
+        journal: bool = True,
+    ):
+        self.owner = owner
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.progress_callback = progress_callback
+        self.result_callback = result_callback
+        self.dry_run = dry_run
+        self.profile = profile
+        self.progress = progress
+
+        manifest_dir = output_dir or input_dir
+        self.scanner = LibraryScanner(input_dir, exclude=owner.exclude)
+        self.duplicates: Optional[DuplicateIndex] = None
+        if owner.deduplicate and not dry_run:
+            manifest_dir.mkdir(parents=True, exist_ok=True)
+            self.duplicates = get_duplicate_index(
+                manifest_dir / DUPLICATE_INDEX_FILENAME
+            )
+        self.converter = owner.create_file_converter(
+            output_root=manifest_dir,
+            probe_cache=(
+                manifest_dir / PROBE_CACHE_FILENAME
+                if owner.probe_cache and not dry_run
+                else None
+            ),
+            duplicate_index=self.duplicates.path if self.duplicates else None,
+        )
+        self.settings = self.converter.settings_key()
+        self.converted_files: List[Path] = []
+        self.seen_files: Set[Path] = set()
+        self.processed = 0
+        self._lock = Lock()
+        # Converted tracks waiting for their album gain by source directory,
+        # and how many files the scanner found in each.
+        self._albums: Dict[Path, List[ConversionResult]] = {}
+        self._album_sizes: Dict[Path, int] = {}
+        self._partial_albums: Set[Path] = set()
+        # Album gain is written here rather than on the thread collecting
+        # results.
+        self._album_writer: Optional[ThreadPoolExecutor] = None
+        if owner.loudness and not dry_run:
+            self._album_writer = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="album-gain"
+            )
+
+        self.manifest: Optional[ConversionManifest] = None
+        # A dry run reads an existing manifest but never creates one.
+        if owner.incremental and (
+            not dry_run or (manifest_dir / MANIFEST_FILENAME).exists()
+        ):
+            self.manifest = ConversionManifest.for_directory(manifest_dir)
+
+        self.journal: Optional[RunJournal] = None
+        if owner.resumable and journal:
+            self.journal = RunJournal.for_directory(
+                manifest_dir, writable=not dry_run, sync=owner.sync_output
+            )
+            if self.journal and self.journal.interrupted and not dry_run:
+                self._remove_partials(manifest_dir)
+
+    def _remove_partials(self, output_root: Path) -> None:
+        """Delete the temporaries a killed run left in the output trees."""
+        roots = [output_root, *(t.directory for t in self.converter.extra_targets)]
+        removed = sum(remove_partials(root) for root in roots if root.is_dir())
+        if removed:
+            logger.info(f"Removed {removed} partial outputs of the interrupted run")
+
+    def plan(self) -> Iterator[Tuple[Path, Path]]:
+        """
+        Yield the (source, output) pairs that need converting.
+
+        Files that are up to date, or every file in a dry run, are reported
+        right away instead of being yielded. Unless the owner's order is
+        ``JobOrder.SCAN``, the whole library is scanned and sorted first. With
+        duplicate detection, further copies of audio already queued in this
+        run are held back until the end, so they can reuse its encode.
+        """
+        jobs: Iterable[Tuple[Path, Path]] = self._scan()
+        if self.owner.order != JobOrder.SCAN:
+            jobs = order_jobs(jobs, self.owner.order)
+        if self.duplicates:
+            jobs = self._defer_duplicates(jobs)
+
+        for flac_file, output_path in jobs:
+            if self.dry_run:
+                self.report(
+                    ConversionResult(flac_file, output_path, ConversionStatus.PLANNED)
+                )
+                continue
+
+            for path in (output_path, *self.converter.extra_outputs(output_path)):
+                path.parent.mkdir(parents=True, exist_ok=True)
+            yield flac_file, output_path
+
+    @staticmethod
+    def _defer_duplicates(
+        jobs: Iterable[Tuple[Path, Path]],
+    ) -> Iterator[Tuple[Path, Path]]:
+        seen: Set[str] = set()
+        deferred: List[Tuple[Path, Path]] = []
+        for job in jobs:
+            md5 = audio_md5(job[0])
+            if md5 is None or md5 not in seen:
+                if md5 is not None:
+                    seen.add(md5)
+                yield job
+            else:
+                deferred.append(job)
+        yield from deferred
+
+    def plan_files(self, files: Iterable[Path]) -> Iterator[Tuple[Path, Path]]:
+        """
+        Yield the given files like ``plan``, without scanning the library.
+
+        Used to convert files as they appear; ``finish`` must not be called
+        afterwards, since the files seen are not the whole library.
+        """
+        for flac_file in files:
+            job = self._check(flac_file)
+            if job:
+                for path in (job[1], *self.converter.extra_outputs(job[1])):
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                yield job
+
+    def _scan(self) -> Iterator[Tuple[Path, Path]]:
+        """Yield the files found by the scanner that are not up to date."""
+        for flac_file in self.scanner:
+            self.seen_files.add(flac_file)
+            album = flac_file.parent
+            self._album_sizes[album] = self._album_sizes.get(album, 0) + 1
+            job = self._check(flac_file)
+            if job:
+                yield job
+
+        if self.progress:
+            self.progress.set_found(self.scanner.count, finished=True)
+
+    def _check(self, flac_file: Path) -> Optional[Tuple[Path, Path]]:
+        """Return the job for a file, or report it as skipped if up to date."""
+        output_path = self.owner._get_output_path(
+            flac_file, self.input_dir, self.output_dir
+        )
+        if (
+            (
+                self.manifest
+                and self.manifest.is_up_to_date(flac_file, output_path, self.settings)
+            )
+            or (
+                self.journal
+                and self.journal.is_done(flac_file, output_path, self.settings)
+            )
+        ) and all(path.exists() for path in self.converter.extra_outputs(output_path)):
+            logger.debug(f"Skipping unchanged file {flac_file}")
+            # Its loudness is unknown, so the album gain cannot be computed.
+            self._partial_albums.add(flac_file.parent)
+            self.report(
+                ConversionResult(flac_file, output_path, ConversionStatus.SKIPPED)
+            )
+            return None
+        return flac_file, output_path
+
+    def complete(self, result: ConversionResult) -> None:
+        """Handle the outcome of a conversion yielded by ``plan``."""
+        if result.status == ConversionStatus.CONVERTED:
+            self.converted_files.append(result.output)
+            if self.duplicates:
+                self.duplicates.record(result.source, result.output, self.settings)
+        elif result.status == ConversionStatus.FAILED:
+            logger.warning(f"Skipping file due to conversion error: {result.error}")
+        held = self._add_to_album(result)
+        if result.status == ConversionStatus.CONVERTED and not held:
+            self._record(result)
+        self.report(result)
+
+    def _record(self, result: ConversionResult) -> None:
+        """Record a finished output in the manifest and the journal."""
+        if self.manifest:
+            self.manifest.record(result.source, result.output, self.settings)
+        if self.journal:
+            self.journal.append(result.source, result.output, self.settings)
+
+    def _add_to_album(self, result: ConversionResult) -> bool:
+        """
+        Collect the loudness of a track and tag its album when complete.
+
+        Returns:
+            bool: True if the track is held back, to be recorded once its
+            album gain is written.
+        """
+        album = result.source.parent
+        if self._album_writer is None or album not in self._album_sizes:
+            # Files converted as they appear are not counted per album.
+            return False
+        # Album images carry their own album gain; results from other hosts
+        # come without loudness.
+        if result.loudness is None or len(result.loudness) != 1:
+            self._partial_albums.add(album)
+        if album in self._partial_albums:
+            # The album gets no gain, so held back tracks are done.
+            for track in self._albums.pop(album, []):
+                self._record(track)
+            return False
+        self._albums.setdefault(album, []).append(result)
+        if self.scanner.finished:
+            self._write_album(album)
+        return True
+
+    def _write_album(self, album: Path) -> None:
+        """Queue the album gain if every track of the album was measured."""
+        tracks = self._albums.get(album, [])
+        if album in self._partial_albums or len(tracks) != self._album_sizes.get(album):
+            return
+        del self._albums[album]
+        self._album_writer.submit(self._tag_album, album, tracks)
+
+    def _tag_album(self, album: Path, tracks: List[ConversionResult]) -> None:
+        """Write the album gain to the tracks of an album, then record them."""
+        try:
+            gain = Loudness.combine([track.loudness[0] for track in tracks])
+            logger.info(f"Writing album gain of {album} to {len(tracks)} tracks")
+            for track in tracks:
+                self.converter.write_album_loudness(track.output, gain)
+                self._record(track)
+        except Exception as e:
+            logger.error(f"Error writing album gain of {album}: {str(e)}")
+
+    def report(self, result: ConversionResult) -> None:
+        """Pass a result to the profile and the callbacks."""
+        with self._lock:
+            self.processed += 1
+            if self.profile and result.status in (
+                ConversionStatus.CONVERTED,
+                ConversionStatus.FAILED,
+            ):
+                self.profile.add_file(
+                    result.timings,
+                    result.seconds,
+                    failed=result.status == ConversionStatus.FAILED,
+                )
+            if self.progress:
+                self.progress.set_found(self.scanner.count, self.scanner.finished)
+                self.progress.record(result)
+            if self.progress_callback:
+                self.progress_callback(self.processed, self.scanner.count)
+            if self.result_callback:
+                self.result_callback(result)
+
+    def finish(self) -> None:
+        """Finalize a run that went through the whole library."""
+        for album in list(self._albums):
+            self._write_album(album)
+        if self._album_writer:
+            self._album_writer.shutdown(wait=True)
+            self._album_writer = None
+        # Tracks of albums that were never complete keep their track gain.
+        for tracks in self._albums.values():
+            for track in tracks:
+                self._record(track)
+        self._albums.clear()
+        if self.manifest and not self.dry_run:
+            self.manifest.prune(
+                self.input_dir, self.seen_files, self.converter.extra_outputs
+            )
+        if self.journal and not self.dry_run:
+            self.journal.discard()
+
+    def close(self) -> None:
+        """Release resources, whether or not the run completed."""
+        if self._album_writer:
+            # Albums still queued stay unrecorded and are converted again.
+            self._album_writer.shutdown(wait=True, cancel_futures=True)
+            self._album_writer = None
+        if self.profile:
+            self.profile.add_stage(SCAN, self.scanner.seconds)
+            self.profile.finish()
+        if self.manifest:
+            self.manifest.close()
+        if self.journal:
+            self.journal.close()
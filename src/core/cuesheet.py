@@ -0,0 +1,285 @@
+import re
+import shlex
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from mutagen.flac import CueSheet, VCFLACDict
+
+from src.core.metadata import SourceMetadata, read_stream_info
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Cue sheet times are minutes:seconds:frames with 75 frames per second.
+CUE_FRAMES_PER_SECOND = 75
+
+_VORBIS_COMMENT = 4
+_CUESHEET = 5
+_LEAD_OUT_TRACKS = (170, 255)
+
+# Cue commands that map to tags of the whole album or of one track.
+_TEXT_FIELDS = {"TITLE": "title", "PERFORMER": "artist", "SONGWRITER": "composer"}
+_REM_FIELDS = {"DATE": "date", "GENRE": "genre", "COMMENT": "comment"}
+# Tags of the image that describe the image as a whole, not a track.
+_IMAGE_ONLY_TAGS = ("cuesheet", "title", "tracknumber", "tracktotal", "totaltracks")
+_UNSAFE_FILENAME = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+
+@dataclass
+class CueTrack:
+    """
+    One track of an album image.
+
+    Attributes:
+        number (int): Track number.
+        start (int): First sample of the track in the image.
+        end (Optional[int]): Sample after the last one, None for the last track.
+        tags (Dict[str, List[str]]): Tags from the cue sheet.
+    """
+
+    number: int
+    start: int
+    end: Optional[int] = None
+    tags: Dict[str, List[str]] = field(default_factory=dict)
+
+    @property
+    def title(self) -> str:
+        titles = self.tags.get("title")
+        return titles[0] if titles else f"Track {self.number:02d}"
+
+
+@dataclass
+class AlbumImage:
+    """
+    A single FLAC file holding a whole album, with the track layout of its cue.
+
+    Attributes:
+        source (Path): The FLAC image.
+        tracks (List[CueTrack]): Tracks in order, with sample boundaries.
+        tags (Dict[str, List[str]]): Album-level tags from the cue sheet.
+    """
+
+    source: Path
+    tracks: List[CueTrack]
+    tags: Dict[str, List[str]] = field(default_factory=dict)
+
+    def track_filename(self, track: CueTrack, extension: str) -> str:
+        """Return the output file name of a track, e.g. ``03 - Title.mp3``."""
+        title = _UNSAFE_FILENAME.sub("_", track.title).strip(" .")[:150]
+        return f"{track.number:02d} - {title}.{extension}"
+
+    def track_metadata(
+        self, image: SourceMetadata, track: CueTrack, sample_rate: int
+    ) -> SourceMetadata:
+        """
+        Build the metadata of one track.
+
+        Tags of the image are the base, album tags from the cue override them
+        and track tags from the cue override those. The album performer
+        becomes the album artist. Pictures are shared.
+
+        Args:
+            image (SourceMetadata): Metadata read from the FLAC image.
+            track (CueTrack): The track.
+            sample_rate (int): Sample rate of the image.
+        """
+        tags = {
+            key: values
+            for key, values in image.tags.items()
+            if key not in _IMAGE_ONLY_TAGS
+        }
+        tags.update(
+            {key: values for key, values in self.tags.items() if key != "title"}
+        )
+        if "title" in self.tags:
+            tags["album"] = self.tags["title"]
+        if "artist" in self.tags:
+            tags["albumartist"] = self.tags["artist"]
+        tags.update(track.tags)
+        tags["title"] = [track.title]
+        tags["tracknumber"] = [f"{track.number}/{len(self.tracks)}"]
+
+        end = track.end
+        if end is None:
+            end = int(image.duration * sample_rate)
+        return SourceMetadata(
+            tags=tags,
+            pictures=image.pictures,
+            duration=max(end - track.start, 0) / sample_rate,
+            cover_reference=image.cover_reference,
+        )
+
+
+def _cue_time(value: str) -> int:
+    minutes, seconds, frames = (int(part) for part in value.split(":"))
+    return (minutes * 60 + seconds) * CUE_FRAMES_PER_SECOND + frames
+
+
+def parse_cue(
+    text: str,
+) -> Tuple[
+    Dict[str, List[str]], List[Tuple[int, int, Dict[str, List[str]]]], List[str]
+]:
+    """
+    Parse the text of a cue sheet.
+
+    Args:
+        text (str): Contents of the cue sheet.
+
+    Returns:
+        Tuple: Album tags, the tracks as (number, INDEX 01 in cue frames, tags)
+            and the names of the referenced files.
+
+    Raises:
+        ValueError: If a line cannot be parsed.
+    """
+    album: Dict[str, List[str]] = {}
+    tracks: List[Tuple[int, int, Dict[str, List[str]]]] = []
+    files: List[str] = []
+    current: Optional[Dict[str, List[str]]] = None
+    number = 0
+    start: Optional[int] = None
+
+    def close_track() -> None:
+        if current is not None:
+            if start is None:
+                raise ValueError(f"Track {number} has no INDEX 01")
+            tracks.append((number, start, current))
+
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            parts = shlex.split(line, posix=True)
+        except ValueError:
+            parts = line.split()
+        command, args = parts[0].upper(), parts[1:]
+        target = album if current is None else current
+
+        if command == "FILE" and args:
+            files.append(args[0])
+        elif command == "TRACK" and args:
+            close_track()
+            number, start, current = int(args[0]), None, {}
+        elif command == "INDEX" and len(args) == 2 and current is not None:
+            if int(args[0]) == 1:
+                start = _cue_time(args[1])
+        elif command in _TEXT_FIELDS and args:
+            target[_TEXT_FIELDS[command]] = [" ".join(args)]
+        elif command == "ISRC" and args and current is not None:
+            current["isrc"] = [args[0]]
+        elif command == "REM" and len(args) >= 2 and args[0].upper() in _REM_FIELDS:
+            target[_REM_FIELDS[args[0].upper()]] = [" ".join(args[1:])]
+    close_track()
+    return album, tracks, files
+
+
+def _read_cue_text(path: Path) -> str:
+    data = path.read_bytes()
+    try:
+        return data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        # Older rippers write the system code page.
+        return data.decode("cp1252", errors="replace")
+
+
+def _read_embedded(path: Path) -> Tuple[Optional[str], Optional[CueSheet]]:
+    """
+    Return the CUESHEET tag and CUESHEET block of a FLAC file.
+
+    Walks the metadata block headers and only reads the two blocks of
+    interest, so embedded pictures are skipped rather than loaded.
+    """
+    text = None
+    block = None
+    with open(path, "rb") as f:
+        if f.read(4) != b"fLaC":
+            return None, None
+        last = False
+        while not last:
+            header = f.read(4)
+            if len(header) < 4:
+                break
+            last = bool(header[0] & 0x80)
+            kind = header[0] & 0x7F
+            size = int.from_bytes(header[1:], "big")
+            if kind == _VORBIS_COMMENT:
+                comments = VCFLACDict(f.read(size))
+                values = comments.get("cuesheet")
+                if values:
+                    text = values[0]
+            elif kind == _CUESHEET:
+                block = CueSheet(f.read(size))
+            else:
+                f.seek(size, 1)
+    return text, block
+
+
+def load_album_image(path: Path) -> Optional[AlbumImage]:
+    """
+    Return the track layout of a FLAC album image, if it has one.
+
+    A sidecar ``<name>.cue`` or ``<name>.flac.cue`` takes precedence over a
+    CUESHEET tag, which takes precedence over a binary CUESHEET block (which
+    has no titles). Cue sheets that reference more than one file describe
+    separate tracks, not an image, and are ignored. Any audio before the first
+    track's INDEX 01 (a pregap or hidden track) is kept in the first track.
+
+    Args:
+        path (Path): Path to the FLAC file.
+
+    Returns:
+        Optional[AlbumImage]: The layout, or None if the file is a plain track.
+    """
+    info = read_stream_info(path)
+    if info is None:
+        return None
+    rate = info.sample_rate
+
+    text = None
+    for sidecar in (path.with_suffix(".cue"), path.with_name(path.name + ".cue")):
+        if sidecar.is_file():
+            text = _read_cue_text(sidecar)
+            break
+    block = None
+    if text is None:
+        try:
+            text, block = _read_embedded(path)
+        except Exception as e:
+            logger.warning(f"Could not read embedded cue sheet of {path}: {str(e)}")
+            return None
+
+    album: Dict[str, List[str]] = {}
+    starts: List[Tuple[int, int, Dict[str, List[str]]]] = []
+    if text is not None:
+        try:
+            album, tracks, files = parse_cue(text)
+        except ValueError as e:
+            logger.warning(f"Ignoring invalid cue sheet for {path}: {str(e)}")
+            return None
+        if len(set(files)) > 1:
+            return None
+        starts = [
+            (number, frames * rate // CUE_FRAMES_PER_SECOND, tags)
+            for number, frames, tags in tracks
+        ]
+    elif block is not None:
+        for track in block.tracks:
+            if track.track_number in _LEAD_OUT_TRACKS:
+                continue
+            offsets = {
+                index.index_number: index.index_offset for index in track.indexes
+            }
+            starts.append(
+                (track.track_number, track.start_offset + offsets.get(1, 0), {})
+            )
+
+    if len(starts) < 2:
+        return None
+    tracks = [CueTrack(number, start, None, tags) for number, start, tags in starts]
+    tracks[0].start = 0
+    for track, following in zip(tracks, tracks[1:]):
+        track.end = following.start
+    return AlbumImage(path, tracks, album)
@@ -0,0 +1,128 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from src.core.converter import SingleFileConverter
+from src.core.memory import MemoryGovernor
+from src.core.results import ConversionResult, ConversionStatus
+from src.core.scheduler import ConversionScheduler
+from src.core.spool import JobSpool, SpoolJob, default_worker_id
+from src.utils.exceptions import ConversionError
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+def wait_for_run(spool_dir: Path, poll_interval: float = 1.0) -> JobSpool:
+    """
+    Wait until a coordinator started a run in ``spool_dir`` and join it.
+
+    Args:
+        spool_dir (Path): Shared directory holding the job queue.
+        poll_interval (float): Seconds between checks.
+
+    Returns:
+        JobSpool: The spool, with the coordinator's converter settings.
+    """
+    spool = JobSpool.open(spool_dir)
+    while spool is None:
+        logger.info(f"Waiting for a coordinator to start a run in {spool_dir}")
+        time.sleep(poll_interval)
+        spool = JobSpool.open(spool_dir)
+    return spool
+
+
+def run_worker(
+    spool_dir: Path,
+    max_workers: Optional[int] = None,
+    max_encoders: Optional[int] = None,
+    metadata_processes: Optional[int] = None,
+    memory_budget: Optional[int] = None,
+    result_callback: Optional[Callable[[ConversionResult], None]] = None,
+    poll_interval: float = 1.0,
+    worker_id: Optional[str] = None,
+) -> int:
+    """
+    Convert jobs from a job spool until the coordinator's run is complete.
+
+    The worker waits for a coordinator to start a run in ``spool_dir``, then
+    claims jobs and converts them on a local ``ConversionScheduler``, with up
+    to ``max_workers`` jobs in flight, the same encoder limit and memory
+    governor as a local run. Leases of running jobs are renewed
+    while they convert, and expired leases of other workers are reclaimed.
+
+    Args:
+        spool_dir (Path): Shared directory holding the job queue.
+        max_workers (Optional[int]): Jobs converted at once on this host.
+            Defaults to ``os.cpu_count()``.
+        max_encoders (Optional[int]): Concurrent encoder processes on this
+            host. Defaults to ``max_workers``.
+        metadata_processes (Optional[int]): Size of the local process pool
+            for pydub transcodes; ``0`` (the default) runs them on threads.
+        memory_budget (Optional[int]): Bytes the jobs on this host may use at
+            once. Defaults to the coordinator's budget.
+        result_callback (Optional[Callable[[ConversionResult], None]]): Called
+            with the outcome of every job this worker ran.
+        poll_interval (float): Seconds between checks for new jobs.
+        worker_id (Optional[str]): Name reported with results. Defaults to
+            the host name and process id.
+
+    Returns:
+        int: Number of jobs this worker ran.
+    """
+    worker_id = worker_id or default_worker_id()
+    spool = wait_for_run(spool_dir, poll_interval)
+    converter = SingleFileConverter.from_config(spool.converter_config)
+
+    memory_budget = memory_budget or converter.memory_budget
+    scheduler = ConversionScheduler(
+        max_workers=max_workers,
+        max_encoders=max_encoders,
+        metadata_processes=metadata_processes,
+        memory=MemoryGovernor(memory_budget) if memory_budget else None,
+    )
+    in_flight: Dict[Future, SpoolJob] = {}
+    ran = 0
+    last_heartbeat = time.monotonic()
+    with scheduler:
+        while True:
+            while len(in_flight) < scheduler.max_workers:
+                job = spool.claim(worker_id)
+                if job is None:
+                    break
+                logger.debug(f"{worker_id} claimed {job.source}")
+                future = scheduler.submit(converter, job.source, job.output)
+                in_flight[future] = job
+
+            if not in_flight:
+                if spool.drained():
+                    break
+                spool.reclaim_expired()
+                time.sleep(poll_interval)
+                continue
+
+            finished, _ = wait(
+                in_flight, timeout=poll_interval, return_when=FIRST_COMPLETED
+            )
+            for future in finished:
+                job = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except ConversionError as e:
+                    result = ConversionResult(
+                        job.source, job.output, ConversionStatus.FAILED, error=str(e)
+                    )
+                spool.complete(job, result, worker_id)
+                ran += 1
+                if result_callback:
+                    result_callback(result)
+
+            # Renew leases well before they expire.
+            if time.monotonic() - last_heartbeat > spool.lease_seconds / 3:
+                for job in in_flight.values():
+                    spool.heartbeat(job)
+                last_heartbeat = time.monotonic()
+
+    logger.info(f"{worker_id} finished after {ran} jobs")
+    return ran
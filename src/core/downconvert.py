@@ -0,0 +1,117 @@
+import copy
+from dataclasses import dataclass
+from typing import Optional
+
+from mutagen.flac import StreamInfo
+
+RESAMPLERS = ("soxr", "swr")
+# High-quality soxr setting; ffmpeg's default of 20 bits is meant for 16-bit
+# output.
+SOXR_PRECISION = 28
+# Triangular dither with high-pass spectral shaping, which keeps the added
+# noise away from the frequencies the ear is most sensitive to.
+DITHER_METHOD = "triangular_hp"
+
+
+@dataclass(frozen=True)
+class DownconvertOptions:
+    """
+    How to bring hi-res sources down to a common sample rate and bit depth.
+
+    Attributes:
+        sample_rate (Optional[int]): Highest sample rate passed to the
+            encoders. None picks 44.1 kHz for sources of the 44.1 kHz family
+            (88.2, 176.4 kHz) and 48 kHz for all others, so the ratio stays
+            whole.
+        bit_depth (int): 16 dithers down to 16 bits. 24 keeps the precision
+            of the resampler, like the 24-bit input of "Mastered for iTunes"
+            AAC encodes; float encoders such as AAC receive float samples.
+        resampler (str): ffmpeg resampling engine, ``soxr`` or ``swr``.
+    """
+
+    sample_rate: Optional[int] = None
+    bit_depth: int = 16
+    resampler: str = "soxr"
+
+    def key(self) -> str:
+        """Return a string identifying the options, for settings keys."""
+        return f"{self.sample_rate or 'auto'}/{self.bit_depth}/{self.resampler}"
+
+
+@dataclass(frozen=True)
+class Downconversion:
+    """
+    The downconversion of one source.
+
+    Attributes:
+        sample_rate (int): Sample rate the encoders receive.
+        audio_filter (str): ffmpeg filter performing the conversion.
+        whole_ratio (bool): Whether every output sample falls on a source
+            sample, which segmented encodes rely on.
+    """
+
+    sample_rate: int
+    audio_filter: str
+    whole_ratio: bool
+
+
+def target_rate(options: DownconvertOptions, source_rate: int) -> int:
+    """Return the sample rate a source is converted to; never higher."""
+    rate = options.sample_rate
+    if rate is None:
+        rate = 44100 if source_rate % 44100 == 0 else 48000
+    return min(rate, source_rate)
+
+
+def plan_downconversion(
+    options: DownconvertOptions, info: Optional[StreamInfo]
+) -> Optional[Downconversion]:
+    """
+    Decide how to convert a source, if it needs converting at all.
+
+    Sources at or below the target rate and bit depth are left alone.
+
+    Args:
+        options (DownconvertOptions): The requested conversion.
+        info (Optional[StreamInfo]): Stream properties of the source.
+
+    Returns:
+        Optional[Downconversion]: The conversion, or None to encode the source
+            unchanged.
+    """
+    if info is None:
+        return None
+    rate = target_rate(options, info.sample_rate)
+    dither = options.bit_depth == 16 and info.bits_per_sample > 16
+    if rate == info.sample_rate and not dither:
+        return None
+
+    # The whole conversion happens in one aresample instance: the resampler
+    # works in floating point and dithers once, on the final quantization.
+    settings = [f"osr={rate}"]
+    if rate != info.sample_rate:
+        settings.append(f"resampler={options.resampler}")
+        if options.resampler == "soxr":
+            settings.append(f"precision={SOXR_PRECISION}")
+    if dither:
+        settings += ["osf=s16", f"dither_method={DITHER_METHOD}"]
+    return Downconversion(
+        rate, "aresample=" + ":".join(settings), info.sample_rate % rate == 0
+    )
+
+
+def converted_info(info: StreamInfo, sample_rate: int) -> StreamInfo:
+    """
+    Return the stream properties the encoders see after resampling.
+
+    Args:
+        info (StreamInfo): Stream properties of the source.
+        sample_rate (int): Sample rate after conversion.
+
+    Returns:
+        StreamInfo: A copy with the rate and length in samples adjusted.
+    """
+    converted = copy.copy(info)
+    converted.sample_rate = sample_rate
+    converted.total_samples = info.total_samples * sample_rate // info.sample_rate
+    return converted
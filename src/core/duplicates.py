@@ -0,0 +1,184 @@
+import hashlib
+import os
+import sqlite3
+from pathlib import Path
+from threading import Lock, RLock
+from typing import Dict, Optional, Tuple
+
+from src.core.metadata import read_stream_info
+from src.utils.exceptions import FileOperationError
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+DUPLICATE_INDEX_FILENAME = ".flac2apple-audio-index.sqlite"
+
+# FLAC metadata blocks that end up in the converted file's tags.
+_VORBIS_COMMENT = 4
+_PICTURE = 6
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS encodes (
+    audio_md5 TEXT NOT NULL,
+    settings TEXT NOT NULL,
+    output TEXT NOT NULL,
+    tags_hash TEXT NOT NULL,
+    PRIMARY KEY (audio_md5, settings)
+)
+"""
+
+
+def audio_md5(path: Path) -> Optional[str]:
+    """
+    Return the MD5 of the decoded audio stored in the STREAMINFO block.
+
+    Args:
+        path (Path): Path to the FLAC file.
+
+    Returns:
+        Optional[str]: Hex digest, or None if the encoder did not store one.
+    """
+    info = read_stream_info(path)
+    if info is None or not info.md5_signature:
+        return None
+    return f"{info.md5_signature:032x}"
+
+
+def tags_hash(path: Path) -> str:
+    """
+    Hash the raw tag and picture blocks of a FLAC file.
+
+    The blocks are read as bytes without being parsed. Two files with the same
+    hash get identical tags when converted.
+
+    Args:
+        path (Path): Path to the FLAC file.
+
+    Returns:
+        str: Hex digest of the blocks.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        if f.read(4) != b"fLaC":
+            return ""
+        last = False
+        while not last:
+            header = f.read(4)
+            if len(header) < 4:
+                break
+            last = bool(header[0] & 0x80)
+            kind = header[0] & 0x7F
+            size = int.from_bytes(header[1:], "big")
+            if kind in (_VORBIS_COMMENT, _PICTURE):
+                digest.update(header)
+                digest.update(f.read(size))
+            else:
+                f.seek(size, 1)
+    return digest.hexdigest()
+
+
+class DuplicateIndex:
+    """
+    A persistent SQLite index of encoded audio, keyed by its STREAMINFO MD5.
+
+    The same recording often appears several times in a library (an album and
+    a compilation, or two rips of one CD). The MD5 covers the decoded samples,
+    so copies are found regardless of their tags or FLAC compression level.
+    For each MD5 and encoder settings the index remembers one output, which
+    later copies reuse instead of being encoded again.
+
+    The index can be shared between threads.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = RLock()
+        try:
+            self._connection = sqlite3.connect(
+                str(path), timeout=30, check_same_thread=False
+            )
+            self._connection.execute(_SCHEMA)
+            self._connection.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error opening duplicate index {path}: {str(e)}")
+            raise FileOperationError(f"Failed to open duplicate index {path}: {str(e)}")
+
+    def lookup(self, source: Path, settings: str) -> Optional[Tuple[Path, bool]]:
+        """
+        Find an existing encode of the audio of ``source``.
+
+        Args:
+            source (Path): Path to the FLAC file about to be converted.
+            settings (str): Settings key of the conversion.
+
+        Returns:
+            Optional[Tuple[Path, bool]]: The output to reuse and whether its
+                source had the same tags, or None if there is none.
+        """
+        md5 = audio_md5(source)
+        if md5 is None:
+            return None
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT output, tags_hash FROM encodes "
+                "WHERE audio_md5 = ? AND settings = ?",
+                (md5, settings),
+            ).fetchone()
+        if row is None or not Path(row[0]).is_file():
+            return None
+        return Path(row[0]), row[1] == tags_hash(source)
+
+    def record(self, source: Path, output: Path, settings: str) -> None:
+        """
+        Remember the output of a conversion for later copies of its audio.
+
+        Args:
+            source (Path): Path to the source FLAC file.
+            output (Path): Path to the converted file.
+            settings (str): Settings key of the conversion.
+        """
+        md5 = audio_md5(source)
+        if md5 is None or not output.is_file():
+            return
+        try:
+            with self._lock:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO encodes "
+                    "(audio_md5, settings, output, tags_hash) VALUES (?, ?, ?, ?)",
+                    (md5, settings, str(output.resolve()), tags_hash(source)),
+                )
+                self._connection.commit()
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"Could not index {output}: {str(e)}")
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._connection.close()
+
+
+# One connection per process and index file, shared by its worker threads.
+_indexes: Dict[str, Optional[DuplicateIndex]] = {}
+_indexes_lock = Lock()
+
+
+def get_duplicate_index(path: Path) -> Optional[DuplicateIndex]:
+    """
+    Return the shared duplicate index at ``path`` for this process.
+
+    Args:
+        path (Path): Path of the index database.
+
+    Returns:
+        Optional[DuplicateIndex]: The index, or None if it cannot be opened,
+            in which case every file is encoded.
+    """
+    key = os.fspath(path)
+    with _indexes_lock:
+        if key not in _indexes:
+            try:
+                _indexes[key] = DuplicateIndex(path)
+            except FileOperationError as e:
+                logger.warning(f"Not detecting duplicates: {str(e)}")
+                _indexes[key] = None
+        return _indexes[key]
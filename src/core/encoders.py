@@ -0,0 +1,222 @@
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from src.utils.enums import AudioFormat, TagFormat
+
+
+@dataclass(frozen=True)
+class EncoderProfile:
+    """
+    Everything needed to produce one kind of output file.
+
+    Attributes:
+        name (str): Unique preset name, e.g. ``mp3-v0``.
+        output_format (AudioFormat): Audio format the preset produces.
+        extension (str): File extension of the output, without the dot.
+        container (str): ffmpeg muxer name.
+        codec_args (Tuple[str, ...]): ffmpeg arguments selecting and
+            configuring the encoder.
+        tag_format (TagFormat): Tagging scheme used by the container.
+        lossless (bool): Whether the codec is lossless.
+        description (str): Human readable summary.
+        audio_filter (Optional[str]): ffmpeg filter applied to the audio
+            before it reaches the encoder, set per file with ``with_filter``.
+    """
+
+    name: str
+    output_format: AudioFormat
+    extension: str
+    container: str
+    codec_args: Tuple[str, ...]
+    tag_format: TagFormat
+    lossless: bool = False
+    description: str = ""
+    audio_filter: Optional[str] = None
+
+    @property
+    def codec(self) -> str:
+        """Return the ffmpeg encoder name."""
+        return self.codec_args[self.codec_args.index("-codec:a") + 1]
+
+    @property
+    def encoder_options(self) -> List[str]:
+        """Return the ffmpeg arguments other than the encoder selection."""
+        index = self.codec_args.index("-codec:a")
+        return self.filter_args + list(
+            self.codec_args[:index] + self.codec_args[index + 2 :]
+        )
+
+    @property
+    def filter_args(self) -> List[str]:
+        """Return the ffmpeg arguments applying ``audio_filter``, if any."""
+        return ["-af", self.audio_filter] if self.audio_filter else []
+
+    def with_filter(self, audio_filter: Optional[str]) -> "EncoderProfile":
+        """Return this preset with the audio run through ``audio_filter``."""
+        return replace(self, audio_filter=audio_filter)
+
+
+@dataclass(frozen=True)
+class OutputTarget:
+    """
+    An additional output produced from the same decoded source.
+
+    Attributes:
+        encoder (EncoderProfile): Preset of the output.
+        directory (Path): Root of the output tree; files mirror the layout of
+            the main output under it.
+    """
+
+    encoder: EncoderProfile
+    directory: Path
+
+
+def parse_target(spec: str) -> OutputTarget:
+    """
+    Parse a ``PRESET=DIRECTORY`` target specification.
+
+    Args:
+        spec (str): The specification, e.g. ``aac-256=/music/apple``.
+
+    Returns:
+        OutputTarget: The target.
+
+    Raises:
+        ValueError: If the specification is malformed or the preset unknown.
+    """
+    preset, separator, directory = spec.partition("=")
+    if not separator or not preset or not directory:
+        raise ValueError(f"Expected PRESET=DIRECTORY, got {spec!r}")
+    return OutputTarget(get_encoder(preset), Path(directory))
+
+
+_ENCODERS: Dict[str, EncoderProfile] = {}
+_DEFAULTS: Dict[AudioFormat, str] = {}
+
+
+def register_encoder(profile: EncoderProfile, default: bool = False) -> None:
+    """
+    Add an encoder preset to the registry.
+
+    Args:
+        profile (EncoderProfile): The preset to register.
+        default (bool): Make it the default preset for its output format. The
+            first preset registered for a format is its default as well.
+    """
+    _ENCODERS[profile.name] = profile
+    if default or profile.output_format not in _DEFAULTS:
+        _DEFAULTS[profile.output_format] = profile.name
+
+
+def get_encoder(name: str) -> EncoderProfile:
+    """
+    Look up an encoder preset by name.
+
+    Args:
+        name (str): Preset name.
+
+    Returns:
+        EncoderProfile: The preset.
+
+    Raises:
+        ValueError: If no preset with that name is registered.
+    """
+    try:
+        return _ENCODERS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown encoder preset {name!r}; available: {', '.join(_ENCODERS)}"
+        )
+
+
+def default_encoder(output_format: AudioFormat) -> EncoderProfile:
+    """Return the default preset for an output format."""
+    return _ENCODERS[_DEFAULTS[output_format]]
+
+
+def resolve_encoder(
+    output_format: AudioFormat, preset: Optional[str] = None
+) -> EncoderProfile:
+    """
+    Return the named preset, or the default one for the output format.
+
+    Args:
+        output_format (AudioFormat): Requested output format.
+        preset (Optional[str]): Preset name, if one was chosen.
+
+    Returns:
+        EncoderProfile: The preset to use.
+
+    Raises:
+        ValueError: If the preset is unknown or produces another format.
+    """
+    if preset is None:
+        return default_encoder(output_format)
+    profile = get_encoder(preset)
+    if profile.output_format != output_format:
+        raise ValueError(
+            f"Encoder preset {preset!r} produces {profile.output_format.value}, "
+            f"not {output_format.value}"
+        )
+    return profile
+
+
+def available_encoders(output_format: Optional[AudioFormat] = None) -> List[str]:
+    """Return the names of the registered presets, optionally for one format."""
+    return [
+        name
+        for name, profile in _ENCODERS.items()
+        if output_format is None or profile.output_format == output_format
+    ]
+
+
+def _mp3(name: str, description: str, *quality_args: str) -> EncoderProfile:
+    return EncoderProfile(
+        name=name,
+        output_format=AudioFormat.MP3,
+        extension="mp3",
+        container="mp3",
+        codec_args=("-codec:a", "libmp3lame", *quality_args, "-id3v2_version", "3"),
+        tag_format=TagFormat.ID3,
+        description=description,
+    )
+
+
+def _m4a(
+    name: str,
+    output_format: AudioFormat,
+    description: str,
+    *codec_args: str,
+    lossless: bool = False,
+) -> EncoderProfile:
+    return EncoderProfile(
+        name=name,
+        output_format=output_format,
+        extension="m4a",
+        container="ipod",
+        codec_args=codec_args,
+        tag_format=TagFormat.MP4,
+        lossless=lossless,
+        description=description,
+    )
+
+
+# ffmpeg's libmp3lame default, which is what conversions produced before presets.
+register_encoder(_mp3("mp3-128", "MP3 CBR 128 kbit/s", "-b:a", "128k"))
+register_encoder(_mp3("mp3-320", "MP3 CBR 320 kbit/s", "-b:a", "320k"))
+register_encoder(_mp3("mp3-v0", "MP3 VBR V0 (~245 kbit/s)", "-q:a", "0"))
+register_encoder(_mp3("mp3-v2", "MP3 VBR V2 (~190 kbit/s)", "-q:a", "2"))
+register_encoder(
+    _m4a(
+        "aac-256", AudioFormat.AAC, "AAC 256 kbit/s", "-codec:a", "aac", "-b:a", "256k"
+    )
+)
+register_encoder(
+    _m4a(
+        "aac-128", AudioFormat.AAC, "AAC 128 kbit/s", "-codec:a", "aac", "-b:a", "128k"
+    )
+)
+register_encoder(
+    _m4a("alac", AudioFormat.ALAC, "Apple Lossless", "-codec:a", "alac", lossless=True)
+)
@@ -1,8 +1,8 @@
-import logging
 import shutil
 from pathlib import Path
-from typing import List
+from typing import Iterable, List
 
+from src.core.scanner import LibraryScanner
 from src.utils.exceptions import FileOperationError
 from src.utils.logging_config import get_logger
 
@@ -15,12 +15,27 @@ class FileHandler:
     """
 
     @staticmethod
-    def get_flac_files(directory: Path) -> List[Path]:
+    def scan_flac_files(directory: Path, exclude: Iterable[str] = ()) -> LibraryScanner:
+        """
+        Lazily scan a directory and its subdirectories for FLAC files.
+
+        Args:
+            directory (Path): Path to the directory to search.
+            exclude (Iterable[str]): Glob patterns of files or directories to skip.
+
+        Returns:
+            LibraryScanner: Iterable yielding FLAC files as they are found.
+        """
+        return LibraryScanner(directory, exclude=exclude)
+
+    @staticmethod
+    def get_flac_files(directory: Path, exclude: Iterable[str] = ()) -> List[Path]:
         """
         Get all FLAC files in a directory and its subdirectories.
 
         Args:
             directory (Path): Path to the directory to search.
+            exclude (Iterable[str]): Glob patterns of files or directories to skip.
 
         Returns:
             List[Path]: List of paths to FLAC files.
@@ -29,7 +44,9 @@ class FileHandler:
             FileOperationError: If there's an error accessing the directory.
         """
         try:
-            return list(directory.glob("**/*.flac"))
+            return list(FileHandler.scan_flac_files(directory, exclude))
+        except FileOperationError:
+            raise
         except Exception as e:
             logger.error(f"Error accessing directory {directory}: {str(e)}")
             raise FileOperationError(
@@ -0,0 +1,148 @@
+import json
+import os
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Optional
+
+from src.utils.exceptions import FileOperationError
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+JOURNAL_FILENAME = ".flac2apple-journal.ndjson"
+
+
+class RunJournal:
+    """
+    An append-only record of the files completed by a directory conversion.
+
+    Every finished file is appended as one JSON line with the source's size and
+    mtime and the encoder settings. If the run is interrupted the journal stays
+    behind, and the next run over the same output skips the files it lists
+    instead of starting over. A run that completes deletes its journal.
+
+    A line that was only partly written when the process died is ignored.
+    """
+
+    def __init__(self, path: Path, writable: bool = True, sync: bool = False):
+        """
+        Args:
+            path (Path): Location of the journal file.
+            writable (bool): Open for appending; a read-only journal only
+                answers ``is_done``.
+            sync (bool): fsync after every entry, surviving power loss rather
+                than just process crashes.
+        """
+        self.path = path
+        self.sync = sync
+        # A journal that already exists belongs to a run that did not finish.
+        self.interrupted = path.exists()
+        self._entries: Dict[str, dict] = self._load(path)
+        self._lock = Lock()
+        self._file = None
+        if writable:
+            try:
+                self._file = open(path, "a", encoding="utf-8")
+                # Terminate a line cut short by a crash so the next entry
+                # starts on a line of its own.
+                if self._file.tell():
+                    with open(path, "rb") as f:
+                        f.seek(-1, os.SEEK_END)
+                        if f.read(1) != b"\n":
+                            self._file.write("\n")
+            except OSError as e:
+                logger.error(f"Error opening journal {path}: {str(e)}")
+                raise FileOperationError(f"Failed to open journal {path}: {str(e)}")
+        if self._entries:
+            logger.info(
+                f"Resuming interrupted run: {len(self._entries)} files already done"
+            )
+
+    @classmethod
+    def for_directory(
+        cls, directory: Path, writable: bool = True, sync: bool = False
+    ) -> Optional["RunJournal"]:
+        """
+        Open the journal of an output directory.
+
+        Returns None for a read-only journal that does not exist.
+        """
+        path = directory / JOURNAL_FILENAME
+        if not writable and not path.exists():
+            return None
+        if writable:
+            directory.mkdir(parents=True, exist_ok=True)
+        return cls(path, writable=writable, sync=sync)
+
+    @staticmethod
+    def _load(path: Path) -> Dict[str, dict]:
+        entries: Dict[str, dict] = {}
+        if not path.exists():
+            return entries
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    entries[entry["source"]] = entry
+                except (ValueError, KeyError):
+                    continue
+        return entries
+
+    def is_done(self, source: Path, output: Path, settings: str) -> bool:
+        """
+        Check whether an interrupted earlier run already produced this output.
+
+        Args:
+            source (Path): Path to the source FLAC file.
+            output (Path): Expected output path.
+            settings (str): Encoder settings key of the current run.
+
+        Returns:
+            bool: True if the output can be kept.
+        """
+        entry = self._entries.get(str(source))
+        if entry is None:
+            return False
+        if entry.get("output") != str(output) or entry.get("settings") != settings:
+            return False
+        try:
+            stat = source.stat()
+        except OSError:
+            return False
+        return (
+            stat.st_size == entry.get("size")
+            and stat.st_mtime_ns == entry.get("mtime_ns")
+            and output.exists()
+        )
+
+    def append(self, source: Path, output: Path, settings: str) -> None:
+        """Record a completed file."""
+        if self._file is None:
+            return
+        stat = source.stat()
+        line = json.dumps(
+            {
+                "source": str(source),
+                "output": str(output),
+                "settings": settings,
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+            }
+        )
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            if self.sync:
+                os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        """Close the journal, keeping it on disk."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def discard(self) -> None:
+        """Close and delete the journal once the run has completed."""
+        self.close()
+        self.path.unlink(missing_ok=True)
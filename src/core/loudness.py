@@ -0,0 +1,376 @@
+import math
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+from src.utils.exceptions import ConversionError
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# ReplayGain 2.0 reference level; Sound Check values are derived from the
+# same gain.
+REFERENCE_LOUDNESS = -18.0
+ABSOLUTE_GATE = -70.0
+RELATIVE_GATE = -10.0
+# BS.1770 blocks are 400 ms long and start every 100 ms.
+HOP_SECONDS = 0.1
+BLOCK_HOPS = 4
+# Interpolation taps per phase of the true-peak oversampler.
+TRUE_PEAK_TAPS = 12
+
+# Tag names, as written by foobar2000, rsgain and iTunes.
+TRACK_GAIN = "REPLAYGAIN_TRACK_GAIN"
+TRACK_PEAK = "REPLAYGAIN_TRACK_PEAK"
+ALBUM_GAIN = "REPLAYGAIN_ALBUM_GAIN"
+ALBUM_PEAK = "REPLAYGAIN_ALBUM_PEAK"
+SOUND_CHECK = "iTunNORM"
+
+
+def _numpy():
+    # Imported on first use: NumPy is optional and slow to import.
+    try:
+        import numpy
+    except ImportError:
+        raise ConversionError("NumPy is required to measure loudness")
+    return numpy
+
+
+@dataclass
+class Loudness:
+    """
+    Measured loudness of a track or an album.
+
+    Attributes:
+        integrated (Optional[float]): Integrated loudness in LUFS, or None if
+            the audio is silent or shorter than one block.
+        true_peak (float): Highest absolute sample value after 4x
+            oversampling, where 1.0 is full scale.
+        blocks (np.ndarray): Energies of the blocks above the absolute gate,
+            kept to gate an album as a whole.
+    """
+
+    integrated: Optional[float]
+    true_peak: float
+    blocks: "np.ndarray"
+
+    @property
+    def gain(self) -> Optional[float]:
+        """Return the ReplayGain 2.0 gain in dB."""
+        if self.integrated is None:
+            return None
+        return REFERENCE_LOUDNESS - self.integrated
+
+    @classmethod
+    def combine(cls, parts: Sequence["Loudness"]) -> "Loudness":
+        """Return the loudness of several tracks played as one album."""
+        np = _numpy()
+        blocks = np.concatenate([part.blocks for part in parts])
+        return cls(
+            _gated_loudness(blocks),
+            max((part.true_peak for part in parts), default=0.0),
+            blocks,
+        )
+
+
+def _gated_loudness(blocks: "np.ndarray") -> Optional[float]:
+    """Apply the relative gate to absolute-gated block energies."""
+    if not len(blocks):
+        return None
+    np = _numpy()
+    relative = _to_lufs(float(np.mean(blocks))) + RELATIVE_GATE
+    gated = blocks[blocks > _to_energy(relative)]
+    if not len(gated):
+        return None
+    return _to_lufs(float(np.mean(gated)))
+
+
+def _to_lufs(energy: float) -> float:
+    return -0.691 + 10 * math.log10(energy)
+
+
+def _to_energy(lufs: float) -> float:
+    return 10 ** ((lufs + 0.691) / 10)
+
+
+@lru_cache(maxsize=None)
+def _k_weighting(sample_rate: int) -> Tuple[int, int, "np.ndarray"]:
+    """
+    Return the block length, IR length and spectrum of the K-weighting filter.
+
+    The two biquads of BS.1770 (a high shelf and a high pass), designed for
+    the sample rate as libebur128 does, are applied as one FIR: their impulse
+    response, computed from the frequency response and cut where it has
+    decayed below float precision, is convolved block by block with FFTs.
+    """
+    np = _numpy()
+
+    # Stage 1: high shelf modelling the head.
+    k = math.tan(math.pi * 1681.974450955533 / sample_rate)
+    q = 0.7071752369554196
+    vh = 10 ** (3.999843853973347 / 20)
+    vb = vh**0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf = (
+        [
+            (vh + vb * k / q + k * k) / a0,
+            2 * (k * k - vh) / a0,
+            (vh - vb * k / q + k * k) / a0,
+        ],
+        [1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0],
+    )
+    # Stage 2: RLB high pass.
+    k = math.tan(math.pi * 38.13547087602444 / sample_rate)
+    q = 0.5003270373238773
+    a0 = 1 + k / q + k * k
+    highpass = (
+        [1.0, -2.0, 1.0],
+        [1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0],
+    )
+
+    # An eighth of a second covers the decay of the 38 Hz high pass; blocks
+    # three times as long keep the FFTs efficient.
+    ir_length = 1 << math.ceil(math.log2(sample_rate / 8))
+    fft_size = 4 * ir_length
+    grid = 8 * fft_size
+    z = np.exp(-1j * np.pi * np.arange(grid // 2 + 1) / (grid // 2))
+    response = np.ones_like(z)
+    for b, a in (shelf, highpass):
+        response *= (b[0] + b[1] * z + b[2] * z * z) / (a[0] + a[1] * z + a[2] * z * z)
+    impulse = np.fft.irfft(response, grid)[:ir_length]
+    spectrum = np.fft.rfft(impulse, fft_size)
+    return fft_size - ir_length + 1, ir_length, spectrum
+
+
+@lru_cache(maxsize=None)
+def _oversampler(sample_rate: int) -> Optional["np.ndarray"]:
+    """Return the interpolation filters of the true-peak meter, one per phase."""
+    factor = 4 if sample_rate < 96000 else 2 if sample_rate < 192000 else 1
+    if factor == 1:
+        return None
+    np = _numpy()
+    taps = np.arange(TRUE_PEAK_TAPS) - (TRUE_PEAK_TAPS // 2 - 1)
+    window = np.hanning(TRUE_PEAK_TAPS + 2)[1:-1]
+    phases = []
+    for phase in range(1, factor):
+        kernel = np.sinc(phase / factor - taps) * window
+        phases.append(kernel / kernel.sum())
+    return np.array(phases, dtype=np.float32)
+
+
+class LoudnessMeter:
+    """
+    Measure the loudness (EBU R128 / ITU-R BS.1770-4) of one track.
+
+    Samples are fed in chunks as they are decoded, so the meter needs a
+    fixed amount of memory whatever the track length. Everything is
+    vectorized: the K-weighting is an FFT convolution, the 100 ms mean
+    squares are reshaped sums and the oversampling of the true-peak meter is
+    a sum of shifted arrays. Samples are kept channel by channel, so every
+    operation runs over contiguous memory.
+    """
+
+    def __init__(self, sample_rate: int, channels: int):
+        """
+        Args:
+            sample_rate (int): Sample rate of the audio.
+            channels (int): Number of interleaved channels.
+        """
+        np = _numpy()
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self._block, self._ir_length, _ = _k_weighting(sample_rate)
+        self._hop = round(sample_rate * HOP_SECONDS)
+        # Surround channels count 1.41 times (+1.5 dB); LFE is ignored.
+        weights = [1.0] * channels
+        if channels == 6:
+            weights = [1.0, 1.0, 1.0, 0.0, 1.41, 1.41]
+        self._weights = np.array(weights)
+        self._pending = np.zeros((channels, 0), dtype=np.float32)
+        self._tail = np.zeros((channels, self._ir_length - 1))
+        self._filtered = np.zeros((channels, 0))
+        self._hops: List["np.ndarray"] = []
+        self._history = np.zeros((channels, TRUE_PEAK_TAPS - 1), dtype=np.float32)
+        self._peak = 0.0
+
+    def feed(self, samples: "np.ndarray") -> None:
+        """
+        Add decoded samples.
+
+        Args:
+            samples (np.ndarray): Float samples of shape (frames, channels),
+                where 1.0 is full scale.
+        """
+        np = _numpy()
+        # Bounded steps keep the intermediate arrays small for whole tracks.
+        for start in range(0, len(samples), self._block):
+            chunk = np.ascontiguousarray(
+                samples[start : start + self._block].T, dtype=np.float32
+            )
+            self._measure_peak(chunk)
+            self._pending = np.concatenate([self._pending, chunk], axis=1)
+            if self._pending.shape[1] >= self._block:
+                self._filter(self._pending[:, : self._block])
+                self._pending = self._pending[:, self._block :]
+
+    def result(self) -> Loudness:
+        """Return the loudness of everything fed so far."""
+        np = _numpy()
+        if self._pending.shape[1]:
+            self._filter(self._pending)
+            self._pending = self._pending[:, :0]
+        if len(self._hops) < BLOCK_HOPS:
+            return Loudness(None, self._peak, np.zeros(0))
+        hops = np.concatenate(self._hops)
+        windows = np.lib.stride_tricks.sliding_window_view(hops, BLOCK_HOPS, axis=0)
+        energies = windows.mean(axis=-1) @ self._weights
+        blocks = energies[energies > _to_energy(ABSOLUTE_GATE)]
+        return Loudness(_gated_loudness(blocks), self._peak, blocks)
+
+    def _filter(self, samples: "np.ndarray") -> None:
+        """K-weight a block of at most ``self._block`` frames per channel."""
+        np = _numpy()
+        _, _, spectrum = _k_weighting(self.sample_rate)
+        fft_size = self._block + self._ir_length - 1
+        spectra = np.fft.rfft(samples, fft_size)
+        weighted = np.fft.irfft(spectra * spectrum, fft_size)
+        weighted[:, : self._ir_length - 1] += self._tail
+        frames = samples.shape[1]
+        self._tail = weighted[:, frames : frames + self._ir_length - 1]
+        self._add_hops(weighted[:, :frames])
+
+    def _add_hops(self, weighted: "np.ndarray") -> None:
+        """Add the mean squares of every complete 100 ms hop."""
+        np = _numpy()
+        weighted = np.concatenate([self._filtered, weighted], axis=1)
+        count = weighted.shape[1] // self._hop
+        squares = weighted[:, : count * self._hop] ** 2
+        # One row of channel mean squares per hop.
+        self._hops.append(squares.reshape(self.channels, count, self._hop).mean(2).T)
+        self._filtered = weighted[:, count * self._hop :]
+
+    def _measure_peak(self, samples: "np.ndarray") -> None:
+        np = _numpy()
+        peak = float(np.abs(samples).max())
+        filters = _oversampler(self.sample_rate)
+        if filters is not None:
+            padded = np.concatenate([self._history, samples], axis=1)
+            frames = samples.shape[1]
+            for kernel in filters:
+                interpolated = kernel[0] * padded[:, :frames]
+                for tap in range(1, TRUE_PEAK_TAPS):
+                    interpolated += kernel[tap] * padded[:, tap : tap + frames]
+                peak = max(peak, float(np.abs(interpolated).max()))
+            self._history = padded[:, frames:]
+        self._peak = max(self._peak, peak)
+
+
+class PcmAnalyzer:
+    """
+    Measure the loudness of the tracks in a stream of interleaved PCM.
+
+    Takes raw 32-bit float PCM, as ffmpeg writes it with ``-f f32le``, or
+    sample arrays, and routes the samples to one ``LoudnessMeter`` per track.
+    A plain file is one track; an album image is cut at the track starts.
+    """
+
+    def __init__(
+        self, sample_rate: int, channels: int, track_starts: Sequence[int] = ()
+    ):
+        """
+        Args:
+            sample_rate (int): Sample rate of the audio.
+            channels (int): Number of interleaved channels.
+            track_starts (Sequence[int]): First sample of every track after
+                the first.
+        """
+        self.channels = channels
+        self.meters = [
+            LoudnessMeter(sample_rate, channels) for _ in range(len(track_starts) + 1)
+        ]
+        self._ends = [*track_starts, None]
+        self._position = 0
+        self._track = 0
+        self._remainder = b""
+
+    def feed_bytes(self, data: bytes) -> None:
+        """Add raw little-endian float32 PCM; frames may span chunks."""
+        np = _numpy()
+        data = self._remainder + data
+        usable = len(data) - len(data) % (4 * self.channels)
+        self._remainder = data[usable:]
+        samples = np.frombuffer(data[:usable], dtype="<f4")
+        self.feed(samples.reshape(-1, self.channels))
+
+    def feed(self, samples: "np.ndarray") -> None:
+        """Add float samples of shape (frames, channels)."""
+        while len(samples):
+            end = self._ends[self._track]
+            if end is None:
+                take = len(samples)
+            else:
+                take = min(len(samples), end - self._position)
+            self.meters[self._track].feed(samples[:take])
+            self._position += take
+            samples = samples[take:]
+            if end is not None and self._position >= end:
+                self._track += 1
+
+    def results(self) -> List[Loudness]:
+        """Return the loudness of every track, in order."""
+        return [meter.result() for meter in self.meters]
+
+
+def measure_transcode(converter, input_path, outputs, analyzer):
+    """
+    Run ``converter.transcode`` and return its timings and the analyzer.
+
+    The analyzer is returned rather than read afterwards so that its state
+    comes back when the call runs in a process pool.
+    """
+    return converter.transcode(input_path, *outputs, analyzer=analyzer), analyzer
+
+
+def sound_check(gain: float, peak: float) -> str:
+    """
+    Return an iTunes Sound Check (``iTunNORM``) value.
+
+    Args:
+        gain (float): Gain to apply, in dB.
+        peak (float): Peak sample value, where 1.0 is full scale.
+
+    Returns:
+        str: Ten hex fields as iTunes writes them.
+    """
+
+    def scaled(base: int) -> int:
+        return min(round(base * 10 ** (-gain / 10)), 0xFFFFFFFF)
+
+    peak_value = round(min(peak, 1.0) * 32767)
+    fields = [scaled(1000), scaled(1000), scaled(2500), scaled(2500)]
+    fields += [0, 0, peak_value, peak_value, 0, 0]
+    return "".join(f" {field:08X}" for field in fields)
+
+
+def loudness_tags(
+    track: Optional[Loudness], album: Optional[Loudness] = None
+) -> Dict[str, str]:
+    """
+    Return ReplayGain and Sound Check tags for a track.
+
+    Args:
+        track (Optional[Loudness]): Loudness of the track.
+        album (Optional[Loudness]): Loudness of its album, if known.
+
+    Returns:
+        Dict[str, str]: Tag values by name; empty for silent tracks.
+    """
+    tags: Dict[str, str] = {}
+    if track is not None and track.gain is not None:
+        tags[TRACK_GAIN] = f"{track.gain:.2f} dB"
+        tags[TRACK_PEAK] = f"{track.true_peak:.6f}"
+        tags[SOUND_CHECK] = sound_check(track.gain, track.true_peak)
+    if album is not None and album.gain is not None:
+        tags[ALBUM_GAIN] = f"{album.gain:.2f} dB"
+        tags[ALBUM_PEAK] = f"{album.true_peak:.6f}"
+    return tags
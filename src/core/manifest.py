@@ -0,0 +1,256 @@
+import hashlib
+import shutil
+import sqlite3
+from pathlib import Path
+from threading import RLock
+from typing import Callable, List, Optional, Set
+
+from src.utils.exceptions import FileOperationError
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+MANIFEST_FILENAME = ".flac2apple-manifest.sqlite"
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversions (
+    source TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    settings TEXT NOT NULL,
+    output TEXT NOT NULL
+)
+"""
+
+
+def hash_file(path: Path) -> str:
+    """
+    Compute a content hash of a file, reading it in chunks.
+
+    Args:
+        path (Path): Path to the file.
+
+    Returns:
+        str: Hex digest of the file content.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_source(path: Path) -> str:
+    """
+    Compute a content hash of a FLAC file without reading its audio.
+
+    STREAMINFO carries an MD5 of the decoded audio, so hashing the metadata
+    blocks covers both the audio and the tags while reading only the start of
+    the file. Files without an audio MD5, or that are not FLAC, are hashed in
+    full with ``hash_file``.
+
+    Args:
+        path (Path): Path to the source file.
+
+    Returns:
+        str: Hex digest of the file content.
+    """
+    digest = hashlib.blake2b(digest_size=20, person=b"flac-metadata")
+    with open(path, "rb") as f:
+        if f.read(4) != b"fLaC":
+            return hash_file(path)
+        while True:
+            header = f.read(4)
+            if len(header) < 4:
+                return hash_file(path)
+            block_type = header[0] & 0x7F
+            body = f.read(int.from_bytes(header[1:], "big"))
+            if block_type == 0 and (len(body) < 34 or not any(body[18:34])):
+                # STREAMINFO without an audio MD5.
+                return hash_file(path)
+            digest.update(header + body)
+            if header[0] & 0x80:
+                return digest.hexdigest()
+
+
+class ConversionManifest:
+    """
+    A persistent SQLite record of converted files.
+
+    For every source the manifest stores its size, mtime, content hash, the
+    encoder settings used and the output path, so later runs can skip files
+    that have not changed. Sources whose size and mtime still match are trusted
+    without hashing; the content hash is only compared when they differ, which
+    catches touched-but-unchanged files without re-encoding them. The hash
+    comes from ``hash_source``, so recording a conversion reads only the
+    metadata blocks of the source, not its audio a second time.
+
+    The manifest can be shared between threads.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = RLock()
+        try:
+            self._connection = sqlite3.connect(str(path), check_same_thread=False)
+            self._connection.execute(_SCHEMA)
+            self._connection.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error opening manifest {path}: {str(e)}")
+            raise FileOperationError(f"Failed to open manifest {path}: {str(e)}")
+
+    @classmethod
+    def for_directory(cls, directory: Path) -> "ConversionManifest":
+        """Open the manifest stored in the given output directory."""
+        directory.mkdir(parents=True, exist_ok=True)
+        return cls(directory / MANIFEST_FILENAME)
+
+    def __enter__(self) -> "ConversionManifest":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Commit pending changes and close the database."""
+        with self._lock:
+            self._connection.commit()
+            self._connection.close()
+
+    def is_up_to_date(self, source: Path, output: Path, settings: str) -> bool:
+        """
+        Check whether a source was already converted with the same settings.
+
+        Args:
+            source (Path): Path to the source FLAC file.
+            output (Path): Expected output path.
+            settings (str): Encoder settings key of the current run.
+
+        Returns:
+            bool: True if the recorded output can be reused as is.
+        """
+        rows = self._query(
+            "SELECT size, mtime_ns, content_hash, settings, output "
+            "FROM conversions WHERE source = ?",
+            (self._key(source),),
+        )
+        if not rows:
+            return False
+
+        size, mtime_ns, content_hash, recorded_settings, recorded_output = rows[0]
+        if recorded_settings != settings or recorded_output != str(output):
+            return False
+        if not output.exists():
+            return False
+
+        stat = source.stat()
+        if stat.st_size == size and stat.st_mtime_ns == mtime_ns:
+            return True
+        if stat.st_size != size or hash_source(source) != content_hash:
+            return False
+
+        # Same content with a new mtime: remember the new stat so the next run
+        # does not hash the file again.
+        self._execute(
+            "UPDATE conversions SET mtime_ns = ? WHERE source = ?",
+            (stat.st_mtime_ns, self._key(source)),
+        )
+        return True
+
+    def record(self, source: Path, output: Path, settings: str) -> None:
+        """
+        Record a successful conversion.
+
+        Args:
+            source (Path): Path to the source FLAC file.
+            output (Path): Path to the converted file.
+            settings (str): Encoder settings key used for the conversion.
+        """
+        stat = source.stat()
+        self._execute(
+            "INSERT OR REPLACE INTO conversions "
+            "(source, size, mtime_ns, content_hash, settings, output) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                self._key(source),
+                stat.st_size,
+                stat.st_mtime_ns,
+                hash_source(source),
+                settings,
+                str(output),
+            ),
+        )
+        self._commit()
+
+    def prune(
+        self,
+        input_dir: Path,
+        seen_sources: Set[Path],
+        related_outputs: Optional[Callable[[Path], List[Path]]] = None,
+    ) -> List[Path]:
+        """
+        Delete outputs whose sources under ``input_dir`` have disappeared.
+
+        Args:
+            input_dir (Path): The directory that was scanned in this run.
+            seen_sources (Set[Path]): Sources found by the scan.
+            related_outputs (Optional[Callable[[Path], List[Path]]]): Returns
+                further outputs written for a recorded output, such as those
+                of extra targets, which are deleted with it.
+
+        Returns:
+            List[Path]: Output files (or track directories) that were removed.
+        """
+        root = self._key(input_dir)
+        seen = {self._key(source) for source in seen_sources}
+        rows = self._query("SELECT source, output FROM conversions")
+
+        removed = []
+        for source, output in rows:
+            if source in seen or not self._is_within(source, root):
+                continue
+            if Path(source).exists():
+                continue
+            output_path = Path(output)
+            outputs = [output_path]
+            if related_outputs:
+                outputs += related_outputs(output_path)
+            for path in outputs:
+                if path.is_dir():
+                    shutil.rmtree(path)
+                elif path.exists():
+                    path.unlink()
+                else:
+                    continue
+                removed.append(path)
+                logger.info(f"Removed {path}: source {source} is gone")
+            self._execute("DELETE FROM conversions WHERE source = ?", (source,))
+        self._commit()
+        return removed
+
+    def _execute(self, sql: str, parameters: tuple = ()) -> None:
+        with self._lock:
+            self._connection.execute(sql, parameters)
+
+    def _query(self, sql: str, parameters: tuple = ()) -> list:
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def _commit(self) -> None:
+        with self._lock:
+            self._connection.commit()
+
+    @staticmethod
+    def _key(path: Path) -> str:
+        return str(Path(path).resolve())
+
+    @staticmethod
+    def _is_within(source: str, root: str) -> bool:
+        try:
+            Path(source).relative_to(root)
+            return True
+        except ValueError:
+            return False
@@ -0,0 +1,120 @@
+import re
+from contextlib import contextmanager
+from threading import Condition
+from typing import Iterator, Optional
+
+from mutagen.flac import StreamInfo
+
+# Resident memory of one ffmpeg process streaming a FLAC to an encoder:
+# decoder and encoder state plus a few buffered packets, independent of the
+# length of the input.
+FFMPEG_PROCESS_BYTES = 48 * 1024 * 1024
+# Each extra encoder in the same process.
+EXTRA_ENCODER_BYTES = 16 * 1024 * 1024
+# pydub holds ffmpeg's WAV output and the AudioSegment built from it.
+PYDUB_PEAK_FACTOR = 2
+# FLAC typically compresses PCM to a bit over half its size.
+FALLBACK_PCM_PER_FLAC_BYTE = 2
+
+_SIZE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([kmgt]?)i?b?\s*$", re.IGNORECASE)
+_UNITS = {"": 1, "k": 1 << 10, "m": 1 << 20, "g": 1 << 30, "t": 1 << 40}
+
+
+def parse_size(value: str) -> int:
+    """
+    Parse a byte size such as ``512M``, ``1.5G`` or ``2GiB``.
+
+    Args:
+        value (str): The size; units are powers of 1024.
+
+    Returns:
+        int: The size in bytes.
+
+    Raises:
+        ValueError: If the value is not a size.
+    """
+    match = _SIZE.match(value)
+    if not match:
+        raise ValueError(f"Invalid size: {value!r}")
+    return int(float(match.group(1)) * _UNITS[match.group(2).lower()])
+
+
+def pcm_bytes(info: Optional[StreamInfo], file_size: int) -> int:
+    """
+    Return the size of the decoded audio of a FLAC file.
+
+    Samples are counted at the width a decoder hands them out with: 16 bits,
+    or 32 bits for anything deeper.
+
+    Args:
+        info (Optional[StreamInfo]): STREAMINFO of the file, if readable.
+        file_size (int): Size of the file, used when STREAMINFO is missing or
+            does not record the length.
+    """
+    if info is None or not info.total_samples:
+        return file_size * FALLBACK_PCM_PER_FLAC_BYTE
+    width = 2 if info.bits_per_sample <= 16 else 4
+    return info.total_samples * info.channels * width
+
+
+def streaming_bytes(processes: int = 1, extra_encoders: int = 0) -> int:
+    """Return the footprint of ffmpeg processes streaming from the source."""
+    return processes * FFMPEG_PROCESS_BYTES + extra_encoders * EXTRA_ENCODER_BYTES
+
+
+class MemoryGovernor:
+    """
+    Admit jobs while their estimated memory fits a budget.
+
+    Jobs reserve their estimate before starting and release it when done. A
+    job that alone exceeds the budget is admitted only when nothing else is
+    running, so it cannot deadlock the run. Safe to use from several threads;
+    ``try_acquire`` never blocks, for callers that wait on their own terms
+    (such as an event loop).
+    """
+
+    def __init__(self, budget: int):
+        """
+        Args:
+            budget (int): Bytes the admitted jobs may use together.
+        """
+        self.budget = budget
+        self.in_use = 0
+        self.peak = 0
+        self._condition = Condition()
+
+    def _fits(self, cost: int) -> bool:
+        return self.in_use == 0 or self.in_use + cost <= self.budget
+
+    def _take(self, cost: int) -> None:
+        self.in_use += cost
+        self.peak = max(self.peak, self.in_use)
+
+    def try_acquire(self, cost: int) -> bool:
+        """Reserve ``cost`` bytes if they fit right now."""
+        with self._condition:
+            if not self._fits(cost):
+                return False
+            self._take(cost)
+            return True
+
+    def acquire(self, cost: int) -> None:
+        """Reserve ``cost`` bytes, waiting until they fit."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._fits(cost))
+            self._take(cost)
+
+    def release(self, cost: int) -> None:
+        """Return a reservation made by ``acquire`` or ``try_acquire``."""
+        with self._condition:
+            self.in_use -= cost
+            self._condition.notify_all()
+
+    @contextmanager
+    def reserve(self, cost: int) -> Iterator[None]:
+        """Hold a reservation of ``cost`` bytes for the enclosed block."""
+        self.acquire(cost)
+        try:
+            yield
+        finally:
+            self.release(cost)
@@ -0,0 +1,347 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from mutagen.easyid3 import EasyID3
+from mutagen.easymp4 import EasyMP4Tags
+from mutagen.flac import FLAC, Picture, StreamInfo
+from mutagen.id3 import APIC, COMM, ID3, TXXX
+from mutagen.mp4 import MP4, MP4Cover, MP4FreeForm
+
+from src.core.artwork import Artwork, ArtworkCache
+from src.core.loudness import SOUND_CHECK
+from src.utils.enums import TagFormat
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+FRONT_COVER = 3
+
+# Written by the encoder rather than copied from the source, so it survives
+# retagging.
+ITUNSMPB_KEY = "----:com.apple.iTunes:iTunSMPB"
+ITUNES_FREEFORM = "----:com.apple.iTunes:"
+# ReplayGain tags of the source describe its own measurement; they are
+# dropped when the converted audio was measured.
+_REPLAYGAIN_PREFIX = "replaygain_"
+
+
+@dataclass(frozen=True)
+class CoverReference:
+    """
+    The cover of a source, known by its content key but not loaded.
+
+    Attributes:
+        source (Path): FLAC file the cover is embedded in.
+        key (str): Content key of the image, from ``artwork_key``.
+        mime (str): MIME type of the image.
+    """
+
+    source: Path
+    key: str
+    mime: str
+
+
+@dataclass
+class SourceMetadata:
+    """
+    Tags and pictures read from a source FLAC file in a single parse.
+
+    Metadata from the probe cache carries no pictures, only a
+    ``cover_reference`` that ``resolve_cover`` looks up in the artwork cache.
+    """
+
+    tags: Dict[str, List[str]] = field(default_factory=dict)
+    pictures: List[Picture] = field(default_factory=list)
+    duration: float = 0.0
+    cover_reference: Optional[CoverReference] = None
+
+    @property
+    def cover(self) -> Optional[Picture]:
+        """Return the front cover, or the first picture if none is marked as such."""
+        for picture in self.pictures:
+            if picture.type == FRONT_COVER:
+                return picture
+        return self.pictures[0] if self.pictures else None
+
+
+def read_source_metadata(path: Path) -> SourceMetadata:
+    """
+    Read the tags and embedded pictures of a FLAC file.
+
+    Args:
+        path (Path): Path to the FLAC file.
+
+    Returns:
+        SourceMetadata: Everything needed to tag the converted file.
+    """
+    flac = FLAC(path)
+    tags = {key: list(flac[key]) for key in flac.keys()} if flac.tags else {}
+    return SourceMetadata(
+        tags=tags, pictures=list(flac.pictures), duration=flac.info.length
+    )
+
+
+def read_stream_info(path: Path) -> Optional[StreamInfo]:
+    """
+    Read only the STREAMINFO block of a FLAC file.
+
+    STREAMINFO is always the first metadata block, so this reads 42 bytes
+    instead of parsing tags and pictures. Use it where only the stream
+    properties are needed, e.g. to estimate the cost of a file.
+
+    Args:
+        path (Path): Path to the FLAC file.
+
+    Returns:
+        Optional[StreamInfo]: The stream properties, or None if the file does
+            not start with a valid STREAMINFO block.
+    """
+    try:
+        with open(path, "rb") as f:
+            header = f.read(42)
+    except OSError as e:
+        logger.warning(f"Could not read stream info of {path}: {str(e)}")
+        return None
+    if len(header) < 42 or header[:4] != b"fLaC" or header[4] & 0x7F != 0:
+        return None
+    try:
+        return StreamInfo(header[8:42])
+    except Exception:
+        return None
+
+
+def resolve_cover(
+    metadata: SourceMetadata, cache: Optional[ArtworkCache]
+) -> Optional[Artwork]:
+    """
+    Return the cover to embed, processed through the artwork cache if given.
+
+    A cover known only by reference is taken from the artwork cache, or read
+    from its source if the cache does not hold it.
+
+    Args:
+        metadata (SourceMetadata): Tags and pictures of the source file.
+        cache (Optional[ArtworkCache]): Cache used to deduplicate and resize.
+
+    Returns:
+        Optional[Artwork]: The cover, or None if the source has no pictures.
+    """
+    picture = metadata.cover
+    reference = metadata.cover_reference
+    if picture is None and reference is not None:
+        artwork = cache.lookup(reference.key) if cache else None
+        if artwork is not None:
+            return artwork
+        picture = read_source_metadata(reference.source).cover
+    if picture is None:
+        return None
+    if cache is None:
+        return Artwork(picture.data, picture.mime)
+    return cache.get(picture.data, picture.mime)
+
+
+def _source_tags(
+    metadata: SourceMetadata, loudness: Dict[str, str]
+) -> Dict[str, List[str]]:
+    if not loudness:
+        return metadata.tags
+    return {
+        key: values
+        for key, values in metadata.tags.items()
+        if not key.lower().startswith(_REPLAYGAIN_PREFIX)
+    }
+
+
+def add_id3_loudness(tags: ID3, loudness: Dict[str, str]) -> None:
+    """
+    Set loudness tags in an ID3 tag set, replacing earlier values.
+
+    ReplayGain values go into TXXX frames and Sound Check into the iTunes
+    comment frame, as iTunes and foobar2000 write them.
+
+    Args:
+        tags (ID3): The tags to update.
+        loudness (Dict[str, str]): Values by tag name, from ``loudness_tags``.
+    """
+    for name, value in loudness.items():
+        if name == SOUND_CHECK:
+            tags.setall(
+                f"COMM:{name}:eng",
+                [COMM(encoding=3, lang="eng", desc=name, text=[value])],
+            )
+        else:
+            tags.setall(f"TXXX:{name}", [TXXX(encoding=3, desc=name, text=[value])])
+
+
+def add_mp4_loudness(tags, loudness: Dict[str, str]) -> None:
+    """
+    Set loudness tags in an MP4 tag set as iTunes freeform atoms.
+
+    Args:
+        tags (MP4Tags): The tags to update.
+        loudness (Dict[str, str]): Values by tag name, from ``loudness_tags``.
+    """
+    for name, value in loudness.items():
+        key = name if name == SOUND_CHECK else name.lower()
+        tags[ITUNES_FREEFORM + key] = [MP4FreeForm(value.encode("utf-8"))]
+
+
+def build_id3_tags(
+    metadata: SourceMetadata,
+    cover: Optional[Artwork],
+    loudness: Optional[Dict[str, str]] = None,
+) -> ID3:
+    """
+    Build the complete ID3 tag set for a converted file in memory.
+
+    Tag names are mapped to frames the same way EasyID3 does, so only keys
+    EasyID3 knows about are carried over.
+
+    Args:
+        metadata (SourceMetadata): Tags of the source file.
+        cover (Optional[Artwork]): Cover art to embed, if any.
+        loudness (Optional[Dict[str, str]]): Measured loudness tags, which
+            replace any ReplayGain tags of the source.
+
+    Returns:
+        ID3: The tags, ready to be saved as ID3v2.3.
+    """
+    tags = ID3()
+    for key, values in _source_tags(metadata, loudness).items():
+        setter = EasyID3.Set.get(key)
+        if setter is not None:
+            setter(tags, key, values)
+    if loudness:
+        add_id3_loudness(tags, loudness)
+
+    if cover is not None:
+        tags.add(
+            APIC(
+                encoding=3,  # 3 is for utf-8
+                mime=cover.mime,
+                type=FRONT_COVER,
+                desc="Cover",
+                data=cover.data,
+            )
+        )
+
+    tags.update_to_v23()
+    return tags
+
+
+def write_id3_tags(
+    metadata: SourceMetadata,
+    dest_path: Path,
+    cover: Optional[Artwork],
+    loudness: Optional[Dict[str, str]] = None,
+) -> None:
+    """
+    Replace the tags of an MP3 file with a single save.
+
+    Args:
+        metadata (SourceMetadata): Tags of the source file.
+        dest_path (Path): Path to the MP3 file.
+        cover (Optional[Artwork]): Cover art to embed, if any.
+        loudness (Optional[Dict[str, str]]): Measured loudness tags.
+    """
+    build_id3_tags(metadata, cover, loudness).save(dest_path, v2_version=3)
+
+
+def write_mp4_tags(
+    metadata: SourceMetadata,
+    dest_path: Path,
+    cover: Optional[Artwork],
+    loudness: Optional[Dict[str, str]] = None,
+) -> None:
+    """
+    Replace the tags of an M4A file (AAC or ALAC) with a single save.
+
+    Tag names are mapped to atoms the same way EasyMP4 does. Gapless playback
+    info written by the encoder is kept.
+
+    Args:
+        metadata (SourceMetadata): Tags of the source file.
+        dest_path (Path): Path to the M4A file.
+        cover (Optional[Artwork]): Cover art to embed, if any.
+        loudness (Optional[Dict[str, str]]): Measured loudness tags, which
+            replace any ReplayGain tags of the source.
+    """
+    mp4 = MP4(dest_path)
+    if mp4.tags is None:
+        mp4.add_tags()
+    gapless = mp4.tags.get(ITUNSMPB_KEY)
+    mp4.tags.clear()
+    if gapless:
+        mp4.tags[ITUNSMPB_KEY] = gapless
+
+    for key, values in _source_tags(metadata, loudness).items():
+        setter = EasyMP4Tags.Set.get(key)
+        if setter is None:
+            continue
+        try:
+            setter(mp4.tags, key, values)
+        except ValueError as e:
+            logger.warning(f"Dropping tag {key}={values} for {dest_path}: {str(e)}")
+
+    if cover is not None:
+        image_format = (
+            MP4Cover.FORMAT_PNG if cover.mime == "image/png" else MP4Cover.FORMAT_JPEG
+        )
+        mp4.tags["covr"] = [MP4Cover(cover.data, imageformat=image_format)]
+    if loudness:
+        add_mp4_loudness(mp4.tags, loudness)
+
+    mp4.save()
+
+
+_TAG_WRITERS = {
+    TagFormat.ID3: write_id3_tags,
+    TagFormat.MP4: write_mp4_tags,
+}
+
+
+def write_tags(
+    metadata: SourceMetadata,
+    dest_path: Path,
+    cover: Optional[Artwork],
+    tag_format: TagFormat,
+    loudness: Optional[Dict[str, str]] = None,
+) -> None:
+    """
+    Write tags with the writer matching the output container.
+
+    Args:
+        metadata (SourceMetadata): Tags of the source file.
+        dest_path (Path): Path to the converted file.
+        cover (Optional[Artwork]): Cover art to embed, if any.
+        tag_format (TagFormat): Tagging scheme of the output container.
+        loudness (Optional[Dict[str, str]]): Measured ReplayGain and Sound
+            Check tags.
+    """
+    _TAG_WRITERS[tag_format](metadata, dest_path, cover, loudness)
+
+
+def update_loudness_tags(
+    dest_path: Path, loudness: Dict[str, str], tag_format: TagFormat
+) -> None:
+    """
+    Add or replace loudness tags of a tagged file, keeping everything else.
+
+    Used for album gain, which is only known once the whole album is done.
+
+    Args:
+        dest_path (Path): Path to the converted file.
+        loudness (Dict[str, str]): Values by tag name.
+        tag_format (TagFormat): Tagging scheme of the output container.
+    """
+    if tag_format == TagFormat.ID3:
+        tags = ID3(dest_path)
+        add_id3_loudness(tags, loudness)
+        tags.save(dest_path, v2_version=3)
+    else:
+        mp4 = MP4(dest_path)
+        if mp4.tags is None:
+            mp4.add_tags()
+        add_mp4_loudness(mp4.tags, loudness)
+        mp4.save()
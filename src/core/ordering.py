@@ -0,0 +1,107 @@
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+from src.core.metadata import read_stream_info
+from src.utils.enums import JobOrder
+
+# Cost model, in seconds of work on a reference machine. Encoding scales with
+# the number of PCM samples, decoding and I/O with the compressed size, and
+# every file pays for starting an encoder and writing its tags.
+FILE_OVERHEAD_SECONDS = 0.05
+SAMPLE_COST_SECONDS = 1e-7
+BYTE_COST_SECONDS = 2e-9
+
+# Used when a file has no readable STREAMINFO: CD-quality FLAC compresses to
+# roughly 100 KB per second of audio.
+FALLBACK_BYTES_PER_SECOND = 100_000
+FALLBACK_SAMPLES_PER_SECOND = 2 * 44_100
+
+
+@dataclass(frozen=True)
+class JobEstimate:
+    """Estimated size of one conversion job."""
+
+    source: Path
+    output: Path
+    duration: float
+    cost: float
+
+
+def estimate_job(source: Path, output: Path) -> JobEstimate:
+    """
+    Estimate the duration and conversion cost of a FLAC file.
+
+    Only the STREAMINFO block is read, so this is cheap enough to run for every
+    file of a library before starting.
+
+    Args:
+        source (Path): Path to the FLAC file.
+        output (Path): Output path of the job.
+
+    Returns:
+        JobEstimate: The estimate; sized from the file size alone if the
+            STREAMINFO cannot be read.
+    """
+    try:
+        size = source.stat().st_size
+    except OSError:
+        size = 0
+    info = read_stream_info(source)
+    if info is not None and info.total_samples:
+        duration = info.length
+        samples = info.total_samples * info.channels
+    else:
+        duration = size / FALLBACK_BYTES_PER_SECOND
+        samples = duration * FALLBACK_SAMPLES_PER_SECOND
+    cost = (
+        FILE_OVERHEAD_SECONDS + samples * SAMPLE_COST_SECONDS + size * BYTE_COST_SECONDS
+    )
+    return JobEstimate(source, output, duration, cost)
+
+
+def order_jobs(
+    jobs: Iterable[Tuple[Path, Path]], order: JobOrder
+) -> List[Tuple[Path, Path]]:
+    """
+    Sort (source, output) pairs to shorten the tail of a parallel run.
+
+    Starting the biggest jobs first keeps a long live recording or DJ mix from
+    being the last job running while every other worker idles.
+
+    ``LONGEST`` sorts by audio duration, ``COST`` by the estimated conversion
+    time (which also weighs sample rate, channel count and per-file overhead),
+    and ``ALBUM`` keeps each directory together, biggest album first and
+    biggest track first within it, so albums finish one after another.
+    ``SCAN`` keeps the discovery order.
+
+    Args:
+        jobs (Iterable[Tuple[Path, Path]]): Source and output paths.
+        order (JobOrder): The ordering to apply.
+
+    Returns:
+        List[Tuple[Path, Path]]: The jobs in the order to submit them.
+    """
+    if order == JobOrder.SCAN:
+        return list(jobs)
+
+    estimates = [estimate_job(source, output) for source, output in jobs]
+    if order == JobOrder.LONGEST:
+        estimates.sort(key=lambda job: job.duration, reverse=True)
+    elif order == JobOrder.COST:
+        estimates.sort(key=lambda job: job.cost, reverse=True)
+    elif order == JobOrder.ALBUM:
+        albums: Dict[Path, List[JobEstimate]] = defaultdict(list)
+        for job in estimates:
+            albums[job.source.parent].append(job)
+        estimates = []
+        for tracks in sorted(
+            albums.values(),
+            key=lambda tracks: sum(t.cost for t in tracks),
+            reverse=True,
+        ):
+            estimates.extend(sorted(tracks, key=lambda job: job.cost, reverse=True))
+    else:
+        raise ValueError(f"Unsupported job order: {order}")
+    return [(job.source, job.output) for job in estimates]
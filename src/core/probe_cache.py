@@ -0,0 +1,161 @@
+import json
+import os
+import sqlite3
+from pathlib import Path
+from threading import Lock, RLock
+from typing import Dict, Optional
+
+from src.core.artwork import artwork_key
+from src.core.metadata import CoverReference, SourceMetadata, read_source_metadata
+from src.utils.exceptions import FileOperationError
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+PROBE_CACHE_FILENAME = ".flac2apple-probe.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS source_probes (
+    source TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    tags TEXT NOT NULL,
+    duration REAL NOT NULL,
+    cover_key TEXT,
+    cover_mime TEXT
+)
+"""
+# Earlier versions stored a copy of every embedded picture.
+_LEGACY_TABLE = "probes"
+
+
+class ProbeCache:
+    """
+    A persistent SQLite cache of the tags, duration and cover key of sources.
+
+    Entries are keyed by path and trusted as long as the file's size and mtime
+    are unchanged, so a later run, or another target of the same run, gets the
+    metadata without parsing the FLAC again. Pictures are not copied into the
+    cache: the cover is recorded by its content key and resolved through the
+    artwork cache, which reads it from the source only on a miss. Several
+    processes may share the file; SQLite serializes the writes.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = RLock()
+        try:
+            self._connection = sqlite3.connect(
+                str(path), timeout=30, check_same_thread=False
+            )
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(_SCHEMA)
+            self._connection.commit()
+            self._drop_legacy_table()
+        except sqlite3.Error as e:
+            logger.error(f"Error opening probe cache {path}: {str(e)}")
+            raise FileOperationError(f"Failed to open probe cache {path}: {str(e)}")
+
+    @classmethod
+    def for_directory(cls, directory: Path) -> "ProbeCache":
+        """Open the probe cache stored in the given directory."""
+        directory.mkdir(parents=True, exist_ok=True)
+        return cls(directory / PROBE_CACHE_FILENAME)
+
+    def read(self, source: Path) -> SourceMetadata:
+        """
+        Return the metadata of a source, parsing it only if not cached.
+
+        Args:
+            source (Path): Path to the FLAC file.
+
+        Returns:
+            SourceMetadata: Tags and duration of the file, with the cover
+                as a reference when read from the cache.
+        """
+        stat = source.stat()
+        key = str(source.resolve())
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT size, mtime_ns, tags, duration, cover_key, cover_mime "
+                "FROM source_probes WHERE source = ?",
+                (key,),
+            ).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            self.hits += 1
+            return SourceMetadata(
+                tags=json.loads(row[2]),
+                duration=row[3],
+                cover_reference=(
+                    CoverReference(source, row[4], row[5]) if row[4] else None
+                ),
+            )
+
+        self.misses += 1
+        metadata = read_source_metadata(source)
+        cover = metadata.cover
+        try:
+            with self._lock:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO source_probes "
+                    "(source, size, mtime_ns, tags, duration, cover_key, cover_mime) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        key,
+                        stat.st_size,
+                        stat.st_mtime_ns,
+                        json.dumps(metadata.tags),
+                        metadata.duration,
+                        artwork_key(cover.data) if cover else None,
+                        cover.mime if cover else None,
+                    ),
+                )
+                self._connection.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not cache metadata of {source}: {str(e)}")
+        return metadata
+
+    def _drop_legacy_table(self) -> None:
+        """Drop the picture copies of earlier versions and reclaim their space."""
+        exists = self._connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (_LEGACY_TABLE,),
+        ).fetchone()
+        if exists:
+            self._connection.execute(f"DROP TABLE {_LEGACY_TABLE}")
+            self._connection.commit()
+            self._connection.execute("VACUUM")
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._connection.close()
+
+
+# One connection per process and cache file, shared by its worker threads.
+_caches: Dict[str, Optional[ProbeCache]] = {}
+_caches_lock = Lock()
+
+
+def get_probe_cache(path: Path) -> Optional[ProbeCache]:
+    """
+    Return the shared probe cache at ``path`` for this process.
+
+    Args:
+        path (Path): Path of the cache database.
+
+    Returns:
+        Optional[ProbeCache]: The cache, or None if it cannot be opened, in
+            which case sources are parsed directly.
+    """
+    key = os.fspath(path)
+    with _caches_lock:
+        if key not in _caches:
+            try:
+                _caches[key] = ProbeCache(path)
+            except FileOperationError as e:
+                logger.warning(f"Not caching source metadata: {str(e)}")
+                _caches[key] = None
+        return _caches[key]
@@ -0,0 +1,199 @@
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from src.core.results import ConversionResult, ConversionStatus
+
+# Worker stage while waiting for a free encoder slot.
+WAITING = "waiting"
+
+
+@dataclass(frozen=True)
+class WorkerState:
+    """What one worker is doing at the time of a snapshot."""
+
+    worker: str
+    source: str
+    stage: str
+    seconds: float
+
+
+@dataclass(frozen=True)
+class ProgressSnapshot:
+    """
+    Aggregated progress of a directory conversion at one point in time.
+
+    Rates are measured over the last few seconds so they follow changes in
+    track length, while ``eta_seconds`` extrapolates the remaining files from
+    them. ``files_total`` is the number of files found so far and only becomes
+    final once ``scan_finished`` is set.
+    """
+
+    files_done: int
+    files_total: int
+    scan_finished: bool
+    converted: int
+    skipped: int
+    failed: int
+    bytes_done: int
+    audio_seconds: float
+    elapsed_seconds: float
+    files_per_second: float
+    bytes_per_second: float
+    realtime_factor: float
+    eta_seconds: Optional[float]
+    workers: Tuple[WorkerState, ...]
+
+    @property
+    def fraction(self) -> float:
+        """Completed share of the files found so far, between 0 and 1."""
+        return self.files_done / self.files_total if self.files_total else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON serializable representation."""
+        data = asdict(self)
+        for key, value in data.items():
+            if isinstance(value, float):
+                data[key] = round(value, 3)
+        data["workers"] = [
+            dict(state, seconds=round(state["seconds"], 3)) for state in data["workers"]
+        ]
+        return data
+
+
+class ProgressTracker:
+    """
+    Thread-safe progress model shared by the conversion runners and front ends.
+
+    Runners report every result and what each worker is doing; this is cheap
+    and never calls back into the front end. Front ends read ``snapshot`` when
+    they want to redraw, or poll ``tick``, which returns a new snapshot at most
+    once per ``interval``. A GUI polling from its own timer therefore does a
+    bounded amount of work however fast files complete.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.25,
+        window: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            interval (float): Minimum seconds between snapshots from ``tick``.
+            window (float): Seconds of recent completions the rates and the ETA
+                are computed from.
+            clock (Callable[[], float]): Monotonic time source.
+        """
+        self.interval = interval
+        self.window = window
+        self._clock = clock
+        self._lock = Lock()
+        self._started = clock()
+        self._last_tick = self._started
+
+        self._files_total = 0
+        self._scan_finished = False
+        self._counts = {status: 0 for status in ConversionStatus}
+        self._bytes = 0
+        self._audio_seconds = 0.0
+        # (time, bytes, audio seconds) of recent conversions, for the rates.
+        self._recent: Deque[Tuple[float, int, float]] = deque()
+        self._workers: Dict[str, Tuple[str, str, float]] = {}
+
+    def set_found(self, count: int, finished: bool = False) -> None:
+        """Update the number of files found by the scan."""
+        with self._lock:
+            self._files_total = count
+            self._scan_finished = finished
+
+    def record(self, result: ConversionResult) -> None:
+        """Account for the outcome of one file."""
+        now = self._clock()
+        with self._lock:
+            self._counts[result.status] += 1
+            if result.status != ConversionStatus.CONVERTED:
+                return
+            size = 0
+            audio = 0.0
+            if result.timings:
+                size = result.timings.bytes.get("input", 0)
+                audio = result.timings.audio_seconds or 0.0
+            self._bytes += size
+            self._audio_seconds += audio
+            self._recent.append((now, size, audio))
+
+    def worker_started(self, worker: str, source: Path, stage: str = WAITING) -> None:
+        """Record that ``worker`` picked up ``source``."""
+        with self._lock:
+            self._workers[worker] = (str(source), stage, self._clock())
+
+    def worker_stage(self, worker: str, stage: str) -> None:
+        """Record that ``worker`` moved on to another stage of its file."""
+        with self._lock:
+            if worker in self._workers:
+                source, _, _ = self._workers[worker]
+                self._workers[worker] = (source, stage, self._clock())
+
+    def worker_finished(self, worker: str) -> None:
+        """Record that ``worker`` is idle."""
+        with self._lock:
+            self._workers.pop(worker, None)
+
+    def tick(self) -> Optional[ProgressSnapshot]:
+        """Return a new snapshot if ``interval`` has passed since the last one."""
+        now = self._clock()
+        with self._lock:
+            if now - self._last_tick < self.interval:
+                return None
+            self._last_tick = now
+            return self._snapshot(now)
+
+    def snapshot(self) -> ProgressSnapshot:
+        """Return the current progress."""
+        now = self._clock()
+        with self._lock:
+            return self._snapshot(now)
+
+    def _snapshot(self, now: float) -> ProgressSnapshot:
+        while self._recent and now - self._recent[0][0] > self.window:
+            self._recent.popleft()
+
+        elapsed = now - self._started
+        # Rates over the window, or since the start while the run is young.
+        span = min(self.window, elapsed)
+        if span > 0:
+            files_rate = len(self._recent) / span
+            bytes_rate = sum(size for _, size, _ in self._recent) / span
+            audio_rate = sum(audio for _, _, audio in self._recent) / span
+        else:
+            files_rate = bytes_rate = audio_rate = 0.0
+
+        done = sum(self._counts.values())
+        remaining = max(self._files_total - done, 0)
+        eta = remaining / files_rate if files_rate else None
+        if not remaining and self._scan_finished:
+            eta = 0.0
+
+        return ProgressSnapshot(
+            files_done=done,
+            files_total=self._files_total,
+            scan_finished=self._scan_finished,
+            converted=self._counts[ConversionStatus.CONVERTED],
+            skipped=self._counts[ConversionStatus.SKIPPED],
+            failed=self._counts[ConversionStatus.FAILED],
+            bytes_done=self._bytes,
+            audio_seconds=self._audio_seconds,
+            elapsed_seconds=elapsed,
+            files_per_second=files_rate,
+            bytes_per_second=bytes_rate,
+            realtime_factor=audio_rate,
+            eta_seconds=eta,
+            workers=tuple(
+                WorkerState(worker, source, stage, now - since)
+                for worker, (source, stage, since) in sorted(self._workers.items())
+            ),
+        )
@@ -0,0 +1,62 @@
+from dataclasses import asdict, dataclass
+from enum import Enum
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from src.core.loudness import Loudness
+from src.utils.profiling import StageTimings
+
+
+class ConversionStatus(Enum):
+    CONVERTED = "converted"
+    SKIPPED = "skipped"
+    FAILED = "failed"
+    PLANNED = "planned"
+    CANCELLED = "cancelled"
+
+
+@dataclass
+class ConversionResult:
+    """
+    Outcome of a single file in a directory conversion.
+
+    Attributes:
+        source (Path): The input FLAC file.
+        output (Path): The output file, whether or not it was written.
+        status (ConversionStatus): What happened to the file.
+        seconds (Optional[float]): Wall time spent converting the file.
+        error (Optional[str]): Error message for failed files.
+        timings (Optional[StageTimings]): Per-stage times and byte counters.
+        loudness (Optional[List[Loudness]]): Measured loudness of every track
+            written, when loudness is measured. Not serialized.
+    """
+
+    source: Path
+    output: Path
+    status: ConversionStatus
+    seconds: Optional[float] = None
+    error: Optional[str] = None
+    timings: Optional[StageTimings] = None
+    loudness: Optional[List[Loudness]] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON-serializable representation."""
+        data = asdict(self)
+        del data["loudness"]
+        data["source"] = str(self.source)
+        data["output"] = str(self.output)
+        data["status"] = self.status.value
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ConversionResult":
+        """Rebuild a result from the output of ``to_dict``."""
+        timings = data.get("timings")
+        return cls(
+            source=Path(data["source"]),
+            output=Path(data["output"]),
+            status=ConversionStatus(data["status"]),
+            seconds=data.get("seconds"),
+            error=data.get("error"),
+            timings=StageTimings(**timings) if timings else None,
+        )
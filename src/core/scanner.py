@@ -0,0 +1,123 @@
+import os
+import time
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Iterable, Iterator, Set, Tuple
+
+from src.utils.exceptions import FileOperationError
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class LibraryScanner:
+    """
+    Lazily walk a directory tree and yield audio files as they are found.
+
+    The walk is built on ``os.scandir`` and never materializes the whole tree,
+    so conversion can start on the first file while the rest of the library is
+    still being listed. ``count`` holds the running number of files yielded so
+    far, ``seconds`` the time spent walking (excluding time the consumer holds
+    the generator) and ``finished`` becomes True once the walk is complete.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        extensions: Iterable[str] = (".flac",),
+        exclude: Iterable[str] = (),
+        follow_symlinks: bool = True,
+    ):
+        """
+        Args:
+            root (Path): Directory to scan.
+            extensions (Iterable[str]): File extensions to yield, matched
+                case-insensitively (``.flac`` also matches ``.FLAC``).
+            exclude (Iterable[str]): Glob patterns; files and directories whose
+                name or path relative to ``root`` matches are skipped.
+            follow_symlinks (bool): Descend into symlinked directories.
+        """
+        self.root = Path(root)
+        self.extensions: Tuple[str, ...] = tuple(ext.lower() for ext in extensions)
+        self.exclude: Tuple[str, ...] = tuple(exclude)
+        self.follow_symlinks = follow_symlinks
+        self.count = 0
+        self.seconds = 0.0
+        self.finished = False
+
+    def __iter__(self) -> Iterator[Path]:
+        self.count = 0
+        self.seconds = 0.0
+        self.finished = False
+        resumed = time.perf_counter()
+        visited: Set[Tuple[int, int]] = set()
+
+        try:
+            root_stat = self.root.stat()
+        except OSError as e:
+            logger.error(f"Error accessing directory {self.root}: {str(e)}")
+            raise FileOperationError(
+                f"Failed to access directory {self.root}: {str(e)}"
+            )
+        visited.add((root_stat.st_dev, root_stat.st_ino))
+
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            subdirectories = []
+            for entry in self._list(directory):
+                path = Path(entry.path)
+                if self.is_excluded(path):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=self.follow_symlinks):
+                        if entry.is_symlink() and not self._first_visit(entry, visited):
+                            continue
+                        subdirectories.append(path)
+                    elif entry.name.lower().endswith(self.extensions):
+                        self.count += 1
+                        self.seconds += time.perf_counter() - resumed
+                        yield path
+                        resumed = time.perf_counter()
+                except OSError as e:
+                    logger.warning(f"Skipping {path}: {str(e)}")
+            # Reversed so directories are visited in name order.
+            stack.extend(reversed(subdirectories))
+
+        self.seconds += time.perf_counter() - resumed
+        self.finished = True
+
+    def wants(self, path: Path) -> bool:
+        """Check whether the scan would yield a file at ``path``."""
+        return path.name.lower().endswith(self.extensions) and not self.is_excluded(
+            path
+        )
+
+    def _list(self, directory: Path) -> list:
+        """List a directory sorted by name, logging and skipping unreadable ones."""
+        try:
+            with os.scandir(directory) as entries:
+                return sorted(entries, key=lambda entry: entry.name)
+        except OSError as e:
+            logger.warning(f"Skipping unreadable directory {directory}: {str(e)}")
+            return []
+
+    def is_excluded(self, path: Path) -> bool:
+        """Check whether a path below the root matches an exclude pattern."""
+        if not self.exclude:
+            return False
+        relative = path.relative_to(self.root).as_posix()
+        return any(
+            fnmatch(path.name, pattern) or fnmatch(relative, pattern)
+            for pattern in self.exclude
+        )
+
+    @staticmethod
+    def _first_visit(entry: os.DirEntry, visited: Set[Tuple[int, int]]) -> bool:
+        """Record a symlinked directory, returning False if it was seen before."""
+        stat = entry.stat()
+        key = (stat.st_dev, stat.st_ino)
+        if key in visited:
+            return False
+        visited.add(key)
+        return True
@@ -0,0 +1,205 @@
+import os
+import time
+from contextlib import nullcontext
+from functools import partial
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from threading import BoundedSemaphore, current_thread
+from typing import Optional
+
+from src.core.atomic import atomic_outputs
+from src.core.chunking import held_encoder_slot
+from src.core.loudness import measure_transcode
+from src.core.memory import MemoryGovernor
+from src.core.progress import ProgressTracker
+from src.core.results import ConversionResult, ConversionStatus
+from src.utils.exceptions import ConversionError
+from src.utils.logging_config import get_logger
+from src.utils.profiling import ENCODE, METADATA, CpuProfiler
+
+logger = get_logger(__name__)
+
+# Upper bound on jobs queued ahead of the workers. Keeps memory flat on very
+# large libraries while still letting the scan run ahead of the encoders.
+MAX_PENDING_JOBS = 1024
+
+
+def default_worker_count() -> int:
+    """Return the number of workers to use when none is configured."""
+    return os.cpu_count() or 1
+
+
+class ConversionScheduler:
+    """
+    Schedule single file conversions across the available cores.
+
+    Each job runs on a worker thread that waits for an encoder slot before
+    starting the transcode, so the number of concurrent encoder subprocesses is
+    bounded independently of the worker count. A file encoded in parallel
+    segments takes a slot per running segment. Tag writing is I/O-bound and
+    stays on the worker threads. The whole transcode of in-process backends
+    such as pydub is held back by the GIL, so it can optionally be sent to a
+    process pool. With a memory governor, a job also waits until its estimated
+    memory fits the budget.
+
+    Use as a context manager so the pools are shut down when the run ends.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_encoders: Optional[int] = None,
+        metadata_processes: Optional[int] = None,
+        profiler: Optional[CpuProfiler] = None,
+        progress: Optional[ProgressTracker] = None,
+        memory: Optional[MemoryGovernor] = None,
+    ):
+        """
+        Args:
+            max_workers (Optional[int]): Number of jobs in progress at once.
+                Defaults to ``os.cpu_count()``.
+            max_encoders (Optional[int]): Number of concurrent encoder
+                subprocesses. Defaults to ``max_workers``.
+            metadata_processes (Optional[int]): Size of the process pool for
+                transcodes of in-process backends such as pydub. Defaults to
+                ``0``, which runs them on the worker threads.
+            profiler (Optional[CpuProfiler]): Profiles the jobs on the worker
+                threads.
+            progress (Optional[ProgressTracker]): Receives the stage each
+                worker thread is in.
+            memory (Optional[MemoryGovernor]): Holds jobs back until their
+                estimated memory fits its budget.
+        """
+        self.max_workers = max_workers or default_worker_count()
+        self.max_encoders = max_encoders or self.max_workers
+        self.metadata_processes = metadata_processes or 0
+
+        self.profiler = profiler
+        self.progress = progress
+        self.memory = memory
+        self._encoder_slots = BoundedSemaphore(self.max_encoders)
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self) -> "ConversionScheduler":
+        self._thread_pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        if self.metadata_processes > 0:
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=self.metadata_processes
+            )
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.shutdown(cancel_pending=exc_type is not None)
+
+    def shutdown(self, cancel_pending: bool = False) -> None:
+        """
+        Shut down the worker pools.
+
+        Args:
+            cancel_pending (bool): Drop jobs that have not started yet.
+        """
+        if self._thread_pool:
+            self._thread_pool.shutdown(wait=True, cancel_futures=cancel_pending)
+            self._thread_pool = None
+        if self._process_pool:
+            self._process_pool.shutdown(wait=True, cancel_futures=cancel_pending)
+            self._process_pool = None
+
+    def submit(self, converter, input_path: Path, output_path: Path) -> Future:
+        """
+        Queue a conversion.
+
+        Args:
+            converter (SingleFileConverter): Converter configured for the job.
+            input_path (Path): Path to the input FLAC file.
+            output_path (Path): Path for the output file.
+
+        Returns:
+            Future: Resolves to a ConversionResult, or raises ConversionError.
+        """
+        if self._thread_pool is None:
+            raise RuntimeError("ConversionScheduler must be used as a context manager")
+        return self._thread_pool.submit(self._run, converter, input_path, output_path)
+
+    def _run(self, converter, input_path: Path, output_path: Path) -> ConversionResult:
+        """Run one conversion on a worker thread."""
+        started = time.perf_counter()
+        profiling = self.profiler.thread() if self.profiler else nullcontext()
+        worker = current_thread().name
+        if self.progress:
+            self.progress.worker_started(worker, input_path)
+        try:
+            outputs = [output_path, *converter.extra_outputs(output_path)]
+            with profiling, atomic_outputs(
+                outputs, sync=converter.sync_output
+            ) as partials:
+                reservation = (
+                    self.memory.reserve(converter.memory_estimate(input_path))
+                    if self.memory
+                    else nullcontext()
+                )
+                analyzer = converter.loudness_analyzer(input_path)
+                with reservation, self._encoder_slots:
+                    self._set_stage(worker, ENCODE)
+                    # Segmented encodes take further slots per segment.
+                    slot = held_encoder_slot.set(self._encoder_slots)
+                    try:
+                        timings, analyzer = self._transcode(
+                            converter, input_path, partials, analyzer
+                        )
+                    finally:
+                        held_encoder_slot.reset(slot)
+                write_metadata = converter.write_metadata
+                if timings.linked:
+                    write_metadata = partial(write_metadata, linked=True)
+                loudness = None
+                if analyzer is not None:
+                    loudness = analyzer.results()
+                    write_metadata = partial(write_metadata, loudness=loudness)
+                self._set_stage(worker, METADATA)
+                timings.merge(write_metadata(input_path, *partials))
+            logger.info(
+                f"Converted {input_path} to {output_path} ({timings.describe()})"
+            )
+            return ConversionResult(
+                input_path,
+                output_path,
+                ConversionStatus.CONVERTED,
+                seconds=time.perf_counter() - started,
+                timings=timings,
+                loudness=loudness,
+            )
+        except Exception as e:
+            logger.error(f"Error converting {input_path}: {str(e)}")
+            raise ConversionError(f"Failed to convert {input_path}: {str(e)}")
+        finally:
+            if self.progress:
+                self.progress.worker_finished(worker)
+
+    def _transcode(self, converter, input_path: Path, outputs, analyzer):
+        """
+        Transcode, in the process pool for backends that decode in Python.
+
+        Returns the timings and the analyzer, which is a fed copy when the
+        transcode ran in another process.
+        """
+        if analyzer is None:
+            func, args = converter.transcode, (input_path, *outputs)
+        else:
+            func, args = measure_transcode, (converter, input_path, outputs, analyzer)
+        if converter.backend.runs_in_subprocess:
+            result = func(*args)
+        else:
+            result = self._run_python_side(func, *args)
+        return result if analyzer is not None else (result, None)
+
+    def _set_stage(self, worker: str, stage: str) -> None:
+        if self.progress:
+            self.progress.worker_stage(worker, stage)
+
+    def _run_python_side(self, func, *args):
+        """Run a GIL-bound transcode in the process pool when one is configured."""
+        if self._process_pool is None:
+            return func(*args)
+        return self._process_pool.submit(func, *args).result()
@@ -0,0 +1,291 @@
+import json
+import os
+import shutil
+import socket
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from src.core.atomic import partial_path
+from src.core.results import ConversionResult, ConversionStatus
+from src.utils.exceptions import FileOperationError
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_LEASE_SECONDS = 300.0
+DEFAULT_MAX_ATTEMPTS = 3
+# Jobs a coordinator keeps queued or claimed at once. Every claim lists the
+# pending directory, so the queue is topped up as jobs finish rather than
+# holding the whole library.
+DEFAULT_MAX_QUEUED = 1024
+
+_PENDING = "pending"
+_CLAIMED = "claimed"
+_DONE = "done"
+_CONFIG = "config.json"
+_CLOSED = "closed"
+_CLOCK = ".clock"
+
+
+def default_worker_id() -> str:
+    """Return an identifier for this process that is unique across hosts."""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+@dataclass
+class SpoolJob:
+    """
+    A job claimed from the spool.
+
+    Attributes:
+        job_id (str): Identifier, also the order the coordinator planned in.
+        source (Path): The input FLAC file.
+        output (Path): The output path.
+        attempts (int): Number of times the job has been claimed.
+        path (Path): The claim file, whose mtime is the lease.
+    """
+
+    job_id: str
+    source: Path
+    output: Path
+    attempts: int
+    path: Path
+
+
+class JobSpool:
+    """
+    A durable job queue kept as files in a shared directory.
+
+    One coordinator plans jobs into ``pending/``. Any number of workers, on any
+    host that mounts the directory, claim a job by renaming its file into
+    ``claimed/``. The rename is atomic, so exactly one worker wins each job,
+    and it works over NFS, where SQLite locking is unreliable. A claim is a
+    lease: the worker touches the claim file while converting, and a claim
+    whose file has not been touched for ``lease_seconds`` is put back into
+    ``pending/`` by whoever notices first, so jobs of crashed workers are
+    converted elsewhere. Results are written to ``done/`` for the coordinator
+    to collect.
+
+    Lease ages are measured against the mtime of a file touched just before,
+    so hosts only need to agree with the file server's clock, not each other.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    ):
+        """
+        Args:
+            root (Path): The spool directory.
+            lease_seconds (float): Time after which an untouched claim expires.
+            max_attempts (int): Claims of a job before it is reported as
+                failed instead of being run again.
+        """
+        self.root = root
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.pending = root / _PENDING
+        self.claimed = root / _CLAIMED
+        self.done = root / _DONE
+        self.converter_config: Dict[str, Any] = {}
+        # Keeps results of a previous run's stragglers apart from this run's.
+        self.run_id = uuid.uuid4().hex[:8]
+        self._next_id = 0
+
+    @classmethod
+    def create(cls, root: Path, config: Dict[str, Any], **kwargs) -> "JobSpool":
+        """
+        Start a new queue in ``root``, discarding whatever it held.
+
+        Args:
+            root (Path): The spool directory.
+            config (Dict[str, Any]): Converter settings the workers use.
+            **kwargs: Passed to the constructor.
+
+        Raises:
+            FileOperationError: If the directory cannot be prepared.
+        """
+        spool = cls(root, **kwargs)
+        try:
+            for directory in (spool.pending, spool.claimed, spool.done):
+                if directory.exists():
+                    shutil.rmtree(directory)
+                directory.mkdir(parents=True)
+            (root / _CLOSED).unlink(missing_ok=True)
+            spool.converter_config = config
+            spool._write_json(
+                root / _CONFIG,
+                {
+                    "converter": config,
+                    "lease_seconds": spool.lease_seconds,
+                    "max_attempts": spool.max_attempts,
+                },
+            )
+        except OSError as e:
+            logger.error(f"Error preparing job spool {root}: {str(e)}")
+            raise FileOperationError(f"Failed to prepare job spool {root}: {str(e)}")
+        return spool
+
+    @classmethod
+    def open(cls, root: Path) -> Optional["JobSpool"]:
+        """
+        Join the run a coordinator started in ``root``.
+
+        Returns:
+            Optional[JobSpool]: The spool with the coordinator's lease and
+                converter settings, or None if no run was started yet.
+        """
+        try:
+            data = json.loads((root / _CONFIG).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        spool = cls(root, data["lease_seconds"], data["max_attempts"])
+        spool.converter_config = data["converter"]
+        return spool
+
+    # Coordinator side.
+
+    def enqueue(self, source: Path, output: Path) -> str:
+        """Add a job and return its identifier."""
+        job_id = f"{self.run_id}-{self._next_id:08d}"
+        self._next_id += 1
+        self._write_json(
+            self.pending / f"{job_id}.json",
+            {"source": str(source), "output": str(output), "attempts": 0},
+        )
+        return job_id
+
+    def close(self) -> None:
+        """Tell the workers that no more jobs will be added."""
+        (self.root / _CLOSED).touch()
+
+    def collect(self) -> Iterator[Tuple[str, ConversionResult]]:
+        """
+        Yield and remove the results reported since the last call.
+
+        A job whose lease expired while its worker was still alive can be
+        reported twice; callers should ignore repeated identifiers.
+
+        Yields:
+            Tuple[str, ConversionResult]: Job identifier and result.
+        """
+        for path in sorted(self.done.glob("*.json")):
+            try:
+                data = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                # Still being renamed into place; picked up next time.
+                continue
+            path.unlink(missing_ok=True)
+            data.pop("worker", None)
+            yield path.stem, ConversionResult.from_dict(data)
+
+    # Worker side.
+
+    def claim(self, worker: str) -> Optional[SpoolJob]:
+        """
+        Take the next pending job.
+
+        Args:
+            worker (str): Identifier of the claiming worker.
+
+        Returns:
+            Optional[SpoolJob]: The job, or None if nothing is pending.
+        """
+        for name in sorted(os.listdir(self.pending)):
+            if not name.endswith(".json"):
+                continue
+            job_id = name[: -len(".json")]
+            claim = self.claimed / f"{job_id}@{worker}.json"
+            try:
+                os.rename(self.pending / name, claim)
+            except FileNotFoundError:
+                continue  # Another worker was faster.
+            os.utime(claim, None)
+
+            data = json.loads(claim.read_text(encoding="utf-8"))
+            data["attempts"] = data.get("attempts", 0) + 1
+            job = SpoolJob(
+                job_id,
+                Path(data["source"]),
+                Path(data["output"]),
+                data["attempts"],
+                claim,
+            )
+            if job.attempts > self.max_attempts:
+                self.complete(
+                    job,
+                    ConversionResult(
+                        job.source,
+                        job.output,
+                        ConversionStatus.FAILED,
+                        error=f"Gave up on {job.source} after "
+                        f"{self.max_attempts} attempts",
+                    ),
+                    worker,
+                )
+                continue
+            self._write_json(claim, data)
+            return job
+        return None
+
+    def heartbeat(self, job: SpoolJob) -> None:
+        """Renew the lease of a job in progress."""
+        try:
+            os.utime(job.path, None)
+        except FileNotFoundError:
+            logger.warning(f"Lease on {job.source} expired; it may run twice")
+
+    def complete(self, job: SpoolJob, result: ConversionResult, worker: str) -> None:
+        """Report the result of a job and release its claim."""
+        data = result.to_dict()
+        data["worker"] = worker
+        self._write_json(self.done / f"{job.job_id}.json", data)
+        job.path.unlink(missing_ok=True)
+
+    # Both sides.
+
+    def reclaim_expired(self) -> List[str]:
+        """
+        Return jobs whose lease expired to the pending queue.
+
+        Returns:
+            List[str]: Identifiers of the reclaimed jobs.
+        """
+        now = self._now()
+        reclaimed = []
+        for claim in self.claimed.glob("*@*.json"):
+            try:
+                if now - claim.stat().st_mtime < self.lease_seconds:
+                    continue
+                job_id, _, worker = claim.stem.partition("@")
+                os.rename(claim, self.pending / f"{job_id}.json")
+            except FileNotFoundError:
+                continue
+            logger.warning(f"Reclaimed job {job_id} from unresponsive worker {worker}")
+            reclaimed.append(job_id)
+        return reclaimed
+
+    def drained(self) -> bool:
+        """Check whether the coordinator closed the queue and every job ran."""
+        return (
+            (self.root / _CLOSED).exists()
+            and not any(self.pending.glob("*.json"))
+            and not any(self.claimed.glob("*.json"))
+        )
+
+    def _now(self) -> float:
+        clock = self.root / _CLOCK
+        clock.touch()
+        os.utime(clock, None)
+        return clock.stat().st_mtime
+
+    @staticmethod
+    def _write_json(path: Path, data: Dict[str, Any]) -> None:
+        # Written aside and renamed, so readers never see a partial file.
+        temporary = partial_path(path, unique=True)
+        temporary.write_text(json.dumps(data), encoding="utf-8")
+        os.replace(temporary, path)
@@ -0,0 +1,290 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from src.core.scanner import LibraryScanner
+from src.utils.exceptions import FileOperationError
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# A file counts as completely written once its size and mtime stayed the
+# same for this long.
+DEFAULT_SETTLE_SECONDS = 2.0
+DEFAULT_POLL_INTERVAL = 5.0
+# How long a watch loop waits for events while files are settling or
+# converting, and while idle (bounding how late a stop request is noticed).
+BUSY_TICK_SECONDS = 0.25
+IDLE_TICK_SECONDS = 1.0
+
+# From <sys/inotify.h>.
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# Writes in progress are tracked by SettledFiles rather than IN_MODIFY, which
+# would fire for every block written.
+_WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len; then the name
+
+
+class DirectoryWatcher(ABC):
+    """Report FLAC files below a directory that were created or modified."""
+
+    def __init__(self, root: Path, exclude: Iterable[str] = ()):
+        self.root = root
+        self.scanner = LibraryScanner(root, exclude=exclude)
+
+    @abstractmethod
+    def changes(self, timeout: float) -> List[Path]:
+        """
+        Wait up to ``timeout`` seconds and return the files that changed.
+
+        A file may be reported several times while it is being written.
+        """
+
+    def close(self) -> None:
+        """Release the resources of the watcher."""
+
+    def _directories(self, top: Path) -> Iterator[Path]:
+        """Yield ``top`` and its subdirectories that are not excluded."""
+        visited: Set[Tuple[int, int]] = set()
+        for directory, subdirectories, _ in os.walk(top, followlinks=True):
+            stat = os.stat(directory)
+            if (stat.st_dev, stat.st_ino) in visited:
+                # A symlink back up the tree.
+                subdirectories[:] = []
+                continue
+            visited.add((stat.st_dev, stat.st_ino))
+            subdirectories[:] = [
+                name
+                for name in sorted(subdirectories)
+                if not self.scanner.is_excluded(Path(directory, name))
+            ]
+            yield Path(directory)
+
+    def __enter__(self) -> "DirectoryWatcher":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+class InotifyWatcher(DirectoryWatcher):
+    """
+    Watch a directory tree with Linux inotify.
+
+    Every directory gets a watch, and directories created or moved in later
+    are watched as they appear. Files already inside such a directory are
+    reported right away, since they may have been written before the watch
+    was added. If the kernel's event queue overflows, every file is reported
+    once, so nothing is lost.
+    """
+
+    def __init__(self, root: Path, exclude: Iterable[str] = ()):
+        super().__init__(root, exclude)
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._directories_by_wd: Dict[int, Path] = {}
+        self._watch_tree(root)
+
+    def changes(self, timeout: float) -> List[Path]:
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return []
+        changed: List[Path] = []
+        for wd, mask, name in self._read_events():
+            if mask & IN_Q_OVERFLOW:
+                logger.warning("inotify queue overflowed; checking every file")
+                changed.extend(self.scanner)
+                self._watch_tree(self.root)
+                continue
+            directory = self._directories_by_wd.get(wd)
+            if mask & IN_IGNORED:
+                self._directories_by_wd.pop(wd, None)
+                continue
+            if directory is None or not name:
+                continue
+            path = directory / name
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and not self.scanner.is_excluded(
+                    path
+                ):
+                    changed.extend(self._watch_tree(path))
+            elif self.scanner.wants(path):
+                changed.append(path)
+        return changed
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def _watch_tree(self, top: Path) -> List[Path]:
+        """Watch ``top`` and its subdirectories; return the files inside."""
+        found = []
+        for directory in self._directories(top):
+            wd = self._libc.inotify_add_watch(
+                self._fd, os.fsencode(directory), _WATCH_MASK
+            )
+            if wd < 0:
+                error = ctypes.get_errno()
+                if error == errno.ENOSPC:
+                    logger.error(
+                        "Out of inotify watches; raise "
+                        "fs.inotify.max_user_watches or use polling"
+                    )
+                    raise FileOperationError(f"Failed to watch {directory}")
+                logger.warning(f"Not watching {directory}: {os.strerror(error)}")
+                continue
+            self._directories_by_wd[wd] = directory
+            found.extend(
+                directory / entry.name
+                for entry in os.scandir(directory)
+                if entry.is_file() and self.scanner.wants(directory / entry.name)
+            )
+        return found
+
+    def _read_events(self) -> Iterator[Tuple[int, int, str]]:
+        while True:
+            try:
+                buffer = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return
+            offset = 0
+            while offset < len(buffer):
+                wd, mask, _, length = _EVENT.unpack_from(buffer, offset)
+                offset += _EVENT.size
+                name = buffer[offset : offset + length].rstrip(b"\0")
+                offset += length
+                yield wd, mask, os.fsdecode(name)
+
+
+class PollingWatcher(DirectoryWatcher):
+    """
+    Watch a directory tree by comparing the size and mtime of its files.
+
+    Used where inotify is not available, such as on macOS, Windows and network
+    filesystems, which do not deliver inotify events for changes made by other
+    hosts. Each poll walks the tree, but only stats the files.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        exclude: Iterable[str] = (),
+        interval: float = DEFAULT_POLL_INTERVAL,
+    ):
+        super().__init__(root, exclude)
+        self.interval = interval
+        self._snapshot = self._take_snapshot()
+        self._next_poll = time.monotonic() + interval
+
+    def changes(self, timeout: float) -> List[Path]:
+        time.sleep(max(0.0, min(timeout, self._next_poll - time.monotonic())))
+        if time.monotonic() < self._next_poll:
+            return []
+        self._next_poll = time.monotonic() + self.interval
+        snapshot = self._take_snapshot()
+        changed = [
+            path
+            for path, signature in snapshot.items()
+            if self._snapshot.get(path) != signature
+        ]
+        self._snapshot = snapshot
+        return changed
+
+    def _take_snapshot(self) -> Dict[Path, Tuple[int, int]]:
+        snapshot = {}
+        for path in self.scanner:
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            snapshot[path] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+
+def create_watcher(
+    root: Path, exclude: Iterable[str] = (), poll_interval: Optional[float] = None
+) -> DirectoryWatcher:
+    """
+    Create the best available watcher for a directory tree.
+
+    Args:
+        root (Path): Directory to watch.
+        exclude (Iterable[str]): Glob patterns of files and directories to
+            ignore, as for ``LibraryScanner``.
+        poll_interval (Optional[float]): Poll every this many seconds instead
+            of using inotify.
+
+    Returns:
+        DirectoryWatcher: An inotify watcher on Linux, otherwise a poller.
+    """
+    if poll_interval is None and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root, exclude)
+        except (OSError, AttributeError) as e:
+            logger.warning(f"inotify unavailable, polling instead: {str(e)}")
+    return PollingWatcher(root, exclude, poll_interval or DEFAULT_POLL_INTERVAL)
+
+
+class SettledFiles:
+    """
+    Hold back changed files until they are completely written.
+
+    Rips and copies arrive over seconds or minutes. A file is released once
+    its size and mtime stayed the same for ``settle_seconds``; any change in
+    between restarts the wait.
+    """
+
+    def __init__(self, settle_seconds: float = DEFAULT_SETTLE_SECONDS):
+        self.settle_seconds = settle_seconds
+        self._pending: Dict[Path, Tuple[Tuple[int, int], float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def touch(self, path: Path, now: Optional[float] = None) -> None:
+        """Note that ``path`` changed."""
+        signature = self._signature(path)
+        if signature is not None:
+            self._pending[path] = (signature, now or time.monotonic())
+
+    def ready(self, now: Optional[float] = None) -> List[Path]:
+        """Return and forget the files that have settled."""
+        now = now or time.monotonic()
+        settled = []
+        for path, (signature, changed) in list(self._pending.items()):
+            current = self._signature(path)
+            if current is None:
+                del self._pending[path]
+            elif current != signature:
+                self._pending[path] = (current, now)
+            elif now - changed >= self.settle_seconds:
+                del self._pending[path]
+                settled.append(path)
+        return sorted(settled)
+
+    @staticmethod
+    def _signature(path: Path) -> Optional[Tuple[int, int]]:
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
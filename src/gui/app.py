@@ -1,13 +1,18 @@
+import asyncio
 import tkinter as tk
 from pathlib import Path
 from threading import Thread
 from tkinter import filedialog, messagebox, ttk
 from typing import Callable, Optional
 
+from src.core.async_engine import AsyncConversionEngine
 from src.core.converter import AudioConverter
 from src.core.file_handler import FileHandler
+from src.core.progress import ProgressSnapshot, ProgressTracker
 from src.utils.enums import AudioFormat
+from src.utils.exceptions import ConversionError
 from src.utils.logging_config import get_logger
+from src.utils.startup import probe_ffmpeg
 
 logger = get_logger(__name__)
 
@@ -31,6 +36,8 @@ class ConverterApp:
         self.progress_var = tk.DoubleVar()
 
         self.conversion_thread: Optional[Thread] = None
+        self.engine: Optional[AsyncConversionEngine] = None
+        self.progress: Optional[ProgressTracker] = None
         self.widgets: dict = {}
 
         self.create_menu()
@@ -102,12 +109,18 @@ class ConverterApp:
         self.widgets["progress_label"].grid(row=4, column=2, sticky="w")
 
     def _create_convert_button(self) -> None:
-        """Create and layout the convert button."""
+        """Create and layout the convert and stop buttons."""
         self.widgets["convert_button"] = ttk.Button(
             self.master, text="Convert", command=self.start_conversion
         )
         self.widgets["convert_button"].grid(row=5, column=1)
 
+        # Kept out of self.widgets: it is enabled only while converting.
+        self.stop_button = ttk.Button(
+            self.master, text="Stop", command=self.stop_conversion, state=tk.DISABLED
+        )
+        self.stop_button.grid(row=5, column=2)
+
     def _create_labeled_entry_with_button(
         self, label_text: str, variable: tk.StringVar, command: Callable, row: int
     ) -> None:
@@ -147,31 +160,58 @@ class ConverterApp:
         """Open a directory dialog to select the output directory."""
         self.output_dir.set(filedialog.askdirectory())
 
-    def update_progress(self, current: int, total: int) -> None:
+    def update_progress(self, snapshot: ProgressSnapshot) -> None:
         """Update the progress bar and label.
 
         Args:
-            current (int): Current number of processed files.
-            total (int): Total number of files to process.
+            snapshot (ProgressSnapshot): Current progress of the conversion.
         """
-        progress = (current / total) * 100
-        self.progress_var.set(progress)
-        self.widgets["progress_label"].config(text=f"{current}/{total}")
+        self.progress_var.set(snapshot.fraction * 100)
+        text = f"{snapshot.files_done}/{snapshot.files_total}"
+        if snapshot.files_per_second:
+            text += f" ({snapshot.files_per_second:.1f} files/s"
+            if snapshot.eta_seconds is not None and snapshot.scan_finished:
+                minutes, seconds = divmod(int(snapshot.eta_seconds), 60)
+                text += f", {minutes}:{seconds:02d} left"
+            text += ")"
+        self.widgets["progress_label"].config(text=text)
 
     def start_conversion(self) -> None:
         """Start the conversion process in a separate thread."""
         self._set_interface_state(tk.DISABLED)
+        self.stop_button.config(state=tk.NORMAL)
+        self.engine = AsyncConversionEngine()
+        self.progress = ProgressTracker()
         self.conversion_thread = Thread(target=self.convert)
         self.conversion_thread.start()
         self.master.after(100, self.check_conversion_complete)
 
+    def stop_conversion(self) -> None:
+        """Cancel the running conversion, killing in-flight encoders."""
+        if self.engine:
+            self.stop_button.config(state=tk.DISABLED)
+            self.engine.cancel()
+
     def check_conversion_complete(self) -> None:
-        """Check if the conversion is complete and update the interface accordingly."""
+        """Check if the conversion is complete and update the interface accordingly.
+
+        Also redraws the progress from the shared tracker, so the event loop
+        does a fixed amount of work however fast files complete.
+        """
         if self.conversion_thread and self.conversion_thread.is_alive():
+            snapshot = self.progress.tick() if self.progress else None
+            if snapshot:
+                self.update_progress(snapshot)
             self.master.after(100, self.check_conversion_complete)
         else:
             self._set_interface_state(tk.NORMAL)
-            messagebox.showinfo("Conversion Complete", "All files have been converted.")
+            self.stop_button.config(state=tk.DISABLED)
+            if self.engine and self.engine.cancelled:
+                messagebox.showinfo("Conversion Stopped", "The conversion was stopped.")
+            else:
+                messagebox.showinfo(
+                    "Conversion Complete", "All files have been converted."
+                )
 
     def _set_interface_state(self, state: str) -> None:
         """Set the state of all interactive widgets.
@@ -200,17 +240,21 @@ class ConverterApp:
             f"Converting files from {input_path} to {output_format} in {output_path}"
         )
 
-        converter = AudioConverter(
-            output_format, num_threads=4, include_cover=include_cover
-        )
+        converter = AudioConverter(output_format, include_cover=include_cover)
         file_handler = FileHandler()
 
         try:
+            missing = probe_ffmpeg().missing(*converter.ffmpeg_requirements())
+            if missing:
+                raise ConversionError(f"FFmpeg lacks {', '.join(missing)}")
             file_handler.create_output_directory(output_path)
-            converted_files = converter.convert_directory(
-                input_path,
-                output_path,
-                progress_callback=self.update_progress_threadsafe,
+            converted_files = asyncio.run(
+                converter.convert_directory_async(
+                    input_path,
+                    output_path,
+                    engine=self.engine,
+                    progress=self.progress,
+                )
             )
             logger.info(f"Converted {len(converted_files)} files.")
         except Exception as e:
@@ -229,15 +273,6 @@ class ConverterApp:
         self.progress_var.set(0)
         self.widgets["progress_label"].config(text="")
 
-    def update_progress_threadsafe(self, current: int, total: int) -> None:
-        """Update the progress bar and label in a thread-safe manner.
-
-        Args:
-            current (int): Current number of processed files.
-            total (int): Total number of files to process.
-        """
-        self.master.after(0, lambda: self.update_progress(current, total))
-
     def show_about(self) -> None:
         """Display the About dialog."""
         messagebox.showinfo(
@@ -3,3 +3,22 @@ from enum import Enum
 
 class AudioFormat(Enum):
     MP3 = "mp3"
+    AAC = "aac"
+    ALAC = "alac"
+
+
+class ConversionBackend(Enum):
+    FFMPEG = "ffmpeg"
+    PYDUB = "pydub"
+
+
+class TagFormat(Enum):
+    ID3 = "id3"
+    MP4 = "mp4"
+
+
+class JobOrder(Enum):
+    SCAN = "scan"
+    LONGEST = "longest"
+    COST = "cost"
+    ALBUM = "album"
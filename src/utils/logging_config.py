@@ -1,39 +1,275 @@
+import atexit
+import json
 import logging
-from typing import Optional
+import multiprocessing
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import List, Optional, Set, Union
+
+LOG_FILE = "app.log"
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Environment variables read when logging is first set up.
+ENV_LEVEL = "FLAC2APPLE_LOG_LEVEL"
+ENV_FILE = "FLAC2APPLE_LOG_FILE"
+ENV_JSON = "FLAC2APPLE_LOG_JSON"
+ENV_MAX_BYTES = "FLAC2APPLE_LOG_MAX_BYTES"
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class _BatchedRotatingFileHandler(RotatingFileHandler):
+    """
+    A rotating file handler that leaves flushing to the queue listener.
+
+    Records are written to the buffered stream as they arrive and flushed once
+    the queue runs empty, so a burst of records costs one write system call
+    instead of one per record.
+    """
+
+    def flush(self) -> None:
+        pass
+
+    def flush_batch(self) -> None:
+        super().flush()
+
+
+class _BatchingQueueListener(QueueListener):
+    """A queue listener that flushes its handlers whenever the queue drains."""
+
+    def dequeue(self, block: bool) -> logging.LogRecord:
+        if block and self.queue.empty():
+            for handler in self.handlers:
+                getattr(handler, "flush_batch", handler.flush)()
+        return self.queue.get(block)
+
+
+class _PutQueueHandler(QueueHandler):
+    """A queue handler that also works with a ``multiprocessing.SimpleQueue``."""
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        self.queue.put(record)
+
+
+class _LoggingState:
+    """The process-wide queue, listener and the loggers attached to them."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        self.queue_handler = _PutQueueHandler(self.queue)
+        self.listener: Optional[_BatchingQueueListener] = None
+        self.level = logging.DEBUG
+        self.loggers: Set[logging.Logger] = set()
+        # Pipe that forked children send their records up, and the thread
+        # moving them onto the queue. Set up at the first fork.
+        self.fork_queue: Optional[multiprocessing.SimpleQueue] = None
+        self.forwarder: Optional[threading.Thread] = None
+        # True in a forked child whose records go to the parent.
+        self.forwarding = False
+
+
+_state = _LoggingState()
+
+
+def _parse_level(level: Union[int, str]) -> int:
+    if isinstance(level, int):
+        return level
+    value = logging.getLevelName(level.upper())
+    if not isinstance(value, int):
+        raise ValueError(f"Unknown log level: {level}")
+    return value
+
+
+def configure_logging(
+    level: Optional[Union[int, str]] = None,
+    log_file: Optional[str] = None,
+    json_format: Optional[bool] = None,
+    max_bytes: Optional[int] = None,
+    backup_count: int = LOG_BACKUP_COUNT,
+) -> None:
+    """
+    Set up (or reconfigure) the background log writer.
+
+    Loggers returned by ``get_logger`` only put records on an in-memory queue;
+    a single listener thread formats them and writes them to the console and a
+    size-rotated log file. Worker threads therefore never wait on disk I/O or
+    on each other for a handler lock. Arguments left as None fall back to the
+    ``FLAC2APPLE_LOG_*`` environment variables and then to the defaults.
+
+    Args:
+        level (Optional[Union[int, str]]): Minimum level written to the log
+            file. The console never shows less than INFO. Defaults to DEBUG.
+        log_file (Optional[str]): Path of the log file, ``app.log`` by default.
+            An empty string disables the file.
+        json_format (Optional[bool]): Write the log file as JSON lines.
+        max_bytes (Optional[int]): Size at which the log file is rotated.
+        backup_count (int): Number of rotated files to keep.
+    """
+    if level is None:
+        level = os.environ.get(ENV_LEVEL, logging.DEBUG)
+    if log_file is None:
+        log_file = os.environ.get(ENV_FILE, LOG_FILE)
+    if json_format is None:
+        json_format = os.environ.get(ENV_JSON, "").lower() in ("1", "true", "yes")
+    if max_bytes is None:
+        max_bytes = int(os.environ.get(ENV_MAX_BYTES, LOG_MAX_BYTES))
+    level = _parse_level(level)
+
+    handlers: List[logging.Handler] = []
+
+    # Console handler for general logging
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(max(level, logging.INFO))
+    console_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handlers.append(console_handler)
+
+    # File handler for detailed logging
+    if log_file:
+        file_handler = _BatchedRotatingFileHandler(
+            log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+        )
+        file_handler.setLevel(level)
+        file_handler.setFormatter(
+            JsonFormatter() if json_format else logging.Formatter(LOG_FORMAT)
+        )
+        handlers.append(file_handler)
+
+    with _state.lock:
+        _stop_listener()
+        _state.queue_handler.queue = _state.queue
+        _state.forwarding = False
+        _state.level = level
+        for logger in _state.loggers:
+            logger.setLevel(level)
+        _state.listener = _BatchingQueueListener(
+            _state.queue, *handlers, respect_handler_level=True
+        )
+        _state.listener.start()
+
+
+def _stop_listener() -> None:
+    listener = _state.listener
+    if listener is None:
+        return
+    _state.listener = None
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+
+def shutdown_logging() -> None:
+    """Write out every queued record and stop the listener thread."""
+    with _state.lock:
+        _stop_forwarder()
+        _stop_listener()
+
+
+atexit.register(shutdown_logging)
+
+
+def _forward(fork_queue: multiprocessing.SimpleQueue) -> None:
+    while True:
+        record = fork_queue.get()
+        if record is None:
+            return
+        _state.queue.put(record)
+
+
+def _stop_forwarder() -> None:
+    forwarder = _state.forwarder
+    if forwarder is None:
+        return
+    _state.forwarder = None
+    # Records the children sent before the sentinel are moved first.
+    _state.fork_queue.put(None)
+    forwarder.join()
+
+
+def _before_fork() -> None:
+    """Make sure records of the child to be forked have a way to the listener."""
+    with _state.lock:
+        if _state.listener is None or _state.forwarding:
+            return
+        if _state.fork_queue is None:
+            _state.fork_queue = multiprocessing.SimpleQueue()
+        if _state.forwarder is None:
+            _state.forwarder = threading.Thread(
+                target=_forward,
+                args=(_state.fork_queue,),
+                name="log-forwarder",
+                daemon=True,
+            )
+            _state.forwarder.start()
+
+
+def _after_fork_in_child() -> None:
+    """
+    Send the records of a forked child to the parent's listener.
+
+    The listener thread is not copied into the child, so records put on the
+    in-memory queue would never be written. They go through a pipe to the
+    parent instead, which writes them to the same console and log file.
+    """
+    # Another thread may have held the lock when the process forked.
+    _state.lock = threading.Lock()
+    _state.queue = queue.SimpleQueue()
+    _state.forwarder = None
+    if _state.listener is None or _state.fork_queue is None:
+        _state.queue_handler.queue = _state.queue
+        return
+    _state.listener = None
+    _state.queue_handler.queue = _state.fork_queue
+    _state.forwarding = True
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(before=_before_fork, after_in_child=_after_fork_in_child)
 
 
 def get_logger(name: Optional[str] = None) -> logging.Logger:
     """
     Configure and return a logger instance.
 
+    The logger hands its records to the shared background writer, which is
+    started with the default settings on first use unless
+    ``configure_logging`` was called first. In a process forked from one that
+    logs, such as a ``ProcessPoolExecutor`` worker, the parent's writer is
+    used.
+
     Args:
         name (Optional[str]): The name of the logger. If None, returns the root logger.
 
     Returns:
         logging.Logger: Configured logger instance.
     """
-    logger = logging.getLogger(name)
-
-    if not logger.handlers:
-        logger.setLevel(logging.DEBUG)
+    if _state.listener is None and not _state.forwarding:
+        configure_logging()
 
-        # Console handler for general logging
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.INFO)
-        console_formatter = logging.Formatter(
-            "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-        )
-        console_handler.setFormatter(console_formatter)
-
-        # File handler for detailed logging
-        file_handler = logging.FileHandler("app.log")
-        file_handler.setLevel(logging.DEBUG)
-        file_formatter = logging.Formatter(
-            "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-        )
-        file_handler.setFormatter(file_formatter)
+    logger = logging.getLogger(name)
 
-        logger.addHandler(console_handler)
-        logger.addHandler(file_handler)
+    with _state.lock:
+        if logger not in _state.loggers:
+            logger.setLevel(_state.level)
+            logger.addHandler(_state.queue_handler)
+            _state.loggers.add(logger)
 
     return logger
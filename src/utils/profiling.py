@@ -0,0 +1,216 @@
+import cProfile
+import json
+import math
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+# Stage names used across the pipeline.
+SCAN = "scan"
+DECODE = "decode"
+ENCODE = "encode"
+METADATA = "metadata"
+COVER = "cover"
+FSYNC = "fsync"
+REUSE = "reuse"
+LOUDNESS = "loudness"
+
+
+@dataclass
+class StageTimings:
+    """
+    Wall time and byte counters of the stages of one conversion.
+
+    Instances are plain data so they can be returned from worker processes and
+    merged by the caller. ``linked`` records that the outputs were filled from
+    an identically tagged earlier encode, so their tags are already final.
+    """
+
+    seconds: Dict[str, float] = field(default_factory=dict)
+    bytes: Dict[str, int] = field(default_factory=dict)
+    audio_seconds: Optional[float] = None
+    linked: bool = False
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time the enclosed block and add it to the named stage."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_seconds(name, time.perf_counter() - started)
+
+    def add_seconds(self, name: str, seconds: float) -> None:
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    def add_bytes(self, name: str, count: int) -> None:
+        self.bytes[name] = self.bytes.get(name, 0) + count
+
+    def merge(self, other: "StageTimings") -> "StageTimings":
+        """Add the counters of another instance to this one and return self."""
+        for name, seconds in other.seconds.items():
+            self.add_seconds(name, seconds)
+        for name, count in other.bytes.items():
+            self.add_bytes(name, count)
+        if other.audio_seconds is not None:
+            self.audio_seconds = other.audio_seconds
+        self.linked = self.linked or other.linked
+        return self
+
+    def describe(self) -> str:
+        """Return a short human readable summary, e.g. ``encode 1.20s, metadata 0.01s``."""
+        return ", ".join(f"{name} {value:.2f}s" for name, value in self.seconds.items())
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Return the nearest-rank percentile of a list, or None if it is empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+
+class RunProfile:
+    """
+    Aggregate statistics of a directory conversion.
+
+    Feed it every file's stage timings with ``add_file`` and the scan time with
+    ``add_stage``; ``summary`` then reports throughput in files/s and
+    audio-seconds/s, p50/p95 latency and per-stage totals.
+    """
+
+    def __init__(self):
+        self.totals = StageTimings()
+        self.latencies: List[float] = []
+        self.audio_seconds = 0.0
+        self.files = 0
+        self.failed = 0
+        self._started = time.perf_counter()
+        self._finished: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def add_stage(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.totals.add_seconds(name, seconds)
+
+    def add_file(
+        self, timings: Optional[StageTimings], latency: Optional[float], failed=False
+    ) -> None:
+        """
+        Record one processed file.
+
+        Args:
+            timings (Optional[StageTimings]): Stage timings of the file.
+            latency (Optional[float]): Wall time of the whole conversion.
+            failed (bool): Whether the conversion failed.
+        """
+        with self._lock:
+            if failed:
+                self.failed += 1
+                return
+            self.files += 1
+            if latency is not None:
+                self.latencies.append(latency)
+            if timings is not None:
+                self.totals.merge(timings)
+                self.audio_seconds += timings.audio_seconds or 0.0
+
+    def finish(self) -> None:
+        """Mark the end of the run."""
+        self._finished = time.perf_counter()
+
+    @property
+    def wall_seconds(self) -> float:
+        end = self._finished if self._finished is not None else time.perf_counter()
+        return end - self._started
+
+    def summary(self) -> Dict[str, Any]:
+        """Return the aggregates as a JSON-serializable dictionary."""
+        wall = self.wall_seconds
+        return {
+            "wall_seconds": round(wall, 3),
+            "files": self.files,
+            "failed": self.failed,
+            "audio_seconds": round(self.audio_seconds, 3),
+            "files_per_second": round(self.files / wall, 3) if wall else None,
+            "audio_seconds_per_second": (
+                round(self.audio_seconds / wall, 3) if wall else None
+            ),
+            "latency_p50": percentile(self.latencies, 0.50),
+            "latency_p95": percentile(self.latencies, 0.95),
+            "stage_seconds": {
+                name: round(value, 3) for name, value in self.totals.seconds.items()
+            },
+            "bytes": dict(self.totals.bytes),
+        }
+
+    def write_json(self, path: Path) -> None:
+        """Write the summary to a JSON file."""
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+
+class CpuProfiler:
+    """
+    Collect a cProfile dump of a run that spans several worker threads.
+
+    Before Python 3.12 a cProfile profiler only sees the thread that enabled
+    it, so each worker thread wraps its jobs in ``thread()`` and gets its own
+    profiler; the results are merged on ``dump``. From 3.12 on, profiling is
+    process-wide and a single profiler is used. Work done in the process pool
+    is not included.
+    """
+
+    def __init__(self):
+        self._process_wide = sys.version_info >= (3, 12)
+        self._profiles: List[cProfile.Profile] = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._main: Optional[cProfile.Profile] = None
+
+    def __enter__(self) -> "CpuProfiler":
+        self._main = self._new_profile()
+        self._main.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if self._main is not None:
+            self._main.disable()
+
+    @contextmanager
+    def thread(self) -> Iterator[None]:
+        """Profile the enclosed block on the current worker thread."""
+        if self._process_wide:
+            yield
+            return
+        profile = getattr(self._local, "profile", None)
+        if profile is None:
+            profile = self._local.profile = self._new_profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+
+    def dump(self, path: Path) -> None:
+        """Write the merged profile in pstats format."""
+        with self._lock:
+            profiles = [p for p in self._profiles if p.getstats()]
+        if not profiles:
+            return
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        stats.dump_stats(str(path))
+
+    def _new_profile(self) -> cProfile.Profile:
+        profile = cProfile.Profile()
+        with self._lock:
+            self._profiles.append(profile)
+        return profile
@@ -1,21 +1,249 @@
+import json
+import os
+import re
+import shutil
 import subprocess
 import sys
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Lock
+from typing import Dict, FrozenSet, Iterable, List, Tuple
 
 from src.utils.logging_config import get_logger
 
 logger = get_logger(__name__)
 
+# Directory of the capability cache; defaults to the user's cache directory.
+ENV_CACHE_DIR = "FLAC2APPLE_CACHE_DIR"
+CAPABILITIES_FILENAME = "ffmpeg-capabilities.json"
 
-def check_ffmpeg():
-    try:
-        subprocess.run(
-            ["ffmpeg", "-version"],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            check=True,
+
+@dataclass(frozen=True)
+class FFmpegCapabilities:
+    """
+    What an ffmpeg binary can do.
+
+    Attributes:
+        path (str): Resolved path of the binary.
+        version (str): Version string, e.g. ``6.1.1``.
+        encoders (FrozenSet[str]): Names of the available audio encoders.
+        filters (FrozenSet[str]): Names of the available filters.
+        libraries (FrozenSet[str]): External libraries the binary was built
+            with, e.g. ``libsoxr``.
+    """
+
+    path: str
+    version: str
+    encoders: FrozenSet[str]
+    filters: FrozenSet[str]
+    libraries: FrozenSet[str] = frozenset()
+
+    def to_dict(self) -> Dict[str, object]:
+        """Return a JSON-serializable dictionary."""
+        return {
+            "path": self.path,
+            "version": self.version,
+            "encoders": sorted(self.encoders),
+            "filters": sorted(self.filters),
+            "libraries": sorted(self.libraries),
+        }
+
+    def missing(
+        self,
+        encoders: Iterable[str] = (),
+        filters: Iterable[str] = (),
+        libraries: Iterable[str] = (),
+    ) -> List[str]:
+        """
+        Return which of the given encoders, filters and libraries are not available.
+
+        Args:
+            encoders (Iterable[str]): ffmpeg encoder names.
+            filters (Iterable[str]): ffmpeg filter names.
+            libraries (Iterable[str]): External library names.
+        """
+        missing = sorted(set(encoders) - self.encoders)
+        missing += sorted(set(filters) - self.filters)
+        return missing + sorted(set(libraries) - self.libraries)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, object]) -> "FFmpegCapabilities":
+        """Rebuild capabilities from the output of ``to_dict``."""
+        return cls(
+            data["path"],
+            data["version"],
+            frozenset(data["encoders"]),
+            frozenset(data["filters"]),
+            frozenset(data["libraries"]),
         )
+
+
+def capabilities_cache_path() -> Path:
+    """Return the file the capabilities of probed binaries are cached in."""
+    directory = os.environ.get(ENV_CACHE_DIR)
+    if not directory:
+        base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+        directory = Path(base) / "flac2apple"
+    return Path(directory) / CAPABILITIES_FILENAME
+
+
+def _run(command: List[str]) -> str:
+    return subprocess.run(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        check=True,
+        text=True,
+    ).stdout
+
+
+def _parse_version(output: str) -> str:
+    # "ffmpeg version 6.1.1-3ubuntu5 Copyright (c) ..."
+    words = output.split()
+    if len(words) >= 3 and words[1] == "version":
+        return words[2]
+    return "unknown"
+
+
+def _parse_libraries(output: str) -> FrozenSet[str]:
+    # "configuration: --prefix=/usr ... --enable-libsoxr --enable-libmp3lame"
+    return frozenset(re.findall(r"--enable-(lib\w+)", output))
+
+
+def _parse_encoders(output: str) -> FrozenSet[str]:
+    # " A....D libmp3lame  libmp3lame MP3 (MPEG audio layer 3) (codec mp3)",
+    # listed below a " ------" separator; the first flag is the media type.
+    encoders = set()
+    listing = False
+    for line in output.splitlines():
+        fields = line.split()
+        if not listing:
+            listing = fields[:1] == ["------"]
+            continue
+        if len(fields) >= 2 and fields[0].startswith("A"):
+            encoders.add(fields[1])
+    return frozenset(encoders)
+
+
+def _parse_filters(output: str) -> FrozenSet[str]:
+    # " ... atrim  A->A  Pick one continuous section from the input."
+    filters = set()
+    for line in output.splitlines():
+        fields = line.split()
+        if len(fields) >= 3 and "->" in fields[2]:
+            filters.add(fields[1])
+    return frozenset(filters)
+
+
+def _read_cache(path: Path) -> Dict[str, Dict[str, object]]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_cache(path: Path, entries: Dict[str, Dict[str, object]]) -> None:
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        temporary.write_text(json.dumps(entries), encoding="utf-8")
+        os.replace(temporary, path)
+    except OSError as e:
+        logger.warning(f"Could not cache ffmpeg capabilities in {path}: {str(e)}")
+
+
+# Probed binaries of this process, keyed like the on-disk cache.
+_probed: Dict[Tuple[str, int, int], FFmpegCapabilities] = {}
+_probed_lock = Lock()
+
+
+def probe_ffmpeg(ffmpeg: str = "ffmpeg") -> FFmpegCapabilities:
+    """
+    Return the version, encoders and filters of an ffmpeg binary.
+
+    Listing encoders and filters takes three ffmpeg runs, so the result is
+    cached on disk, keyed by the binary's resolved path, size and mtime. Later
+    launches only stat the binary; replacing or upgrading it probes again.
+
+    Args:
+        ffmpeg (str): Name or path of the binary, looked up in PATH.
+
+    Returns:
+        FFmpegCapabilities: What the binary can do.
+
+    Raises:
+        FileNotFoundError: If the binary does not exist.
+        subprocess.CalledProcessError: If the binary fails to run.
+    """
+    found = shutil.which(ffmpeg)
+    if found is None:
+        raise FileNotFoundError(ffmpeg)
+    path = os.path.realpath(found)
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+
+    with _probed_lock:
+        if key in _probed:
+            return _probed[key]
+        cache_path = capabilities_cache_path()
+        entries = _read_cache(cache_path)
+        entry_key = f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+        try:
+            capabilities = FFmpegCapabilities.from_dict(entries[entry_key])
+        except KeyError:
+            # Not cached, or cached by a version that recorded less.
+            logger.info(f"Probing capabilities of {path}")
+            version = _run([path, "-hide_banner", "-version"])
+            capabilities = FFmpegCapabilities(
+                path,
+                _parse_version(version),
+                _parse_encoders(_run([path, "-hide_banner", "-encoders"])),
+                _parse_filters(_run([path, "-hide_banner", "-filters"])),
+                _parse_libraries(version),
+            )
+            # Entries of binaries that were replaced are dropped.
+            entries = {
+                name: entry
+                for name, entry in entries.items()
+                if entry.get("path") != path
+            }
+            entries[entry_key] = capabilities.to_dict()
+            _write_cache(cache_path, entries)
+        _probed[key] = capabilities
+        return capabilities
+
+
+def check_ffmpeg(
+    encoders: Iterable[str] = (),
+    filters: Iterable[str] = (),
+    libraries: Iterable[str] = (),
+) -> FFmpegCapabilities:
+    """
+    Exit unless ffmpeg is installed and has the given encoders and filters.
+
+    Args:
+        encoders (Iterable[str]): ffmpeg encoders the run needs.
+        filters (Iterable[str]): ffmpeg filters the run needs.
+        libraries (Iterable[str]): External libraries ffmpeg must be built
+            with.
+
+    Returns:
+        FFmpegCapabilities: What the installed ffmpeg can do.
+    """
+    try:
+        capabilities = probe_ffmpeg()
     except (subprocess.CalledProcessError, FileNotFoundError):
         logger.error(
             "FFmpeg is not installed or not in PATH. Please install FFmpeg and try again."
         )
         sys.exit(1)
+
+    missing = capabilities.missing(encoders, filters, libraries)
+    if missing:
+        logger.error(
+            f"FFmpeg {capabilities.version} at {capabilities.path} lacks "
+            f"{', '.join(missing)}. Install a build that includes them or "
+            f"choose another preset."
+        )
+        sys.exit(1)
+    return capabilities
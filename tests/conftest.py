@@ -0,0 +1,60 @@
+import struct
+
+import pytest
+from mutagen.flac import FLAC, Picture
+
+
+def _streaminfo(sample_rate, channels, bits_per_sample, total_samples, md5):
+    packed = (
+        (sample_rate << 44)
+        | ((channels - 1) << 41)
+        | ((bits_per_sample - 1) << 36)
+        | total_samples
+    )
+    return struct.pack(">HH", 4096, 4096) + b"\0" * 6 + packed.to_bytes(8, "big") + md5
+
+
+@pytest.fixture
+def make_flac(tmp_path):
+    """
+    Return a factory writing header-only FLAC files that mutagen can parse.
+
+    The files carry a real STREAMINFO block but no audio frames, which is
+    enough for anything that only reads tags and stream properties.
+    """
+
+    def factory(
+        name="track.flac",
+        tags=None,
+        cover=None,
+        seconds=1.0,
+        sample_rate=44100,
+        channels=2,
+        bits_per_sample=16,
+        md5=b"\0" * 16,
+    ):
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        block = _streaminfo(
+            sample_rate, channels, bits_per_sample, int(seconds * sample_rate), md5
+        )
+        # Last-metadata-block flag set, block type 0 (STREAMINFO).
+        path.write_bytes(
+            b"fLaC" + bytes([0x80]) + len(block).to_bytes(3, "big") + block
+        )
+
+        flac = FLAC(path)
+        flac.add_tags()
+        for key, value in (tags or {}).items():
+            flac[key] = value
+        if cover is not None:
+            picture = Picture()
+            picture.type = 3
+            picture.mime = "image/jpeg"
+            picture.desc = "Cover"
+            picture.data = cover
+            flac.add_picture(picture)
+        flac.save()
+        return path
+
+    return factory
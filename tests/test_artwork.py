@@ -0,0 +1,56 @@
+import io
+
+import pytest
+
+from src.core.artwork import ArtworkCache, ArtworkOptions, process_artwork
+
+PIL = pytest.importorskip("PIL.Image")
+
+COVER = open("tests/resources/test_cover.jpg", "rb").read()
+
+
+def _image(size, color=(200, 30, 30)):
+    buffer = io.BytesIO()
+    PIL.new("RGB", size, color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_cache_processes_identical_covers_once():
+    cache = ArtworkCache()
+    first = cache.get(COVER, "image/jpeg")
+    second = cache.get(bytes(COVER), "image/jpeg")
+
+    assert first is second
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_evicts_least_recently_used():
+    covers = [_image((64, 64), (i, i, i)) for i in range(3)]
+    cache = ArtworkCache(max_bytes=max(map(len, covers)) * 2)
+    for cover in covers:
+        cache.get(cover, "image/png")
+
+    assert len(cache) == 2
+    cache.get(covers[0], "image/png")
+    assert cache.misses == 4
+
+
+def test_covers_within_limits_are_untouched():
+    options = ArtworkOptions(max_dimension=5000, max_bytes=len(COVER))
+    assert process_artwork(COVER, "image/jpeg", options).data is COVER
+
+
+def test_large_covers_are_downscaled():
+    artwork = process_artwork(
+        _image((1200, 800)), "image/png", ArtworkOptions(max_dimension=600)
+    )
+
+    assert artwork.mime == "image/jpeg"
+    assert PIL.open(io.BytesIO(artwork.data)).size == (600, 400)
+
+
+def test_heavy_covers_are_recompressed():
+    options = ArtworkOptions(max_bytes=20_000)
+    artwork = process_artwork(_image((1500, 1500)), "image/png", options)
+
+    assert len(artwork.data) <= 20_000
@@ -0,0 +1,156 @@
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+from src.core.async_engine import AsyncConversionEngine
+from src.core.backends import FFmpegBackend
+from src.core.loudness import PcmAnalyzer
+from src.core.results import ConversionStatus
+from src.utils.profiling import StageTimings
+
+
+class ScriptBackend(FFmpegBackend):
+    """Backend running a Python one-liner instead of ffmpeg."""
+
+    def __init__(self, sleep=0.0, fail=False):
+        super().__init__()
+        self.sleep = sleep
+        self.fail = fail
+
+    def build_command(
+        self, input_path, output_path, encoder, extra_outputs=(), pcm=False
+    ):
+        script = (
+            f"import sys, time; open({str(output_path)!r}, 'w').write('partial'); "
+            f"time.sleep({self.sleep}); "
+            + ("sys.exit('bad stream')" if self.fail else "")
+        )
+        if pcm:
+            # Three seconds of a 1 kHz stereo sine at 48 kHz, -12.04 dBFS.
+            script += (
+                "import math, struct; sys.stdout.buffer.write(b''.join("
+                "struct.pack('<f', 0.25 * math.sin(math.pi * i / 24)) * 2 "
+                "for i in range(144000)))"
+            )
+        return [sys.executable, "-c", script]
+
+
+class FakeConverter:
+    def __init__(self, backend, loudness=False):
+        self.backend = backend
+        self.encoder = None
+        self.sync_output = False
+        self.loudness = loudness
+        self.measured = []
+
+        self.extra_targets = []
+
+    def uses_custom_transcode(self, input_path, outputs):
+        return False
+
+    def extra_outputs(self, output_path):
+        return []
+
+    def encoders_for(self, input_path):
+        return [self.encoder]
+
+    def loudness_analyzer(self, input_path):
+        return PcmAnalyzer(48000, 2) if self.loudness else None
+
+    def write_metadata(self, src_path, dest_path, loudness=()):
+        self.measured.extend(loudness)
+        return StageTimings(seconds={"metadata": 0.0})
+
+
+class CustomTranscodeConverter(FakeConverter):
+    """Converter whose jobs run ``transcode`` on a thread, like segmented encodes."""
+
+    def uses_custom_transcode(self, input_path, outputs):
+        return True
+
+    def transcode(self, input_path, output_path):
+        self.backend.run([sys.executable, "-c", "import time; time.sleep(30)"])
+        return StageTimings()
+
+
+def _jobs(tmp_path, count):
+    jobs = []
+    for i in range(count):
+        source = tmp_path / f"{i}.flac"
+        source.write_bytes(b"flac")
+        jobs.append((source, tmp_path / f"{i}.mp3"))
+    return jobs
+
+
+def _run(engine, converter, jobs):
+    results = []
+    asyncio.run(engine.run(converter, iter(jobs), results.append))
+    return results
+
+
+def test_runs_every_job(tmp_path):
+    engine = AsyncConversionEngine(max_encoders=2, queue_size=1, metadata_processes=0)
+    results = _run(engine, FakeConverter(ScriptBackend()), _jobs(tmp_path, 5))
+
+    assert len(results) == 5
+    assert {r.status for r in results} == {ConversionStatus.CONVERTED}
+    assert all("encode" in r.timings.seconds for r in results)
+
+
+def test_encoder_failures_are_reported(tmp_path):
+    engine = AsyncConversionEngine(max_encoders=1, metadata_processes=0)
+    results = _run(engine, FakeConverter(ScriptBackend(fail=True)), _jobs(tmp_path, 2))
+
+    assert [r.status for r in results] == [ConversionStatus.FAILED] * 2
+    assert "bad stream" in results[0].error
+
+
+def test_measures_loudness_of_the_piped_pcm(tmp_path):
+    engine = AsyncConversionEngine(max_encoders=1, metadata_processes=0)
+    converter = FakeConverter(ScriptBackend(), loudness=True)
+    results = _run(engine, converter, _jobs(tmp_path, 1))
+
+    assert results[0].status == ConversionStatus.CONVERTED
+    (loudness,) = results[0].loudness
+    assert converter.measured == [loudness]
+    # A 1 kHz stereo sine measures its peak level in LUFS.
+    assert abs(loudness.integrated - -12.04) < 0.1
+    assert abs(loudness.true_peak - 0.25) < 0.01
+
+
+def test_cancel_kills_in_flight_encoders(tmp_path):
+    engine = AsyncConversionEngine(max_encoders=2, metadata_processes=0)
+    jobs = _jobs(tmp_path, 10)
+    threading.Timer(0.5, engine.cancel).start()
+
+    started = time.monotonic()
+    results = _run(engine, FakeConverter(ScriptBackend(sleep=30)), jobs)
+
+    assert time.monotonic() - started < 10
+    assert engine.cancelled
+    assert [r.status for r in results] == [ConversionStatus.CANCELLED] * 2
+    assert not any(Path(output).exists() for _, output in jobs)
+
+
+def test_pause_and_resume(tmp_path):
+    engine = AsyncConversionEngine(max_encoders=1, metadata_processes=0)
+    engine.pause()
+    threading.Timer(0.3, engine.resume).start()
+
+    results = _run(engine, FakeConverter(ScriptBackend()), _jobs(tmp_path, 2))
+
+    assert [r.status for r in results] == [ConversionStatus.CONVERTED] * 2
+
+
+def test_cancel_kills_encoders_started_on_threads(tmp_path):
+    engine = AsyncConversionEngine(max_encoders=2, metadata_processes=0)
+    threading.Timer(0.5, engine.cancel).start()
+
+    started = time.monotonic()
+    converter = CustomTranscodeConverter(FFmpegBackend())
+    results = _run(engine, converter, _jobs(tmp_path, 4))
+
+    assert time.monotonic() - started < 10
+    assert [r.status for r in results] == [ConversionStatus.CANCELLED] * 2
@@ -0,0 +1,175 @@
+from unittest.mock import patch
+
+import pytest
+
+from src.core.converter import AudioConverter
+from src.core.encoders import OutputTarget, get_encoder
+from src.core.journal import JOURNAL_FILENAME, RunJournal
+from src.core.progress import ProgressTracker
+from src.utils.enums import JobOrder
+from src.utils.profiling import StageTimings
+
+
+def _fake_transcode(self, input_path, output_path):
+    if input_path.name.startswith("broken"):
+        raise RuntimeError("corrupt stream")
+    output_path.write_bytes(b"encoded " + input_path.read_bytes())
+    return StageTimings(seconds={"encode": 0.5})
+
+
+@pytest.fixture
+def library(tmp_path):
+    input_dir = tmp_path / "in"
+    for relative in ["artist/album/01.flac", "artist/album/02.flac", "03.FLAC"]:
+        path = input_dir / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(relative.encode())
+    return input_dir, tmp_path / "out"
+
+
+@pytest.fixture(autouse=True)
+def fake_encoder():
+    with patch(
+        "src.core.converter.SingleFileConverter.transcode", _fake_transcode
+    ), patch(
+        "src.core.converter.SingleFileConverter.write_metadata",
+        return_value=StageTimings(audio_seconds=10.0),
+    ):
+        yield
+
+
+def _converter(**kwargs):
+    return AudioConverter(num_threads=2, metadata_processes=0, **kwargs)
+
+
+def test_convert_directory_mirrors_tree(library):
+    input_dir, output_dir = library
+    progress = []
+
+    converted = _converter().convert_directory(
+        input_dir, output_dir, progress_callback=lambda *args: progress.append(args)
+    )
+
+    assert sorted(p.relative_to(output_dir).as_posix() for p in converted) == [
+        "03.mp3",
+        "artist/album/01.mp3",
+        "artist/album/02.mp3",
+    ]
+    assert progress[-1] == (3, 3)
+
+
+def test_convert_directory_skips_failed_files(library):
+    input_dir, output_dir = library
+    (input_dir / "broken.flac").write_bytes(b"")
+
+    converted = _converter().convert_directory(input_dir, output_dir)
+
+    assert len(converted) == 3
+    assert not (output_dir / "broken.mp3").exists()
+
+
+def test_incremental_skips_unchanged_and_prunes(library):
+    input_dir, output_dir = library
+    converter = _converter(incremental=True)
+
+    assert len(converter.convert_directory(input_dir, output_dir)) == 3
+    assert converter.convert_directory(input_dir, output_dir) == []
+
+    (input_dir / "03.FLAC").unlink()
+    (input_dir / "artist/album/01.flac").write_bytes(b"remastered")
+    converted = converter.convert_directory(input_dir, output_dir)
+
+    assert [p.relative_to(output_dir).as_posix() for p in converted] == [
+        "artist/album/01.mp3"
+    ]
+    assert not (output_dir / "03.mp3").exists()
+
+
+def test_interrupted_run_resumes_from_journal(library):
+    input_dir, output_dir = library
+    finished = input_dir / "artist/album/01.flac"
+    finished_output = output_dir / "artist/album/01.mp3"
+    finished_output.parent.mkdir(parents=True)
+    finished_output.write_bytes(b"from the interrupted run")
+    journal = RunJournal.for_directory(output_dir)
+    journal.append(
+        finished, finished_output, _converter().create_file_converter().settings_key()
+    )
+    journal.close()
+    # Temporaries of the killed run.
+    stale_partial = output_dir / "artist/album/.02.mp3.1a2b3c4d.partial"
+    stale_partial.write_bytes(b"trunc")
+    stale_segments = output_dir / "artist/album/.flac2apple-segments-x1y2"
+    stale_segments.mkdir()
+    (stale_segments / "0000.mp3").write_bytes(b"segment")
+
+    converted = _converter().convert_directory(input_dir, output_dir)
+
+    assert len(converted) == 2
+    assert finished_output.read_bytes() == b"from the interrupted run"
+    assert not (output_dir / JOURNAL_FILENAME).exists()
+    assert not stale_partial.exists()
+    assert not stale_segments.exists()
+
+
+def test_convert_directory_feeds_progress_tracker(library):
+    input_dir, output_dir = library
+    tracker = ProgressTracker()
+
+    _converter().convert_directory(input_dir, output_dir, progress=tracker)
+
+    snapshot = tracker.snapshot()
+    assert (snapshot.files_done, snapshot.files_total) == (3, 3)
+    assert snapshot.scan_finished
+    assert snapshot.audio_seconds == 30.0
+    assert snapshot.eta_seconds == 0.0
+    assert snapshot.workers == ()
+
+
+def test_biggest_jobs_start_first(library):
+    input_dir, output_dir = library
+    (input_dir / "mix.flac").write_bytes(b"x" * 10_000)
+    started = []
+
+    def recording_transcode(self, input_path, output_path):
+        started.append(input_path.name)
+        return _fake_transcode(self, input_path, output_path)
+
+    with patch("src.core.converter.SingleFileConverter.transcode", recording_transcode):
+        AudioConverter(
+            num_threads=1, metadata_processes=0, order=JobOrder.COST
+        ).convert_directory(input_dir, output_dir)
+
+    assert started[0] == "mix.flac"
+    assert started[-1] == "03.FLAC"
+
+
+def test_extra_targets_mirror_the_output_tree(library, tmp_path):
+    input_dir, output_dir = library
+    apple_dir = tmp_path / "apple"
+    calls = []
+
+    def multi_transcode(self, input_path, output_path, *extra_outputs):
+        calls.append(len(extra_outputs))
+        for path in (output_path, *extra_outputs):
+            path.write_bytes(b"encoded")
+        return StageTimings()
+
+    converter = _converter(
+        extra_targets=[OutputTarget(get_encoder("aac-256"), apple_dir)],
+        incremental=True,
+    )
+    with patch("src.core.converter.SingleFileConverter.transcode", multi_transcode):
+        converter.convert_directory(input_dir, output_dir)
+        (apple_dir / "03.m4a").unlink()
+        converter.convert_directory(input_dir, output_dir)
+
+    assert calls == [1, 1, 1, 1]
+    assert sorted(
+        p.relative_to(apple_dir).as_posix() for p in apple_dir.rglob("*.m4a")
+    ) == [
+        "03.m4a",
+        "artist/album/01.m4a",
+        "artist/album/02.m4a",
+    ]
+    assert (output_dir / "artist/album/01.mp3").exists()
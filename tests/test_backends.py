@@ -0,0 +1,111 @@
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from src.core.backends import FFmpegBackend, PydubBackend, get_backend
+from src.core.encoders import get_encoder
+from src.utils.enums import ConversionBackend
+from src.utils.exceptions import ConversionError
+from src.utils.profiling import StageTimings
+
+
+def test_get_backend():
+    """Test that each backend type maps to its implementation."""
+    assert isinstance(get_backend(ConversionBackend.FFMPEG), FFmpegBackend)
+    assert isinstance(get_backend(ConversionBackend.PYDUB), PydubBackend)
+
+
+def test_ffmpeg_backend_runs_single_process():
+    """Test that the ffmpeg backend encodes with one ffmpeg invocation."""
+    backend = FFmpegBackend()
+    with patch("src.core.backends.subprocess.Popen") as mock_run:
+        mock_run.return_value.returncode = 0
+        mock_run.return_value.communicate.return_value = (None, b"")
+        backend.transcode(
+            Path("in.flac"), Path("out.mp3"), get_encoder("mp3-128"), StageTimings()
+        )
+
+    mock_run.assert_called_once()
+    command = mock_run.call_args[0][0]
+    assert command[0] == "ffmpeg"
+    assert command[command.index("-i") + 1] == "in.flac"
+    assert command[command.index("-codec:a") + 1] == "libmp3lame"
+    assert command[-1] == "out.mp3"
+    assert mock_run.call_args[1]["stdout"] == subprocess.DEVNULL
+
+
+def test_ffmpeg_backend_error():
+    """Test that a failing ffmpeg run is reported as ConversionError."""
+    backend = FFmpegBackend()
+    with patch("src.core.backends.subprocess.Popen") as mock_run:
+        mock_run.return_value.returncode = 1
+        mock_run.return_value.communicate.return_value = (None, b"broken input")
+        with pytest.raises(ConversionError, match="broken input"):
+            backend.transcode(
+                Path("in.flac"), Path("out.mp3"), get_encoder("mp3-128"), StageTimings()
+            )
+
+
+def test_ffmpeg_backend_missing_binary():
+    """Test that a missing ffmpeg binary is reported as ConversionError."""
+    backend = FFmpegBackend(ffmpeg_path="/nonexistent/ffmpeg")
+    with pytest.raises(ConversionError, match="not found"):
+        backend.transcode(
+            Path("in.flac"), Path("out.mp3"), get_encoder("mp3-128"), StageTimings()
+        )
+
+
+def test_ffmpeg_backend_uses_preset_container():
+    """Test that M4A presets select their encoder and the ipod muxer."""
+    command = FFmpegBackend().build_command(
+        Path("in.flac"), Path("out.m4a"), get_encoder("alac")
+    )
+    assert command[command.index("-codec:a") + 1] == "alac"
+    assert command[command.index("-f") + 1] == "ipod"
+
+
+def test_ffmpeg_backend_encodes_extra_outputs_from_one_decode():
+    """Test that extra outputs are added to the same ffmpeg command."""
+    command = FFmpegBackend().build_command(
+        Path("in.flac"),
+        Path("out.mp3"),
+        get_encoder("mp3-320"),
+        [(Path("out.m4a"), get_encoder("aac-256"))],
+    )
+    assert command.count("-i") == 1
+    assert command.count("-map") == 2
+    assert command[command.index("out.mp3") - 1] == "mp3"
+    assert command[-3:] == ["-f", "ipod", "out.m4a"]
+    codecs = [command[i + 1] for i, arg in enumerate(command) if arg == "-codec:a"]
+    assert codecs == ["libmp3lame", "aac"]
+
+
+def test_ffmpeg_backend_tees_pcm_to_stdout():
+    """Test that the loudness PCM is one more output of the same decode."""
+    backend = FFmpegBackend()
+    command = backend.build_command(
+        Path("in.flac"), Path("out.mp3"), get_encoder("mp3-320"), pcm=True
+    )
+    assert command.count("-i") == 1
+    assert command[-3:] == ["-f", "f32le", "pipe:1"]
+
+    tracks = [(0, 100, Path("1.mp3")), (100, None, Path("2.mp3"))]
+    command = backend.build_split_command(
+        Path("in.flac"), tracks, get_encoder("mp3-320"), pcm=True
+    )
+    graph = command[command.index("-filter_complex") + 1]
+    assert graph.startswith("[0:a:0]asplit=3[s0][s1][s2]")
+    assert command[command.index("[s2]") - 1] == "-map"
+    assert command[-1] == "pipe:1"
+
+
+def test_ffmpeg_backend_streams_stdout_to_sink():
+    """Test that run hands stdout to the sink and still reports errors."""
+    chunks = []
+    script = "import sys; sys.stdout.buffer.write(b'x' * 3000000); sys.exit('late')"
+    with pytest.raises(ConversionError, match="late"):
+        FFmpegBackend().run([sys.executable, "-c", script], chunks.append)
+    assert sum(len(chunk) for chunk in chunks) == 3000000
@@ -0,0 +1,256 @@
+import shutil
+import subprocess
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from mutagen.flac import FLAC
+from mutagen.mp3 import MP3
+from mutagen.mp4 import MP4
+
+from src.core.backends import FFmpegBackend
+from src.core.chunking import (
+    CODEC_FRAMING,
+    ChunkedTranscoder,
+    ChunkingOptions,
+    build_mp3_info_frame,
+    held_encoder_slot,
+    itunsmpb,
+    plan_segments,
+    split_frames,
+)
+from src.core.encoders import get_encoder
+from src.core.metadata import ITUNSMPB_KEY
+from src.utils.exceptions import ConversionError
+from src.utils.profiling import StageTimings
+
+MP3_FRAMING = CODEC_FRAMING["libmp3lame"]
+# MPEG-1 Layer III, 128 kbit/s, 44.1 kHz, joint stereo, no CRC.
+HEADER = bytes([0xFF, 0xFB, 0x90, 0x44])
+FRAME = HEADER + bytes(413)  # 144 * 128000 // 44100 bytes
+
+
+def _adts_frame(length):
+    header = bytearray(7)
+    header[0:2] = b"\xff\xf1"
+    header[3] = (length >> 11) & 0x03
+    header[4] = (length >> 3) & 0xFF
+    header[5] = (length & 0x07) << 5
+    return bytes(header) + bytes(length - 7)
+
+
+@pytest.mark.parametrize("codec", ["libmp3lame", "aac", "alac"])
+@pytest.mark.parametrize(
+    "total", [44100 * 1000, 44100 * 1000 + 1, 44100 * 1000 + 1152 * 7]
+)
+def test_segments_tile_the_output(codec, total):
+    framing = CODEC_FRAMING[codec]
+    size, delay = framing.frame_size, framing.encoder_delay
+    segments = plan_segments(total, framing, 44100 * 300)
+
+    assert len(segments) == 3
+    assert segments[0].start == 0 and segments[0].skip == 0
+    assert segments[-1].end == total and segments[-1].keep is None
+
+    next_frame = 0
+    for segment in segments:
+        assert segment.start % size == 0
+        first = segment.start // size + segment.skip
+        assert first == next_frame
+        if segment.skip:
+            # The kept frames are preceded by at least the pre-roll.
+            assert first * size - delay - segment.start >= 2 * size
+        if segment.keep is not None:
+            next_frame = first + segment.keep
+            # And followed by post-roll, when the codec needs it.
+            assert segment.end >= min(next_frame * size - delay, total)
+
+
+def test_split_frames():
+    assert split_frames(FRAME * 3, "mp3") == [(0, 417), (417, 417), (834, 417)]
+    assert split_frames(_adts_frame(100) + _adts_frame(20), "adts") == [
+        (0, 100),
+        (100, 20),
+    ]
+    with pytest.raises(ConversionError):
+        split_frames(FRAME + b"junk", "mp3")
+
+
+def test_info_frame_carries_gapless_info(tmp_path):
+    frames = 1000
+    delay = MP3_FRAMING.encoder_delay - 529
+    padding = 700
+    info = build_mp3_info_frame(HEADER, [len(FRAME)] * frames, 128, delay, padding)
+    path = tmp_path / "joined.mp3"
+    path.write_bytes(info + FRAME * frames)
+
+    mp3 = MP3(path)
+
+    assert mp3.info.encoder_info.startswith("LAME 3.100")
+    assert mp3.info.length == pytest.approx((frames * 1152 - delay - padding) / 44100)
+
+
+def test_itunsmpb():
+    value = itunsmpb(1024, 500, 44100)
+    assert (
+        value.split()
+        == ["00000000", "00000400", "000001F4"]
+        + ["000000000000AC44"]
+        + ["00000000"] * 8
+    )
+
+
+def test_only_long_files_are_split():
+    chunker = ChunkedTranscoder(FFmpegBackend(), ChunkingOptions(min_seconds=600))
+    encoder = get_encoder("mp3-320")
+
+    def info(seconds, rate=44100):
+        return SimpleNamespace(
+            total_samples=int(seconds * rate), sample_rate=rate, length=seconds
+        )
+
+    assert chunker.plan(encoder, info(300)) is None
+    assert chunker.plan(encoder, None) is None
+    assert len(chunker.plan(encoder, info(3 * 3600))) == 36
+    # 96 kHz is not an MPEG-1 rate; ffmpeg would resample a single-pass encode.
+    assert chunker.plan(encoder, info(3600, rate=96000)) is None
+    assert len(chunker.plan(get_encoder("alac"), info(3600, rate=96000))) == 12
+
+
+class FakeSegmentBackend(FFmpegBackend):
+    """Writes one frame per 1152 samples the real encoder would produce."""
+
+    def run(self, command):
+        seconds = float(command[command.index("-t") + 1])
+        samples = round(seconds * 44100)
+        frames = -(-(samples + MP3_FRAMING.encoder_delay) // 1152)
+        with open(command[-1], "wb") as f:
+            f.write(FRAME * frames)
+
+
+def test_split_mp3_encode_joins_to_single_pass_length(tmp_path):
+    total = 44100 * 1500
+    source = tmp_path / "mix.flac"
+    source.write_bytes(b"")
+    output = tmp_path / "mix.mp3"
+    info = SimpleNamespace(total_samples=total, sample_rate=44100, length=1500.0)
+    chunker = ChunkedTranscoder(FakeSegmentBackend(), ChunkingOptions(600, 300, 2))
+    encoder = get_encoder("mp3-128")
+    segments = chunker.plan(encoder, info)
+
+    chunker.transcode(source, output, encoder, info, segments, StageTimings())
+
+    frames = -(-(total + MP3_FRAMING.encoder_delay) // 1152)
+    # Plus the Info frame.
+    assert len(split_frames(output.read_bytes(), "mp3")) == frames + 1
+    assert MP3(output).info.length == pytest.approx(1500.0)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["mix.flac", "mix.mp3"]
+
+
+class CountingSegmentBackend(FakeSegmentBackend):
+    """Records how many segments are encoded at once."""
+
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+
+    def run(self, command):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(0.05)
+        super().run(command)
+        with self.lock:
+            self.running -= 1
+
+
+def test_segments_take_encoder_slots(tmp_path):
+    info = SimpleNamespace(total_samples=44100 * 1500, sample_rate=44100, length=1500.0)
+    backend = CountingSegmentBackend()
+    chunker = ChunkedTranscoder(backend, ChunkingOptions(600, 150, 8))
+    encoder = get_encoder("mp3-128")
+    source = tmp_path / "mix.flac"
+    source.write_bytes(b"")
+    slots = threading.BoundedSemaphore(2)
+    slots.acquire()
+
+    token = held_encoder_slot.set(slots)
+    try:
+        chunker.transcode(
+            source,
+            tmp_path / "mix.mp3",
+            encoder,
+            info,
+            chunker.plan(encoder, info),
+            StageTimings(),
+        )
+    finally:
+        held_encoder_slot.reset(token)
+
+    assert backend.peak == 2
+    # The caller holds its slot again.
+    assert slots.acquire(blocking=False)
+    assert not slots.acquire(blocking=False)
+
+
+def _decoded_samples(path):
+    result = subprocess.run(
+        ["ffmpeg", "-v", "error", "-i", str(path), "-ac", "1", "-f", "s16le", "-"],
+        capture_output=True,
+        check=True,
+    )
+    return len(result.stdout) // 2
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs ffmpeg")
+@pytest.mark.parametrize("preset", ["mp3-128", "aac-256"])
+def test_chunked_encode_decodes_to_single_pass_length(tmp_path, preset):
+    source = tmp_path / "sine.flac"
+    subprocess.run(
+        [
+            "ffmpeg",
+            "-v",
+            "error",
+            "-f",
+            "lavfi",
+            "-i",
+            "sine=frequency=440:sample_rate=44100:duration=7.3",
+            "-ac",
+            "2",
+            "-c:a",
+            "flac",
+            str(source),
+        ],
+        check=True,
+    )
+    info = FLAC(source).info
+    encoder = get_encoder(preset)
+    backend = FFmpegBackend()
+    chunker = ChunkedTranscoder(backend, ChunkingOptions(1, 2, 2))
+    segments = chunker.plan(encoder, info)
+    single = tmp_path / f"single.{encoder.extension}"
+    chunked = tmp_path / f"chunked.{encoder.extension}"
+
+    backend.transcode(source, single, encoder, StageTimings())
+    chunker.transcode(source, chunked, encoder, info, segments, StageTimings())
+
+    assert len(segments) == 4
+    assert _decoded_samples(single) == info.total_samples
+    if encoder.codec == "aac":
+        # Demuxers differ in how much of iTunSMPB they apply, so decode the
+        # bare packets and apply the tag here.
+        fields = MP4(chunked).tags[ITUNSMPB_KEY][0].decode().split()
+        _, delay, padding, samples = (int(field, 16) for field in fields[:4])
+        packets = tmp_path / "chunked.aac"
+        subprocess.run(
+            ["ffmpeg", "-v", "error", "-i", str(chunked)]
+            + ["-c:a", "copy", "-f", "adts", str(packets)],
+            check=True,
+        )
+        assert samples == info.total_samples
+        assert _decoded_samples(packets) == delay + samples + padding
+    else:
+        assert _decoded_samples(chunked) == info.total_samples
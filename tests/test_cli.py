@@ -0,0 +1,97 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+from src.cli import main
+from src.core.converter import SingleFileConverter
+from src.core.encoders import OutputTarget, get_encoder
+from src.core.spool import JobSpool
+from src.utils.enums import AudioFormat
+
+
+@pytest.fixture
+def library(tmp_path):
+    input_dir = tmp_path / "in"
+    (input_dir / "album").mkdir(parents=True)
+    for name in ["01.flac", "02.flac"]:
+        (input_dir / "album" / name).write_bytes(b"")
+    return input_dir
+
+
+def _events(capsys):
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+def test_dry_run_emits_ndjson(library, tmp_path, capsys):
+    exit_code = main([str(library), "-o", str(tmp_path / "out"), "--dry-run"])
+
+    events = _events(capsys)
+    assert exit_code == 0
+    assert [event["event"] for event in events] == ["start", "file", "file", "summary"]
+    assert {event["status"] for event in events[1:3]} == {"planned"}
+    assert events[-1]["planned"] == 2
+    assert events[2]["done"] == 2
+    assert not (tmp_path / "out").exists()
+
+
+def test_failures_set_exit_code(library, tmp_path, capsys):
+    with patch("src.cli.check_ffmpeg"), patch(
+        "src.core.converter.SingleFileConverter.transcode",
+        side_effect=RuntimeError("boom"),
+    ):
+        exit_code = main([str(library), "-o", str(tmp_path / "out"), "-j", "1"])
+
+    events = _events(capsys)
+    assert exit_code == 1
+    assert events[-1]["failed"] == 2
+    assert "boom" in events[1]["error"]
+
+
+def test_rejects_preset_for_other_format(library, capsys):
+    with pytest.raises(SystemExit):
+        main([str(library), "--format", "mp3", "--preset", "alac"])
+
+
+@pytest.mark.parametrize("option", ["--probe-cache", "--dedupe"])
+def test_rejects_sqlite_caches_for_coordinator(library, tmp_path, option, capsys):
+    with pytest.raises(SystemExit):
+        main([str(library), "--coordinator", str(tmp_path / "spool"), option])
+    assert "--coordinator" in capsys.readouterr().err
+    assert not (tmp_path / "spool").exists()
+
+
+def test_progress_events_are_throttled(library, tmp_path, capsys):
+    main([str(library), "--dry-run", "--progress-interval", "0"])
+
+    progress = [event for event in _events(capsys) if event["event"] == "progress"]
+    assert len(progress) == 2
+    assert progress[-1]["files_done"] == 2
+    assert progress[-1]["workers"] == []
+
+
+def test_worker_checks_the_coordinators_requirements(tmp_path):
+    converter = SingleFileConverter(
+        AudioFormat.MP3,
+        include_cover=False,
+        split_cue=True,
+        extra_targets=[OutputTarget(get_encoder("alac"), tmp_path / "alac")],
+    )
+    JobSpool.create(tmp_path / "spool", converter.to_config())
+
+    with patch("src.cli.check_ffmpeg", side_effect=SystemExit(1)) as check, patch(
+        "src.cli.run_worker"
+    ) as run_worker:
+        with pytest.raises(SystemExit):
+            main(["--worker", str(tmp_path / "spool")])
+
+    check.assert_called_once_with(["alac", "libmp3lame"], ["asplit", "atrim"], [])
+    run_worker.assert_not_called()
+
+
+@pytest.mark.parametrize("option", ["--cover-max-size", "--cover-max-bytes"])
+def test_cover_options_need_pillow(library, option, capsys):
+    with patch("src.cli.importlib.util.find_spec", return_value=None):
+        with pytest.raises(SystemExit):
+            main([str(library), "--dry-run", option, "500"])
+    assert "Pillow" in capsys.readouterr().err
@@ -0,0 +1,123 @@
+from pathlib import Path
+
+from src.core.backends import FFmpegBackend
+from src.core.converter import AudioConverter
+from src.core.cuesheet import load_album_image, parse_cue
+from src.core.encoders import get_encoder
+from src.core.metadata import SourceMetadata
+from src.utils.enums import ConversionBackend
+
+CUE = """REM GENRE Rock
+REM DATE 1999
+PERFORMER "The Band"
+TITLE "Live at Home"
+FILE "album.flac" WAVE
+  TRACK 01 AUDIO
+    TITLE "Intro"
+    INDEX 00 00:00:00
+    INDEX 01 00:00:33
+  TRACK 02 AUDIO
+    TITLE "Song: Part 2"
+    PERFORMER "Guest"
+    INDEX 00 01:59:70
+    INDEX 01 02:00:00
+  TRACK 03 AUDIO
+    TITLE "Outro"
+    INDEX 01 04:30:15
+"""
+
+
+def test_parse_cue_reads_album_and_track_fields():
+    album, tracks, files = parse_cue(CUE)
+
+    assert album == {
+        "genre": ["Rock"],
+        "date": ["1999"],
+        "artist": ["The Band"],
+        "title": ["Live at Home"],
+    }
+    assert files == ["album.flac"]
+    assert [(number, start) for number, start, _ in tracks] == [
+        (1, 33),
+        (2, 120 * 75),
+        (3, 270 * 75 + 15),
+    ]
+    assert tracks[1][2] == {"title": ["Song: Part 2"], "artist": ["Guest"]}
+
+
+def test_load_album_image_from_sidecar(make_flac):
+    path = make_flac("album.flac", seconds=400.0)
+    path.with_suffix(".cue").write_bytes(CUE.encode("utf-8-sig"))
+
+    image = load_album_image(path)
+
+    # The pregap before track 1 stays in track 1.
+    assert [(t.start, t.end) for t in image.tracks] == [
+        (0, 120 * 44100),
+        (120 * 44100, 270 * 44100 + 15 * 588),
+        (270 * 44100 + 15 * 588, None),
+    ]
+    assert image.track_filename(image.tracks[1], "mp3") == "02 - Song_ Part 2.mp3"
+
+
+def test_load_album_image_from_cuesheet_tag(make_flac):
+    path = make_flac("album.flac", seconds=400.0, tags={"CUESHEET": CUE})
+
+    image = load_album_image(path)
+
+    assert [t.title for t in image.tracks] == ["Intro", "Song: Part 2", "Outro"]
+
+
+def test_plain_tracks_are_not_album_images(make_flac):
+    assert load_album_image(make_flac("track.flac")) is None
+
+    single = make_flac("single.flac", tags={"CUESHEET": CUE.split("  TRACK 02")[0]})
+    assert load_album_image(single) is None
+
+
+def test_track_metadata_merges_image_cue_and_track_tags(make_flac):
+    path = make_flac("album.flac", seconds=400.0)
+    path.with_suffix(".cue").write_bytes(CUE.encode("utf-8"))
+    image = load_album_image(path)
+    source = SourceMetadata(
+        tags={"album": ["Old"], "label": ["Indie"], "title": ["Whole image"]},
+        pictures=[],
+        duration=400.0,
+    )
+
+    second = image.track_metadata(source, image.tracks[1], 44100)
+    last = image.track_metadata(source, image.tracks[2], 44100)
+
+    assert second.tags["album"] == ["Live at Home"]
+    assert second.tags["albumartist"] == ["The Band"]
+    assert second.tags["artist"] == ["Guest"]
+    assert second.tags["label"] == ["Indie"]
+    assert second.tags["title"] == ["Song: Part 2"]
+    assert second.tags["tracknumber"] == ["2/3"]
+    assert second.duration == 150.2
+    assert last.tags["artist"] == ["The Band"]
+    assert round(last.duration, 2) == 129.8
+
+
+def test_split_command_decodes_once():
+    command = FFmpegBackend().build_split_command(
+        Path("album.flac"),
+        [(0, 100, Path("a.mp3")), (100, None, Path("b.mp3"))],
+        get_encoder("mp3-320"),
+    )
+
+    assert command.count("-i") == 1
+    graph = command[command.index("-filter_complex") + 1]
+    assert graph.startswith("[0:a:0]asplit=2[s0][s1];")
+    assert "[s0]atrim=start_sample=0:end_sample=100" in graph
+    assert "[s1]atrim=start_sample=100," in graph
+    assert command[-1] == "b.mp3"
+
+
+def test_album_images_get_a_track_directory(make_flac, tmp_path):
+    path = make_flac("album.flac", seconds=400.0)
+    path.with_suffix(".cue").write_bytes(CUE.encode("utf-8"))
+    converter = AudioConverter(split_cue=True)
+
+    assert converter._get_output_path(path, tmp_path, None) == tmp_path / "album"
+    assert not AudioConverter(split_cue=True, backend=ConversionBackend.PYDUB).split_cue
@@ -0,0 +1,119 @@
+from pathlib import Path
+
+import pytest
+from mutagen.flac import FLAC
+
+from src.core.backends import FFmpegBackend
+from src.core.chunking import ChunkingOptions
+from src.core.converter import AudioConverter, SingleFileConverter
+from src.core.downconvert import (
+    DownconvertOptions,
+    converted_info,
+    plan_downconversion,
+)
+from src.core.encoders import get_encoder
+from src.utils.enums import AudioFormat
+
+
+@pytest.mark.parametrize(
+    "sample_rate, bits, options, expected",
+    [
+        (
+            96000,
+            24,
+            DownconvertOptions(),
+            "aresample=osr=48000:resampler=soxr:precision=28:osf=s16"
+            ":dither_method=triangular_hp",
+        ),
+        (
+            88200,
+            24,
+            DownconvertOptions(),
+            "aresample=osr=44100:resampler=soxr:precision=28:osf=s16"
+            ":dither_method=triangular_hp",
+        ),
+        (
+            48000,
+            24,
+            DownconvertOptions(),
+            "aresample=osr=48000:osf=s16:dither_method=triangular_hp",
+        ),
+        (
+            192000,
+            24,
+            DownconvertOptions(bit_depth=24, resampler="swr"),
+            "aresample=osr=48000:resampler=swr",
+        ),
+        (44100, 16, DownconvertOptions(), None),
+        (96000, 24, DownconvertOptions(96000, 24), None),
+    ],
+)
+def test_plan_downconversion(make_flac, sample_rate, bits, options, expected):
+    info = FLAC(make_flac(sample_rate=sample_rate, bits_per_sample=bits)).info
+    conversion = plan_downconversion(options, info)
+    if expected is None:
+        assert conversion is None
+    else:
+        assert conversion.audio_filter == expected
+        assert conversion.whole_ratio
+
+
+def test_forced_rate_may_not_divide_the_source(make_flac):
+    info = FLAC(make_flac(sample_rate=96000, bits_per_sample=24, seconds=2)).info
+    conversion = plan_downconversion(DownconvertOptions(44100), info)
+
+    assert conversion.sample_rate == 44100
+    assert not conversion.whole_ratio
+    assert converted_info(info, 44100).total_samples == 88200
+    assert info.total_samples == 192000
+
+
+def test_filter_runs_in_the_same_ffmpeg_process(make_flac):
+    source = make_flac(sample_rate=96000, bits_per_sample=24)
+    converter = SingleFileConverter(
+        AudioFormat.AAC, include_cover=False, downconvert=DownconvertOptions()
+    )
+    encoder = converter.encoders_for(source)[0]
+    backend = FFmpegBackend()
+
+    command = backend.build_command(source, Path("out.m4a"), encoder, pcm=True)
+    assert command.count("-i") == 1
+    filter_index = command.index("-af")
+    assert command[filter_index + 1].startswith("aresample=osr=48000")
+    # Loudness is measured on the source, not on the converted audio.
+    assert filter_index < command.index("out.m4a") < command.index("pipe:1")
+
+    tracks = [(0, 100, Path("1.m4a")), (100, None, Path("2.m4a"))]
+    graph = backend.build_split_command(source, tracks, encoder)
+    graph = graph[graph.index("-filter_complex") + 1]
+    assert graph.count("aresample=") == 2
+
+    cd_quality = make_flac("cd.flac")
+    assert converter.encoders_for(cd_quality)[0] is converter.encoder
+
+
+@pytest.mark.parametrize("target_rate, segmented", [(None, True), (44100, False)])
+def test_segments_are_planned_at_the_output_rate(make_flac, target_rate, segmented):
+    source = make_flac(sample_rate=96000, bits_per_sample=24, seconds=900)
+    converter = SingleFileConverter(
+        AudioFormat.AAC,
+        include_cover=False,
+        chunking=ChunkingOptions(600, 300),
+        downconvert=DownconvertOptions(target_rate),
+    )
+
+    assert converter.uses_custom_transcode(source) is segmented
+    if segmented:
+        info = converter._segment_info(FLAC(source).info)
+        segments = converter.chunker.plan(converter.encoder, info)
+        assert segments[-1].end == 900 * 48000
+
+
+def test_soxr_is_required_of_ffmpeg():
+    converter = AudioConverter(
+        AudioFormat.AAC, downconvert=DownconvertOptions(resampler="soxr")
+    )
+    encoders, filters, libraries = converter.ffmpeg_requirements()
+    assert "aresample" in filters
+    assert libraries == ["libsoxr"]
+    assert AudioConverter(AudioFormat.AAC).ffmpeg_requirements()[2] == []
@@ -0,0 +1,138 @@
+from src.core.atomic import atomic_outputs, partial_path
+from src.core.converter import SingleFileConverter, _DirectoryRun
+from src.core.duplicates import DuplicateIndex, audio_md5
+from src.core.encoders import OutputTarget, get_encoder
+from src.utils.enums import AudioFormat
+
+MD5 = bytes(range(16))
+
+
+def test_audio_md5_comes_from_streaminfo(make_flac):
+    assert audio_md5(make_flac("a.flac", md5=MD5)) == MD5.hex()
+    # Encoders that skip the MD5 leave it zeroed; such files are never matched.
+    assert audio_md5(make_flac("b.flac")) is None
+
+
+def test_index_matches_copies_across_runs(make_flac, tmp_path):
+    original = make_flac("album/01.flac", md5=MD5, tags={"album": ["Album"]})
+    output = tmp_path / "01.mp3"
+    output.write_bytes(b"encoded")
+    DuplicateIndex(tmp_path / "index.sqlite").record(original, output, "mp3")
+
+    index = DuplicateIndex(tmp_path / "index.sqlite")
+    retagged = make_flac("hits/07.flac", md5=MD5, tags={"album": ["Hits"]})
+    same = make_flac("rerip/01.flac", md5=MD5, tags={"album": ["Album"]})
+
+    assert index.lookup(retagged, "mp3") == (output.resolve(), False)
+    assert index.lookup(same, "mp3") == (output.resolve(), True)
+    assert index.lookup(same, "aac") is None
+    assert index.lookup(make_flac("other.flac", md5=MD5[::-1]), "mp3") is None
+
+    output.unlink()
+    assert index.lookup(same, "mp3") is None
+
+
+def test_duplicates_are_linked_or_copied(make_flac, tmp_path):
+    converter = SingleFileConverter(
+        AudioFormat.MP3, include_cover=False, duplicate_index=tmp_path / "index.sqlite"
+    )
+    original = make_flac("01.flac", md5=MD5, tags={"title": ["Song"]})
+    output = tmp_path / "01.mp3"
+    output.write_bytes(b"encoded")
+    DuplicateIndex(converter.duplicate_index).record(
+        original, output, converter.settings_key()
+    )
+
+    linked = tmp_path / "linked.mp3"
+    linked_timings = converter.transcode(
+        make_flac("copy.flac", md5=MD5, tags={"title": ["Song"]}), linked
+    )
+    copied = tmp_path / "copied.mp3"
+    timings = converter.transcode(
+        make_flac("other.flac", md5=MD5, tags={"title": ["Other"]}), copied
+    )
+
+    assert linked.stat().st_ino == output.stat().st_ino
+    assert linked_timings.linked
+    assert not timings.linked
+    assert copied.read_bytes() == b"encoded"
+    assert copied.stat().st_ino != output.stat().st_ino
+    assert "reuse" in timings.seconds
+    assert converter.uses_custom_transcode(tmp_path / "other.flac")
+
+
+def test_later_copies_wait_for_the_first(make_flac, tmp_path):
+    jobs = [
+        (make_flac("a.flac", md5=MD5), tmp_path / "a.mp3"),
+        (make_flac("b.flac", md5=MD5), tmp_path / "b.mp3"),
+        (make_flac("c.flac", md5=MD5[::-1]), tmp_path / "c.mp3"),
+        (make_flac("d.flac"), tmp_path / "d.mp3"),
+        (make_flac("e.flac"), tmp_path / "e.mp3"),
+    ]
+
+    ordered = list(_DirectoryRun._defer_duplicates(jobs))
+
+    assert [source.stem for source, _ in ordered] == ["a", "c", "d", "e", "b"]
+
+
+def test_own_output_of_an_earlier_run_is_not_reused(make_flac, tmp_path):
+    converter = SingleFileConverter(
+        AudioFormat.MP3, include_cover=False, duplicate_index=tmp_path / "index.sqlite"
+    )
+    source = make_flac("01.flac", md5=MD5, tags={"title": ["Song"]})
+    output = tmp_path / "01.mp3"
+    output.write_bytes(b"encoded")
+    DuplicateIndex(converter.duplicate_index).record(
+        source, output, converter.settings_key()
+    )
+
+    encoded = []
+
+    def encode(input_path, output_path, *args):
+        encoded.append(output_path)
+        output_path.write_bytes(b"encoded again")
+
+    converter.backend.transcode = encode
+    with atomic_outputs([output]) as (partial,):
+        timings = converter.transcode(source, partial)
+
+    assert encoded == [partial]
+    assert not timings.linked
+    assert output.read_bytes() == b"encoded again"
+    assert output.stat().st_nlink == 1
+    assert [path.name for path in tmp_path.glob(".*")] == []
+
+
+def test_own_output_is_not_a_custom_transcode(make_flac, tmp_path):
+    converter = SingleFileConverter(
+        AudioFormat.MP3, include_cover=False, duplicate_index=tmp_path / "index.sqlite"
+    )
+    source = make_flac("01.flac", md5=MD5)
+    output = tmp_path / "01.mp3"
+    output.write_bytes(b"encoded")
+    DuplicateIndex(converter.duplicate_index).record(
+        source, output, converter.settings_key()
+    )
+
+    assert not converter.uses_custom_transcode(source, [partial_path(output)])
+    assert converter.uses_custom_transcode(source, [tmp_path / "copy.mp3"])
+
+
+def test_extra_outputs_of_a_resolved_duplicate(tmp_path):
+    real = tmp_path / "real"
+    real.mkdir()
+    (tmp_path / "link").symlink_to(real)
+    converter = SingleFileConverter(
+        AudioFormat.MP3,
+        include_cover=False,
+        extra_targets=[OutputTarget(get_encoder("aac-256"), tmp_path / "aac")],
+        output_root=tmp_path / "link",
+    )
+
+    # The duplicate index hands back resolved paths.
+    assert converter.extra_outputs(real / "album" / "01.mp3") == [
+        tmp_path / "aac" / "album" / "01.m4a"
+    ]
+    assert converter.extra_outputs(tmp_path / "link" / "01.mp3") == [
+        tmp_path / "aac" / "01.m4a"
+    ]
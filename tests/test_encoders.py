@@ -0,0 +1,41 @@
+import pytest
+
+from src.core.converter import AudioConverter
+from src.core.encoders import available_encoders, default_encoder, resolve_encoder
+from src.utils.enums import AudioFormat, TagFormat
+
+
+@pytest.mark.parametrize("output_format", list(AudioFormat))
+def test_every_format_has_a_default_encoder(output_format):
+    assert default_encoder(output_format).output_format == output_format
+
+
+def test_tag_format_follows_container():
+    assert default_encoder(AudioFormat.MP3).tag_format == TagFormat.ID3
+    assert default_encoder(AudioFormat.AAC).tag_format == TagFormat.MP4
+    assert default_encoder(AudioFormat.ALAC).tag_format == TagFormat.MP4
+
+
+def test_mp3_presets():
+    assert {"mp3-128", "mp3-320", "mp3-v0", "mp3-v2"} <= set(
+        available_encoders(AudioFormat.MP3)
+    )
+    assert resolve_encoder(AudioFormat.MP3, "mp3-v0").encoder_options[:2] == [
+        "-q:a",
+        "0",
+    ]
+
+
+def test_resolve_encoder_rejects_mismatched_preset():
+    with pytest.raises(ValueError):
+        resolve_encoder(AudioFormat.MP3, "alac")
+    with pytest.raises(ValueError):
+        resolve_encoder(AudioFormat.MP3, "mp3-999")
+
+
+def test_output_path_uses_preset_extension(tmp_path):
+    converter = AudioConverter(AudioFormat.ALAC)
+    output = converter._get_output_path(
+        tmp_path / "in" / "a" / "01.flac", tmp_path / "in", tmp_path / "out"
+    )
+    assert output == tmp_path / "out" / "a" / "01.m4a"
@@ -0,0 +1,92 @@
+import pytest
+
+from src.core.atomic import atomic_output, final_path, partial_path
+from src.core.journal import JOURNAL_FILENAME, RunJournal
+
+SETTINGS = "encoder=mp3-128;cover=1;backend=ffmpeg"
+
+
+@pytest.fixture
+def files(tmp_path):
+    source = tmp_path / "track.flac"
+    source.write_bytes(b"flac data")
+    output = tmp_path / "out" / "track.mp3"
+    output.parent.mkdir()
+    output.write_bytes(b"mp3 data")
+    return source, output
+
+
+def test_appended_files_are_done_after_reopening(files):
+    source, output = files
+    journal = RunJournal.for_directory(output.parent)
+    journal.append(source, output, SETTINGS)
+    journal.close()
+
+    journal = RunJournal.for_directory(output.parent, writable=False)
+    assert journal.is_done(source, output, SETTINGS)
+    assert not journal.is_done(source, output, "encoder=mp3-320")
+
+
+def test_changed_source_or_missing_output_is_not_done(files):
+    source, output = files
+    with_entry = RunJournal.for_directory(output.parent)
+    with_entry.append(source, output, SETTINGS)
+
+    source.write_bytes(b"remastered flac data")
+    assert not with_entry.is_done(source, output, SETTINGS)
+    with_entry.close()
+
+
+def test_truncated_line_is_ignored_and_terminated(files):
+    source, output = files
+    path = output.parent / JOURNAL_FILENAME
+    path.write_text('{"source": "cut sho')
+
+    journal = RunJournal(path)
+    journal.append(source, output, SETTINGS)
+    journal.close()
+
+    assert RunJournal(path, writable=False).is_done(source, output, SETTINGS)
+
+
+def test_read_only_journal_is_not_created(tmp_path):
+    assert RunJournal.for_directory(tmp_path, writable=False) is None
+    assert not (tmp_path / JOURNAL_FILENAME).exists()
+
+
+def test_discard_removes_journal(files):
+    source, output = files
+    journal = RunJournal.for_directory(output.parent)
+    journal.discard()
+    assert not (output.parent / JOURNAL_FILENAME).exists()
+
+
+def test_atomic_output_renames_on_success(tmp_path):
+    output = tmp_path / "track.mp3"
+    with atomic_output(output, sync=True) as partial:
+        assert partial.parent == tmp_path
+        partial.write_bytes(b"complete")
+
+    assert output.read_bytes() == b"complete"
+    assert list(tmp_path.iterdir()) == [output]
+
+
+def test_atomic_output_keeps_existing_file_on_failure(tmp_path):
+    output = tmp_path / "track.mp3"
+    output.write_bytes(b"previous")
+
+    with pytest.raises(RuntimeError):
+        with atomic_output(output) as partial:
+            partial.write_bytes(b"trunc")
+            raise RuntimeError("encoder died")
+
+    assert output.read_bytes() == b"previous"
+    assert list(tmp_path.iterdir()) == [output]
+
+
+def test_retry_reuses_the_partial_name(tmp_path):
+    output = tmp_path / "track.mp3"
+
+    assert partial_path(output) == partial_path(output)
+    assert final_path(partial_path(output)) == output
+    assert partial_path(output, unique=True) != partial_path(output, unique=True)
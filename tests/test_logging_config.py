@@ -0,0 +1,96 @@
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from src.utils.logging_config import configure_logging, get_logger, shutdown_logging
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    path = tmp_path / "test.log"
+    yield path
+    configure_logging(log_file="")
+
+
+def _drain():
+    # Stopping the listener writes out every queued record.
+    shutdown_logging()
+
+
+def test_records_reach_file_through_queue(log_path):
+    configure_logging(level="INFO", log_file=str(log_path))
+    logger = get_logger("tests.logging.text")
+    logger.debug("hidden detail")
+    logger.info("converted track")
+    _drain()
+
+    text = log_path.read_text()
+    assert "tests.logging.text - INFO - converted track" in text
+    assert "hidden detail" not in text
+
+
+def test_json_format(log_path):
+    configure_logging(log_file=str(log_path), json_format=True)
+    logger = get_logger("tests.logging.json")
+    try:
+        raise ValueError("bad frame")
+    except ValueError:
+        logger.exception("encode failed")
+    _drain()
+
+    entry = json.loads(log_path.read_text().splitlines()[-1])
+    assert entry["level"] == "ERROR"
+    assert entry["logger"] == "tests.logging.json"
+    assert entry["message"].startswith("encode failed")
+    assert "bad frame" in entry["message"]
+
+
+def test_log_file_rotates(log_path):
+    configure_logging(log_file=str(log_path), max_bytes=2000, backup_count=2)
+    logger = get_logger("tests.logging.rotate")
+    for i in range(200):
+        logger.debug(f"record {i} " + "x" * 50)
+    _drain()
+
+    rotated = sorted(p.name for p in log_path.parent.iterdir())
+    assert rotated == ["test.log", "test.log.1", "test.log.2"]
+    assert log_path.stat().st_size <= 2000
+
+
+def test_reconfigure_updates_existing_loggers(log_path):
+    logger = get_logger("tests.logging.level")
+    configure_logging(level=logging.WARNING, log_file=str(log_path))
+    assert logger.level == logging.WARNING
+    assert get_logger("tests.logging.level").handlers == logger.handlers
+
+
+def _log_in_worker(message):
+    get_logger("tests.logging.worker").info(message)
+    return os.getpid()
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(), reason="needs fork"
+)
+def test_records_from_forked_pool_workers_reach_file(log_path):
+    configure_logging(log_file=str(log_path))
+    get_logger("tests.logging.worker").info("from the parent")
+    context = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(max_workers=2, mp_context=context) as pool:
+        pids = list(pool.map(_log_in_worker, ["from worker 0", "from worker 1"]))
+    _drain()
+
+    assert os.getpid() not in pids
+    text = log_path.read_text()
+    assert "from the parent" in text
+    assert "tests.logging.worker - INFO - from worker 0" in text
+    assert "tests.logging.worker - INFO - from worker 1" in text
+
+
+def test_unknown_level_rejected():
+    with pytest.raises(ValueError):
+        configure_logging(level="LOUD")
@@ -0,0 +1,245 @@
+import math
+import os
+import threading
+from unittest.mock import patch
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from mutagen.id3 import ID3
+
+from src.core.converter import AudioConverter, SingleFileConverter
+from src.core.journal import JOURNAL_FILENAME
+from src.core.loudness import (
+    ALBUM_GAIN,
+    SOUND_CHECK,
+    TRACK_GAIN,
+    TRACK_PEAK,
+    Loudness,
+    LoudnessMeter,
+    PcmAnalyzer,
+    loudness_tags,
+    sound_check,
+)
+from src.core.metadata import SourceMetadata, write_id3_tags
+from src.utils.enums import AudioFormat
+from src.utils.profiling import StageTimings
+
+
+def _sine(level_db, seconds, sample_rate=48000, channels=2, frequency=1000.0):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    wave = 10 ** (level_db / 20) * np.sin(2 * math.pi * frequency * t)
+    return np.repeat(wave[:, None], channels, axis=1).astype(np.float32)
+
+
+@pytest.mark.parametrize("sample_rate", [44100, 48000, 96000])
+def test_ebu_reference_sine(sample_rate):
+    """A 1 kHz stereo sine at -23 dBFS measures -23 LUFS (EBU Tech 3341)."""
+    meter = LoudnessMeter(sample_rate, 2)
+    meter.feed(_sine(-23.0, 20, sample_rate))
+    loudness = meter.result()
+
+    assert loudness.integrated == pytest.approx(-23.0, abs=0.1)
+    assert loudness.gain == pytest.approx(5.0, abs=0.1)
+    assert 20 * math.log10(loudness.true_peak) == pytest.approx(-23.0, abs=0.2)
+
+
+def test_silence_is_gated_out():
+    """Silence between tones does not lower the integrated loudness."""
+    meter = LoudnessMeter(48000, 2)
+    meter.feed(_sine(-20.0, 10))
+    meter.feed(np.zeros((48000 * 10, 2), dtype=np.float32))
+    meter.feed(_sine(-20.0, 10))
+    assert meter.result().integrated == pytest.approx(-20.0, abs=0.1)
+
+    silent = LoudnessMeter(48000, 2)
+    silent.feed(np.zeros((48000 * 5, 2), dtype=np.float32))
+    assert silent.result().integrated is None
+    assert loudness_tags(silent.result()) == {}
+
+
+def test_album_loudness_gates_tracks_together():
+    """The album is gated as one programme, not averaged per track."""
+    loud, quiet = LoudnessMeter(48000, 2), LoudnessMeter(48000, 2)
+    loud.feed(_sine(-10.0, 10))
+    quiet.feed(_sine(-30.0, 10))
+
+    album = Loudness.combine([loud.result(), quiet.result()])
+
+    # The quiet track is more than 10 LU below the album, so it is gated out.
+    assert album.integrated == pytest.approx(-10.0, abs=0.1)
+    assert album.true_peak == loud.result().true_peak
+
+
+def test_analyzer_accepts_bytes_split_anywhere_and_cuts_tracks():
+    samples = np.concatenate([_sine(-20.0, 5), _sine(-30.0, 5)])
+    data = samples.astype("<f4").tobytes()
+    analyzer = PcmAnalyzer(48000, 2, track_starts=[48000 * 5])
+
+    # Chunks that split frames and samples.
+    for start in range(0, len(data), 100003):
+        analyzer.feed_bytes(data[start : start + 100003])
+    first, second = analyzer.results()
+
+    assert first.integrated == pytest.approx(-20.0, abs=0.1)
+    assert second.integrated == pytest.approx(-30.0, abs=0.1)
+
+
+def test_sound_check_format():
+    fields = sound_check(0.0, 1.0).split()
+    assert len(fields) == 10
+    assert fields[:4] == ["000003E8", "000003E8", "000009C4", "000009C4"]
+    assert fields[6:8] == ["00007FFF", "00007FFF"]
+    # 10 dB quieter means ten times the value.
+    assert sound_check(-10.0, 0.5).split()[0] == "00002710"
+
+
+def test_loudness_tags_are_written_in_the_same_save(tmp_path):
+    loudness = Loudness(-13.0, 0.9, np.zeros(0))
+    tags = loudness_tags(loudness)
+    metadata = SourceMetadata(
+        tags={"title": ["Song"], "replaygain_track_gain": ["-9.00 dB"]}
+    )
+    dest = tmp_path / "out.mp3"
+    dest.write_bytes(b"")
+
+    write_id3_tags(metadata, dest, None, tags)
+
+    id3 = ID3(dest)
+    assert id3["TIT2"].text == ["Song"]
+    assert id3[f"TXXX:{TRACK_GAIN}"].text == ["-5.00 dB"]
+    assert id3[f"TXXX:{TRACK_PEAK}"].text == ["0.900000"]
+    assert id3[f"COMM:{SOUND_CHECK}:eng"].text == [sound_check(-5.0, 0.9)]
+    # The source's own ReplayGain is replaced, not duplicated.
+    assert len(id3.getall("TXXX")) == 2
+
+
+def test_album_gain_breaks_hard_links(tmp_path):
+    converter = SingleFileConverter(AudioFormat.MP3, include_cover=False)
+    output = tmp_path / "album" / "01.mp3"
+    output.parent.mkdir()
+    output.write_bytes(b"")
+    write_id3_tags(SourceMetadata(tags={"title": ["Song"]}), output, None)
+    duplicate = tmp_path / "other.mp3"
+    os.link(output, duplicate)
+
+    converter.write_album_loudness(output, Loudness(-20.0, 0.5, np.zeros(0)))
+
+    id3 = ID3(output)
+    assert id3["TIT2"].text == ["Song"]
+    assert id3[f"TXXX:{ALBUM_GAIN}"].text == ["2.00 dB"]
+    assert f"TXXX:{ALBUM_GAIN}" not in ID3(duplicate)
+    assert not list(output.parent.glob(".*.partial"))
+
+
+def test_album_gain_is_written_in_place(tmp_path):
+    converter = SingleFileConverter(AudioFormat.MP3, include_cover=False)
+    output = tmp_path / "01.mp3"
+    output.write_bytes(b"")
+    write_id3_tags(SourceMetadata(tags={"title": ["Song"]}), output, None)
+    inode = output.stat().st_ino
+
+    converter.write_album_loudness(output, Loudness(-20.0, 0.5, np.zeros(0)))
+
+    assert ID3(output)[f"TXXX:{ALBUM_GAIN}"].text == ["2.00 dB"]
+    assert output.stat().st_ino == inode
+
+
+LEVELS = {"01.flac": -14.0, "02.flac": -24.0, "03.flac": -16.0}
+
+
+def _measured_transcode(self, input_path, output_path, *extra, analyzer=None):
+    if input_path.name.startswith("broken"):
+        raise RuntimeError("corrupt stream")
+    output_path.write_bytes(b"encoded")
+    if analyzer is not None:
+        analyzer.feed(_sine(LEVELS.get(input_path.name, -20.0), 3))
+    return StageTimings(seconds={"encode": 0.1})
+
+
+@pytest.fixture
+def measured_encoder():
+    written = {}
+    albums = {}
+
+    def write_metadata(self, src_path, dest_path, *extra, loudness=()):
+        written[src_path.name] = list(loudness)
+        return StageTimings()
+
+    def write_album_loudness(self, output_path, album):
+        albums[output_path.name] = album
+
+    with patch(
+        "src.core.converter.SingleFileConverter.transcode", _measured_transcode
+    ), patch(
+        "src.core.converter.SingleFileConverter.write_metadata", write_metadata
+    ), patch(
+        "src.core.converter.SingleFileConverter.write_album_loudness",
+        write_album_loudness,
+    ):
+        yield written, albums
+
+
+def test_album_gain_once_every_track_is_measured(make_flac, tmp_path, measured_encoder):
+    written, albums = measured_encoder
+    for name in LEVELS:
+        make_flac(f"in/album/{name}", sample_rate=48000)
+    make_flac("in/single/04.flac", sample_rate=48000)
+
+    AudioConverter(
+        num_threads=2, metadata_processes=0, loudness=True
+    ).convert_directory(tmp_path / "in", tmp_path / "out")
+
+    assert written["01.flac"][0].integrated == pytest.approx(-14.0, abs=0.1)
+    assert sorted(albums) == ["01.mp3", "02.mp3", "03.mp3", "04.mp3"]
+    album = albums["01.mp3"]
+    assert album is albums["02.mp3"]
+    # The energy average of equally long tracks, none below the gate.
+    expected = 10 * math.log10(sum(10 ** (v / 10) for v in LEVELS.values()) / 3)
+    assert album.integrated == pytest.approx(expected, abs=0.1)
+    assert albums["04.mp3"].integrated == pytest.approx(-20.0, abs=0.1)
+
+
+def test_no_album_gain_for_incomplete_albums(make_flac, tmp_path, measured_encoder):
+    _, albums = measured_encoder
+    make_flac("in/album/01.flac", sample_rate=48000)
+    make_flac("in/album/broken.flac", sample_rate=48000)
+
+    AudioConverter(
+        num_threads=2, metadata_processes=0, loudness=True
+    ).convert_directory(tmp_path / "in", tmp_path / "out")
+
+    assert albums == {}
+
+
+def test_album_tracks_are_recorded_after_their_album_gain(
+    make_flac, tmp_path, measured_encoder
+):
+    for name in LEVELS:
+        make_flac(f"in/album/{name}", sample_rate=48000)
+    journal = tmp_path / "out" / JOURNAL_FILENAME
+    recorded = []
+    threads = []
+
+    def write_album_loudness(self, output_path, album):
+        recorded.append(str(output_path) in journal.read_text())
+        threads.append(threading.current_thread().name)
+
+    with patch(
+        "src.core.converter.SingleFileConverter.write_album_loudness",
+        write_album_loudness,
+    ):
+        AudioConverter(
+            num_threads=2, metadata_processes=0, loudness=True, incremental=True
+        ).convert_directory(tmp_path / "in", tmp_path / "out")
+
+    # A run killed before the album gain resumes by converting the album again.
+    assert recorded == [False] * 3
+    assert all(name.startswith("album-gain") for name in threads)
+    assert (
+        AudioConverter(incremental=True, loudness=True).convert_directory(
+            tmp_path / "in", tmp_path / "out"
+        )
+        == []
+    )
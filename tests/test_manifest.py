@@ -0,0 +1,100 @@
+import os
+
+import pytest
+
+from src.core.manifest import (
+    MANIFEST_FILENAME,
+    ConversionManifest,
+    hash_file,
+    hash_source,
+)
+
+SETTINGS = "format=mp3;cover=1;backend=ffmpeg"
+
+
+@pytest.fixture
+def library(tmp_path):
+    input_dir = tmp_path / "in"
+    output_dir = tmp_path / "out"
+    input_dir.mkdir()
+    output_dir.mkdir()
+    source = input_dir / "track.flac"
+    source.write_bytes(b"flac data")
+    output = output_dir / "track.mp3"
+    output.write_bytes(b"mp3 data")
+    return input_dir, output_dir, source, output
+
+
+def test_unknown_file_needs_conversion(library):
+    input_dir, output_dir, source, output = library
+    with ConversionManifest.for_directory(output_dir) as manifest:
+        assert not manifest.is_up_to_date(source, output, SETTINGS)
+    assert (output_dir / MANIFEST_FILENAME).exists()
+
+
+def test_recorded_file_is_skipped_across_runs(library):
+    input_dir, output_dir, source, output = library
+    with ConversionManifest.for_directory(output_dir) as manifest:
+        manifest.record(source, output, SETTINGS)
+
+    with ConversionManifest.for_directory(output_dir) as manifest:
+        assert manifest.is_up_to_date(source, output, SETTINGS)
+        assert not manifest.is_up_to_date(source, output, "format=mp3;cover=0")
+
+
+def test_touched_file_with_same_content_is_skipped(library):
+    input_dir, output_dir, source, output = library
+    with ConversionManifest.for_directory(output_dir) as manifest:
+        manifest.record(source, output, SETTINGS)
+        stat = source.stat()
+        os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert manifest.is_up_to_date(source, output, SETTINGS)
+
+        source.write_bytes(b"flac DATA")
+        os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10**9))
+        assert not manifest.is_up_to_date(source, output, SETTINGS)
+
+
+def test_missing_output_needs_conversion(library):
+    input_dir, output_dir, source, output = library
+    with ConversionManifest.for_directory(output_dir) as manifest:
+        manifest.record(source, output, SETTINGS)
+        output.unlink()
+        assert not manifest.is_up_to_date(source, output, SETTINGS)
+
+
+def test_prune_removes_outputs_of_deleted_sources(library):
+    input_dir, output_dir, source, output = library
+    with ConversionManifest.for_directory(output_dir) as manifest:
+        manifest.record(source, output, SETTINGS)
+        source.unlink()
+        removed = manifest.prune(input_dir, set())
+
+    assert removed == [output]
+    assert not output.exists()
+
+
+def test_prune_keeps_outputs_of_existing_sources(library):
+    input_dir, output_dir, source, output = library
+    with ConversionManifest.for_directory(output_dir) as manifest:
+        manifest.record(source, output, SETTINGS)
+        assert manifest.prune(input_dir, {source}) == []
+        assert manifest.prune(input_dir, set()) == []
+
+    assert output.exists()
+
+
+def test_source_hash_reads_only_the_metadata(make_flac):
+    source = make_flac(tags={"title": ["Song"]}, md5=bytes(range(16)))
+    digest = hash_source(source)
+
+    # Audio frames are covered by the STREAMINFO MD5, not read.
+    with open(source, "ab") as f:
+        f.write(b"audio frames")
+    assert hash_source(source) == digest
+
+    retagged = make_flac(tags={"title": ["Other"]}, md5=bytes(range(16)))
+    assert hash_source(retagged) != digest
+
+    unchecked = make_flac("unchecked.flac")
+    assert hash_source(unchecked) == hash_file(unchecked)
@@ -0,0 +1,124 @@
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from src.core.backends import FFmpegBackend
+from src.core.converter import SingleFileConverter
+from src.core.memory import (
+    FFMPEG_PROCESS_BYTES,
+    MemoryGovernor,
+    parse_size,
+    pcm_bytes,
+)
+from src.core.metadata import read_stream_info
+from src.core.scheduler import ConversionScheduler
+from src.utils.enums import AudioFormat, ConversionBackend
+from src.utils.profiling import StageTimings
+
+
+def test_parse_size():
+    assert parse_size("512M") == 512 * 1024**2
+    assert parse_size("1.5G") == 3 * 1024**3 // 2
+    assert parse_size("2GiB") == 2 * 1024**3
+    assert parse_size("4096") == 4096
+    with pytest.raises(ValueError):
+        parse_size("lots")
+
+
+def test_pcm_bytes_from_streaminfo(make_flac):
+    cd = make_flac("cd.flac", seconds=60.0)
+    hires = make_flac(
+        "hires.flac", seconds=60.0, sample_rate=192000, bits_per_sample=24
+    )
+
+    assert pcm_bytes(read_stream_info(cd), 0) == 60 * 44100 * 2 * 2
+    assert pcm_bytes(read_stream_info(hires), 0) == 60 * 192000 * 2 * 4
+    assert pcm_bytes(None, 1000) == 2000
+
+
+def test_governor_admits_within_budget():
+    governor = MemoryGovernor(100)
+
+    assert governor.try_acquire(60)
+    assert not governor.try_acquire(50)
+    assert governor.try_acquire(40)
+    governor.release(60)
+    governor.release(40)
+    # An oversized job runs, but only on its own.
+    assert governor.try_acquire(500)
+    assert not governor.try_acquire(1)
+    governor.release(500)
+    assert governor.peak == 500
+
+
+def test_pydub_estimate_and_streaming_fallback(make_flac):
+    path = make_flac("long.flac", seconds=600.0, sample_rate=96000, bits_per_sample=24)
+    pcm = 600 * 96000 * 2 * 4
+
+    unbounded = SingleFileConverter(AudioFormat.MP3, False, ConversionBackend.PYDUB)
+    bounded = SingleFileConverter(
+        AudioFormat.MP3, False, ConversionBackend.PYDUB, memory_budget=pcm
+    )
+    assert unbounded.memory_estimate(path) == 2 * pcm
+    assert bounded.memory_estimate(path) == FFMPEG_PROCESS_BYTES
+
+    with patch.object(FFmpegBackend, "transcode") as streamed:
+        bounded.transcode(path, path.with_suffix(".mp3"))
+    streamed.assert_called_once()
+
+
+class _Backend:
+    runs_in_subprocess = True
+
+
+class _SizedConverter:
+    backend = _Backend()
+    sync_output = False
+
+    def __init__(self):
+        self.running = 0
+        self.most = 0
+        self.lock = threading.Lock()
+
+    def extra_outputs(self, output_path):
+        return []
+
+    def loudness_analyzer(self, input_path):
+        return None
+
+    def memory_estimate(self, input_path):
+        return 60
+
+    def transcode(self, input_path, output_path):
+        with self.lock:
+            self.running += 1
+            self.most = max(self.most, self.running)
+        time.sleep(0.05)
+        with self.lock:
+            self.running -= 1
+        output_path.write_text("audio")
+        return StageTimings()
+
+    def write_metadata(self, src_path, dest_path):
+        return StageTimings()
+
+
+def test_scheduler_holds_jobs_that_do_not_fit(tmp_path):
+    converter = _SizedConverter()
+    governor = MemoryGovernor(100)
+
+    with ConversionScheduler(
+        max_workers=4, metadata_processes=0, memory=governor
+    ) as scheduler:
+        futures = [
+            scheduler.submit(converter, tmp_path / f"{i}.flac", tmp_path / f"{i}.mp3")
+            for i in range(4)
+        ]
+        for future in futures:
+            future.result()
+
+    assert converter.most == 1
+    assert governor.peak == 60
+    assert governor.in_use == 0
@@ -0,0 +1,49 @@
+from mutagen.id3 import ID3
+
+from src.core.metadata import read_source_metadata, resolve_cover, write_id3_tags
+
+COVER = open("tests/resources/test_cover.jpg", "rb").read()
+TAGS = {"title": "Test Title", "artist": "Test Artist", "album": "Test Album"}
+
+
+def test_read_source_metadata(make_flac):
+    metadata = read_source_metadata(make_flac(tags=TAGS, cover=COVER))
+
+    assert metadata.tags["title"] == ["Test Title"]
+    assert metadata.tags["album"] == ["Test Album"]
+    assert metadata.cover.data == COVER
+
+
+def test_write_id3_tags_with_cover(make_flac, tmp_path):
+    metadata = read_source_metadata(make_flac(tags=TAGS, cover=COVER))
+    dest = tmp_path / "out.mp3"
+    dest.write_bytes(b"")
+
+    write_id3_tags(metadata, dest, resolve_cover(metadata, None))
+
+    tags = ID3(dest)
+    assert tags.version[:2] == (2, 3)
+    assert tags["TIT2"].text[0] == "Test Title"
+    assert tags["TPE1"].text[0] == "Test Artist"
+    assert tags["TALB"].text[0] == "Test Album"
+    assert tags["APIC:Cover"].data == COVER
+
+
+def test_write_id3_tags_without_cover(make_flac, tmp_path):
+    metadata = read_source_metadata(make_flac(tags=TAGS, cover=COVER))
+    dest = tmp_path / "out.mp3"
+    dest.write_bytes(b"")
+
+    write_id3_tags(metadata, dest, None)
+
+    assert not ID3(dest).getall("APIC")
+
+
+def test_unknown_tags_are_dropped(make_flac, tmp_path):
+    metadata = read_source_metadata(make_flac(tags={"mycustomtag": "x", **TAGS}))
+    dest = tmp_path / "out.mp3"
+    dest.write_bytes(b"")
+
+    write_id3_tags(metadata, dest, None)
+
+    assert not any("mycustomtag" in key.lower() for key in ID3(dest).keys())
@@ -0,0 +1,74 @@
+from src.core.metadata import read_stream_info
+from src.core.ordering import estimate_job, order_jobs
+from src.utils.enums import JobOrder
+
+
+def _jobs(*paths):
+    return [(path, path.with_suffix(".mp3")) for path in paths]
+
+
+def _sources(jobs):
+    return [source.relative_to(source.parents[1]).as_posix() for source, _ in jobs]
+
+
+def test_read_stream_info(make_flac, tmp_path):
+    info = read_stream_info(make_flac(seconds=90.0, sample_rate=48000))
+    assert info.length == 90.0
+    assert info.sample_rate == 48000
+
+    not_flac = tmp_path / "fake.flac"
+    not_flac.write_bytes(b"ID3" + b"\0" * 100)
+    assert read_stream_info(not_flac) is None
+
+
+def test_longest_first(make_flac):
+    jobs = _jobs(
+        make_flac("a/short.flac", seconds=30.0),
+        make_flac("a/mix.flac", seconds=3600.0),
+        make_flac("a/track.flac", seconds=240.0),
+    )
+
+    assert _sources(order_jobs(jobs, JobOrder.LONGEST)) == [
+        "a/mix.flac",
+        "a/track.flac",
+        "a/short.flac",
+    ]
+    assert order_jobs(jobs, JobOrder.SCAN) == jobs
+
+
+def test_cost_weighs_sample_rate(make_flac):
+    cd = estimate_job(*_jobs(make_flac("cd.flac", seconds=300.0))[0])
+    hires = estimate_job(
+        *_jobs(make_flac("hires.flac", seconds=200.0, sample_rate=192000))[0]
+    )
+
+    assert cd.duration > hires.duration
+    assert hires.cost > cd.cost
+
+
+def test_unreadable_stream_info_falls_back_to_size(tmp_path):
+    source = tmp_path / "broken.flac"
+    source.write_bytes(b"\0" * 500_000)
+
+    estimate = estimate_job(source, source.with_suffix(".mp3"))
+
+    assert estimate.duration == 5.0
+    assert estimate.cost > 0
+
+
+def test_album_order_keeps_albums_together(make_flac):
+    jobs = _jobs(
+        make_flac("small/01.flac", seconds=100.0),
+        make_flac("big/01.flac", seconds=200.0),
+        make_flac("small/02.flac", seconds=300.0),
+        make_flac("big/02.flac", seconds=250.0),
+        make_flac("big/03.flac", seconds=10.0),
+    )
+
+    assert _sources(order_jobs(jobs, JobOrder.ALBUM)) == [
+        "big/02.flac",
+        "big/01.flac",
+        "big/03.flac",
+        "small/02.flac",
+        "small/01.flac",
+    ]
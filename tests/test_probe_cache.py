@@ -0,0 +1,75 @@
+import os
+import sqlite3
+from unittest.mock import patch
+
+from src.core.artwork import ArtworkCache, artwork_key
+from src.core.metadata import resolve_cover
+from src.core.probe_cache import ProbeCache, get_probe_cache
+
+COVER = b"\xff\xd8\xff\xe0" + b"\x00" * 64
+
+
+def test_probe_cache_reads_each_file_once(make_flac, tmp_path):
+    source = make_flac(tags={"title": ["One"], "artist": ["A", "B"]}, cover=COVER)
+    cache = ProbeCache(tmp_path / "probe.sqlite")
+
+    first = cache.read(source)
+    with patch("src.core.probe_cache.read_source_metadata") as parse:
+        second = ProbeCache(tmp_path / "probe.sqlite").read(source)
+
+    parse.assert_not_called()
+    assert second.tags == first.tags == {"title": ["One"], "artist": ["A", "B"]}
+    assert second.duration == first.duration == 1.0
+    assert second.pictures == []
+    assert second.cover_reference.key == artwork_key(COVER)
+    assert (cache.hits, cache.misses) == (0, 1)
+
+
+def test_cached_cover_is_resolved_through_the_artwork_cache(make_flac, tmp_path):
+    source = make_flac(cover=COVER)
+    cache = ProbeCache(tmp_path / "probe.sqlite")
+    cache.read(source)
+    metadata = cache.read(source)
+    artwork = ArtworkCache()
+
+    # The first track of an album reads the cover from its source.
+    assert resolve_cover(metadata, artwork).data == COVER
+    with patch("src.core.metadata.read_source_metadata") as parse:
+        assert resolve_cover(metadata, artwork).data == COVER
+    parse.assert_not_called()
+    assert artwork.hits == 1
+
+
+def test_legacy_picture_copies_are_dropped(tmp_path):
+    path = tmp_path / "probe.sqlite"
+    connection = sqlite3.connect(str(path))
+    connection.execute("CREATE TABLE probes (source TEXT, pictures BLOB)")
+    connection.execute("INSERT INTO probes VALUES ('a.flac', ?)", (b"\0" * 65536,))
+    connection.commit()
+    connection.close()
+    size = path.stat().st_size
+
+    ProbeCache(path).close()
+
+    tables = sqlite3.connect(str(path)).execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table'"
+    )
+    assert [name for name, in tables] == ["source_probes"]
+    assert path.stat().st_size < size
+
+
+def test_probe_cache_reparses_modified_files(make_flac, tmp_path):
+    source = make_flac(tags={"title": ["Old"]})
+    cache = ProbeCache(tmp_path / "probe.sqlite")
+    cache.read(source)
+
+    make_flac(tags={"title": ["New"]})
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    assert cache.read(source).tags == {"title": ["New"]}
+    assert cache.misses == 2
+
+
+def test_unusable_probe_cache_is_skipped(tmp_path):
+    assert get_probe_cache(tmp_path / "missing" / "probe.sqlite") is None
@@ -0,0 +1,53 @@
+import pstats
+import time
+
+from src.utils.profiling import CpuProfiler, RunProfile, StageTimings, percentile
+
+
+def test_stage_timings_accumulate_and_merge():
+    timings = StageTimings()
+    with timings.stage("encode"):
+        time.sleep(0.01)
+    timings.add_bytes("output", 100)
+
+    merged = StageTimings(seconds={"encode": 1.0}, audio_seconds=5.0).merge(timings)
+
+    assert merged.seconds["encode"] > 1.0
+    assert merged.bytes == {"output": 100}
+    assert merged.audio_seconds == 5.0
+
+
+def test_percentile():
+    assert percentile([], 0.5) is None
+    assert percentile([3.0, 1.0, 2.0], 0.5) == 2.0
+    assert percentile([float(i) for i in range(1, 101)], 0.95) == 95.0
+
+
+def test_run_profile_summary(tmp_path):
+    profile = RunProfile()
+    for latency in (1.0, 2.0, 3.0):
+        profile.add_file(
+            StageTimings(seconds={"encode": latency}, audio_seconds=60.0), latency
+        )
+    profile.add_file(None, None, failed=True)
+    profile.add_stage("scan", 0.25)
+    profile.finish()
+
+    summary = profile.summary()
+    assert summary["files"] == 3
+    assert summary["failed"] == 1
+    assert summary["audio_seconds"] == 180.0
+    assert summary["latency_p50"] == 2.0
+    assert summary["stage_seconds"] == {"encode": 6.0, "scan": 0.25}
+
+    profile.write_json(tmp_path / "stats.json")
+    assert (tmp_path / "stats.json").exists()
+
+
+def test_cpu_profiler_dump(tmp_path):
+    with CpuProfiler() as profiler:
+        with profiler.thread():
+            sum(range(1000))
+    profiler.dump(tmp_path / "run.prof")
+
+    assert pstats.Stats(str(tmp_path / "run.prof")).total_calls > 0
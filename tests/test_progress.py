@@ -0,0 +1,103 @@
+from pathlib import Path
+
+import pytest
+
+from src.core.progress import WAITING, ProgressTracker
+from src.core.results import ConversionResult, ConversionStatus
+from src.utils.profiling import StageTimings
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def _converted(name, size=1000, audio=60.0):
+    timings = StageTimings(audio_seconds=audio)
+    timings.add_bytes("input", size)
+    return ConversionResult(
+        Path(name),
+        Path(name).with_suffix(".mp3"),
+        ConversionStatus.CONVERTED,
+        timings=timings,
+    )
+
+
+def test_snapshot_aggregates_results(clock):
+    tracker = ProgressTracker(window=10.0, clock=clock)
+    tracker.set_found(10, finished=True)
+    clock.now += 2.0
+    tracker.record(_converted("a.flac"))
+    tracker.record(_converted("b.flac"))
+    tracker.record(ConversionResult(Path("c.flac"), None, ConversionStatus.SKIPPED))
+    tracker.record(ConversionResult(Path("d.flac"), None, ConversionStatus.FAILED))
+
+    snapshot = tracker.snapshot()
+
+    assert (snapshot.files_done, snapshot.converted, snapshot.skipped) == (4, 2, 1)
+    assert snapshot.failed == 1
+    assert snapshot.bytes_done == 2000
+    assert snapshot.audio_seconds == 120.0
+    assert snapshot.files_per_second == 1.0
+    assert snapshot.realtime_factor == 60.0
+    assert snapshot.eta_seconds == 6.0
+    assert snapshot.fraction == 0.4
+
+
+def test_rates_only_cover_the_window(clock):
+    tracker = ProgressTracker(window=10.0, clock=clock)
+    tracker.set_found(3)
+    clock.now += 10.0
+    tracker.record(_converted("a.flac"))
+    clock.now += 20.0
+
+    snapshot = tracker.snapshot()
+
+    assert snapshot.files_per_second == 0.0
+    assert snapshot.eta_seconds is None
+    assert snapshot.bytes_done == 1000
+
+
+def test_tick_is_rate_limited(clock):
+    tracker = ProgressTracker(interval=0.5, clock=clock)
+    assert tracker.tick() is None
+    clock.now += 0.5
+    assert tracker.tick() is not None
+    clock.now += 0.1
+    assert tracker.tick() is None
+
+
+def test_worker_state(clock):
+    tracker = ProgressTracker(clock=clock)
+    tracker.worker_started("w1", Path("a.flac"))
+    clock.now += 1.0
+    tracker.worker_stage("w1", "encode")
+    clock.now += 2.0
+    tracker.worker_started("w2", Path("b.flac"))
+
+    workers = tracker.snapshot().workers
+
+    assert [(w.worker, w.stage, w.seconds) for w in workers] == [
+        ("w1", "encode", 2.0),
+        ("w2", WAITING, 0.0),
+    ]
+    tracker.worker_finished("w1")
+    tracker.worker_finished("w2")
+    assert tracker.snapshot().workers == ()
+
+
+def test_to_dict_is_json_friendly(clock):
+    tracker = ProgressTracker(clock=clock)
+    tracker.worker_started("w1", Path("a.flac"))
+    data = tracker.snapshot().to_dict()
+    assert data["workers"] == [
+        {"worker": "w1", "source": "a.flac", "stage": WAITING, "seconds": 0.0}
+    ]
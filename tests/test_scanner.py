@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from src.core.file_handler import FileHandler
+from src.core.scanner import LibraryScanner
+from src.utils.exceptions import FileOperationError
+
+
+@pytest.fixture
+def library(tmp_path):
+    for relative in [
+        "a/01.flac",
+        "a/02.FLAC",
+        "a/cover.jpg",
+        "b/c/03.flac",
+        "scratch/04.flac",
+        "b/05.flac.part",
+    ]:
+        path = tmp_path / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"")
+    return tmp_path
+
+
+def test_scan_matches_extensions_case_insensitively(library):
+    files = list(LibraryScanner(library))
+    assert [f.relative_to(library).as_posix() for f in files] == [
+        "a/01.flac",
+        "a/02.FLAC",
+        "b/c/03.flac",
+        "scratch/04.flac",
+    ]
+
+
+def test_scan_is_lazy_and_counts_as_it_goes(library):
+    scanner = LibraryScanner(library)
+    iterator = iter(scanner)
+    next(iterator)
+    assert scanner.count == 1
+    assert not scanner.finished
+
+    rest = list(iterator)
+    assert scanner.count == 1 + len(rest) == 4
+    assert scanner.finished
+
+
+def test_scan_exclude_patterns(library):
+    scanner = LibraryScanner(library, exclude=["scratch", "*/02.*"])
+    assert [f.relative_to(library).as_posix() for f in scanner] == [
+        "a/01.flac",
+        "b/c/03.flac",
+    ]
+
+
+def test_scan_does_not_loop_on_symlink_cycles(library):
+    os.symlink(library, library / "b" / "loop")
+    assert len(list(LibraryScanner(library))) == 4
+
+
+def test_scan_missing_directory(tmp_path):
+    with pytest.raises(FileOperationError):
+        list(LibraryScanner(tmp_path / "missing"))
+
+
+def test_file_handler_uses_scanner(library):
+    assert len(FileHandler.get_flac_files(library)) == 4
+    assert len(FileHandler.get_flac_files(library, exclude=["b"])) == 3
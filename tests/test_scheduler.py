@@ -0,0 +1,83 @@
+from pathlib import Path
+
+import pytest
+
+from src.core.scheduler import ConversionScheduler, default_worker_count
+from src.utils.exceptions import ConversionError
+from src.utils.profiling import StageTimings
+
+
+class _Backend:
+    def __init__(self, runs_in_subprocess):
+        self.runs_in_subprocess = runs_in_subprocess
+
+
+class FakeConverter:
+    """Picklable stand-in for SingleFileConverter that writes marker files."""
+
+    def __init__(self, runs_in_subprocess=True, fail=False):
+        self.backend = _Backend(runs_in_subprocess)
+        self.fail = fail
+        self.sync_output = False
+
+    def extra_outputs(self, output_path):
+        return []
+
+    def loudness_analyzer(self, input_path):
+        return None
+
+    def transcode(self, input_path, output_path):
+        if self.fail:
+            raise RuntimeError("encoder crashed")
+        output_path.write_text("audio")
+        return StageTimings(seconds={"encode": 1.0})
+
+    def write_metadata(self, src_path, dest_path):
+        with open(dest_path, "a") as f:
+            f.write("+tags")
+        return StageTimings(seconds={"metadata": 0.5}, audio_seconds=3.0)
+
+
+def test_default_worker_count():
+    """Test that the scheduler sizes itself from the CPU count."""
+    scheduler = ConversionScheduler()
+    assert scheduler.max_workers == default_worker_count()
+    assert scheduler.max_encoders == scheduler.max_workers
+    # Tag writing stays on threads; the process pool is opt-in.
+    assert scheduler.metadata_processes == 0
+
+
+@pytest.mark.parametrize("metadata_processes", [0, 1])
+@pytest.mark.parametrize("runs_in_subprocess", [True, False])
+def test_submit_runs_both_stages(tmp_path, metadata_processes, runs_in_subprocess):
+    """Test that transcode and metadata stages run in the thread and process pools."""
+    converter = FakeConverter(runs_in_subprocess=runs_in_subprocess)
+    outputs = [tmp_path / f"{i}.mp3" for i in range(3)]
+
+    with ConversionScheduler(
+        max_workers=2, max_encoders=1, metadata_processes=metadata_processes
+    ) as scheduler:
+        futures = [scheduler.submit(converter, Path("in.flac"), out) for out in outputs]
+        results = [future.result() for future in futures]
+
+    assert [result.output for result in results] == outputs
+    assert all(result.seconds >= 0 for result in results)
+    assert results[0].timings.seconds == {"encode": 1.0, "metadata": 0.5}
+    assert results[0].timings.audio_seconds == 3.0
+    assert all(out.read_text() == "audio+tags" for out in outputs)
+
+
+def test_submit_wraps_errors(tmp_path):
+    """Test that failures surface as ConversionError."""
+    with ConversionScheduler(max_workers=1, metadata_processes=0) as scheduler:
+        future = scheduler.submit(
+            FakeConverter(fail=True), Path("in.flac"), tmp_path / "out.mp3"
+        )
+        with pytest.raises(ConversionError, match="encoder crashed"):
+            future.result()
+
+
+def test_submit_requires_context_manager(tmp_path):
+    """Test that submitting outside of a with block is rejected."""
+    with pytest.raises(RuntimeError):
+        ConversionScheduler().submit(FakeConverter(), Path("in.flac"), tmp_path)
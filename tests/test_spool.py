@@ -0,0 +1,171 @@
+import os
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from src.core.chunking import ChunkingOptions
+from src.core.converter import AudioConverter, SingleFileConverter
+from src.core.distributed import run_worker
+from src.core.encoders import OutputTarget, get_encoder
+from src.core.results import ConversionResult, ConversionStatus
+from src.core.spool import JobSpool
+from src.utils.enums import AudioFormat, ConversionBackend
+from src.utils.profiling import StageTimings
+
+
+def _spool(tmp_path, **kwargs):
+    return JobSpool.create(tmp_path / "spool", {"preset": "mp3-320"}, **kwargs)
+
+
+def test_jobs_are_claimed_once_in_order(tmp_path):
+    spool = _spool(tmp_path)
+    first = spool.enqueue(Path("a.flac"), Path("a.mp3"))
+    spool.enqueue(Path("b.flac"), Path("b.mp3"))
+    worker = JobSpool.open(tmp_path / "spool")
+
+    jobs = [worker.claim("w1"), worker.claim("w2"), worker.claim("w1")]
+
+    assert [job.source.name for job in jobs[:2]] == ["a.flac", "b.flac"]
+    assert jobs[2] is None
+    assert jobs[0].job_id == first
+    assert worker.converter_config == {"preset": "mp3-320"}
+
+    worker.complete(
+        jobs[0],
+        ConversionResult(
+            jobs[0].source,
+            jobs[0].output,
+            ConversionStatus.CONVERTED,
+            seconds=1.5,
+            timings=StageTimings(seconds={"encode": 1.0}, audio_seconds=3.0),
+        ),
+        "w1",
+    )
+    spool.close()
+    ((job_id, result),) = spool.collect()
+
+    assert job_id == first
+    assert result.status == ConversionStatus.CONVERTED
+    assert result.timings.audio_seconds == 3.0
+    assert list(spool.collect()) == []
+    assert not spool.drained()
+
+
+def test_expired_leases_are_reclaimed(tmp_path):
+    spool = _spool(tmp_path, lease_seconds=60, max_attempts=2)
+    spool.enqueue(Path("a.flac"), Path("a.mp3"))
+    spool.close()
+
+    job = spool.claim("crashed")
+    assert spool.reclaim_expired() == []
+    os.utime(job.path, (0, 0))
+    assert spool.reclaim_expired() == [job.job_id]
+
+    retry = spool.claim("alive")
+    assert (retry.job_id, retry.attempts) == (job.job_id, 2)
+    os.utime(retry.path, (0, 0))
+    spool.reclaim_expired()
+
+    # A job that keeps killing its workers is eventually given up on.
+    assert spool.claim("third") is None
+    ((_, result),) = spool.collect()
+    assert result.status == ConversionStatus.FAILED
+    assert "after 2 attempts" in result.error
+    assert spool.drained()
+
+
+def test_converter_config_round_trip(tmp_path):
+    converter = SingleFileConverter(
+        AudioFormat.AAC,
+        include_cover=False,
+        backend=ConversionBackend.FFMPEG,
+        preset="aac-256",
+        chunking=ChunkingOptions(600, 120),
+        extra_targets=[OutputTarget(get_encoder("mp3-v0"), tmp_path / "mp3")],
+        output_root=tmp_path / "out",
+        memory_budget=1 << 30,
+    )
+
+    restored = SingleFileConverter.from_config(converter.to_config())
+
+    assert restored.settings_key() == converter.settings_key()
+    assert restored.to_config() == converter.to_config()
+
+
+def _fake_transcode(self, input_path, output_path):
+    output_path.write_bytes(b"encoded " + input_path.read_bytes())
+    return StageTimings(seconds={"encode": 0.1})
+
+
+@pytest.mark.parametrize("max_queued", [1, 1024])
+def test_coordinator_and_workers_convert_a_library(tmp_path, max_queued):
+    input_dir = tmp_path / "in"
+    for name in ["a.flac", "b.flac", "c/d.flac"]:
+        path = input_dir / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(name.encode())
+    output_dir = tmp_path / "out"
+    spool_dir = tmp_path / "spool"
+    ran = []
+    queued = []
+    enqueue = JobSpool.enqueue
+
+    def counting_enqueue(spool, source, output):
+        queued.append(len(os.listdir(spool.pending)))
+        return enqueue(spool, source, output)
+
+    with patch(
+        "src.core.converter.SingleFileConverter.transcode", _fake_transcode
+    ), patch.object(JobSpool, "enqueue", counting_enqueue), patch(
+        "src.core.converter.SingleFileConverter.write_metadata",
+        return_value=StageTimings(audio_seconds=10.0),
+    ):
+        workers = [
+            threading.Thread(
+                target=lambda name=name: ran.append(
+                    run_worker(
+                        spool_dir,
+                        max_workers=2,
+                        metadata_processes=0,
+                        poll_interval=0.01,
+                        worker_id=name,
+                    )
+                )
+            )
+            for name in ("host-a", "host-b")
+        ]
+        for worker in workers:
+            worker.start()
+        converted = AudioConverter().convert_directory_distributed(
+            input_dir, spool_dir, output_dir, poll_interval=0.01, max_queued=max_queued
+        )
+        for worker in workers:
+            worker.join(timeout=10)
+
+    assert sorted(p.relative_to(output_dir).as_posix() for p in converted) == [
+        "a.mp3",
+        "b.mp3",
+        "c/d.mp3",
+    ]
+    assert (output_dir / "c/d.mp3").read_bytes() == b"encoded c/d.flac"
+    assert sum(ran) == 3
+    # The coordinator tops the queue up instead of queueing everything.
+    assert max(queued) < max_queued
+
+
+def test_worker_scheduler_follows_the_run_settings(tmp_path):
+    converter = SingleFileConverter(
+        AudioFormat.MP3, include_cover=False, memory_budget=512 << 20
+    )
+    spool = JobSpool.create(tmp_path / "spool", converter.to_config())
+    spool.close()
+
+    with patch("src.core.distributed.ConversionScheduler") as scheduler:
+        scheduler.return_value.max_workers = 4
+        run_worker(tmp_path / "spool", max_workers=4, max_encoders=2)
+
+    kwargs = scheduler.call_args.kwargs
+    assert (kwargs["max_workers"], kwargs["max_encoders"]) == (4, 2)
+    assert kwargs["memory"].budget == 512 << 20
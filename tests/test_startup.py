@@ -3,13 +3,52 @@ from unittest.mock import patch
 
 import pytest
 
-from src.utils.startup import check_ffmpeg
+from src.core.converter import AudioConverter
+from src.core.encoders import OutputTarget, get_encoder
+from src.utils.startup import check_ffmpeg, probe_ffmpeg
+
+VERSION = (
+    "ffmpeg version 6.1.1 Copyright (c) 2000-2023 the FFmpeg developers\n"
+    "configuration: --prefix=/usr --enable-gpl --enable-libmp3lame "
+    "--enable-libsoxr\n"
+)
+ENCODERS = """Encoders:
+ V..... = Video
+ A..... = Audio
+ ------
+ V....D libx264              libx264 H.264 / AVC / MPEG-4 AVC
+ A....D aac                  AAC (Advanced Audio Coding)
+ A....D libmp3lame           libmp3lame MP3 (MPEG audio layer 3) (codec mp3)
+"""
+FILTERS = """Filters:
+  T.. = Timeline support
+  A = Audio input/output
+ ... asplit            A->N       Pass on the audio input to N audio outputs.
+ T.. atrim             A->A       Pick one continuous section from the input.
+"""
+ERROR = "FFmpeg is not installed or not in PATH. Please install FFmpeg and try again."
+
+
+@pytest.fixture
+def ffmpeg(tmp_path, monkeypatch):
+    """A fake ffmpeg binary in PATH and an empty capability cache."""
+    binary = tmp_path / "bin" / "ffmpeg"
+    binary.parent.mkdir()
+    binary.write_bytes(b"")
+    monkeypatch.setenv("FLAC2APPLE_CACHE_DIR", str(tmp_path / "cache"))
+    with patch("src.utils.startup.shutil.which", return_value=str(binary)):
+        yield binary
+
+
+def _ffmpeg_output(command, **kwargs):
+    output = {"-version": VERSION, "-encoders": ENCODERS, "-filters": FILTERS}
+    return subprocess.CompletedProcess(command, 0, stdout=output[command[-1]])
 
 
 @pytest.mark.parametrize(
     "mock_run, expected_exit, expected_log",
     [
-        (None, False, False),  # FFmpeg installed
+        (_ffmpeg_output, False, False),  # FFmpeg installed
         (FileNotFoundError, True, True),  # FFmpeg not installed
         (
             subprocess.CalledProcessError(1, "ffmpeg"),
@@ -18,11 +57,11 @@ from src.utils.startup import check_ffmpeg
         ),  # FFmpeg command error
     ],
 )
-def test_check_ffmpeg(mock_run, expected_exit, expected_log):
+def test_check_ffmpeg(ffmpeg, mock_run, expected_exit, expected_log):
     """Test check_ffmpeg function with different scenarios."""
-    with patch(
-        "src.utils.startup.subprocess.run", side_effect=mock_run
-    ) as mock_subprocess_run, patch("src.utils.startup.logger") as mock_logger:
+    with patch("src.utils.startup.subprocess.run", side_effect=mock_run), patch(
+        "src.utils.startup.logger"
+    ) as mock_logger:
 
         if expected_exit:
             with pytest.raises(SystemExit):
@@ -31,54 +70,63 @@ def test_check_ffmpeg(mock_run, expected_exit, expected_log):
             check_ffmpeg()
 
         if expected_log:
-            mock_logger.error.assert_called_once_with(
-                "FFmpeg is not installed or not in PATH. Please install FFmpeg and try again."
-            )
+            mock_logger.error.assert_called_once_with(ERROR)
         else:
             mock_logger.error.assert_not_called()
 
 
-def test_ffmpeg_installed():
-    """Test when FFmpeg is installed and in PATH."""
-    with patch("src.utils.startup.subprocess.run") as mock_run, patch(
-        "src.utils.startup.logger"
-    ) as mock_logger:
-        check_ffmpeg()
-
-        mock_run.assert_called_once_with(
-            ["ffmpeg", "-version"], stdout=-3, stderr=-3, check=True
-        )
-        mock_logger.error.assert_not_called()
-
-
-def test_ffmpeg_not_installed():
+def test_ffmpeg_not_in_path():
     """Test when FFmpeg is not installed or not in PATH."""
-    with patch(
-        "src.utils.startup.subprocess.run", side_effect=FileNotFoundError
+    with patch("src.utils.startup.shutil.which", return_value=None), patch(
+        "src.utils.startup.subprocess.run"
     ) as mock_run, patch("src.utils.startup.logger") as mock_logger:
         with pytest.raises(SystemExit):
             check_ffmpeg()
 
-        mock_run.assert_called_once_with(
-            ["ffmpeg", "-version"], stdout=-3, stderr=-3, check=True
-        )
-        mock_logger.error.assert_called_once_with(
-            "FFmpeg is not installed or not in PATH. Please install FFmpeg and try again."
-        )
+        mock_run.assert_not_called()
+        mock_logger.error.assert_called_once_with(ERROR)
+
+
+def test_probe_records_version_encoders_and_filters(ffmpeg):
+    with patch("src.utils.startup.subprocess.run", side_effect=_ffmpeg_output):
+        capabilities = probe_ffmpeg()
+
+    assert capabilities.path == str(ffmpeg)
+    assert capabilities.version == "6.1.1"
+    assert capabilities.encoders == {"aac", "libmp3lame"}
+    assert capabilities.filters == {"asplit", "atrim"}
+    assert capabilities.libraries == {"libmp3lame", "libsoxr"}
 
 
-def test_ffmpeg_command_error():
-    """Test when FFmpeg command returns an error."""
+def test_probe_is_cached_until_the_binary_changes(ffmpeg):
     with patch(
-        "src.utils.startup.subprocess.run",
-        side_effect=subprocess.CalledProcessError(1, "ffmpeg"),
-    ) as mock_run, patch("src.utils.startup.logger") as mock_logger:
+        "src.utils.startup.subprocess.run", side_effect=_ffmpeg_output
+    ) as mock_run:
+        probe_ffmpeg()
+        assert mock_run.call_count == 3
+
+        # A new process only reads the cache.
+        with patch.dict("src.utils.startup._probed", clear=True):
+            assert probe_ffmpeg().version == "6.1.1"
+        assert mock_run.call_count == 3
+
+        ffmpeg.write_bytes(b"upgraded")
+        probe_ffmpeg()
+        assert mock_run.call_count == 6
+
+
+def test_missing_encoders_fail_fast(ffmpeg):
+    converter = AudioConverter(
+        preset="mp3-320",
+        split_cue=True,
+        extra_targets=[OutputTarget(get_encoder("alac"), ffmpeg.parent)],
+    )
+
+    with patch("src.utils.startup.subprocess.run", side_effect=_ffmpeg_output), patch(
+        "src.utils.startup.logger"
+    ) as mock_logger:
         with pytest.raises(SystemExit):
-            check_ffmpeg()
+            check_ffmpeg(*converter.ffmpeg_requirements())
 
-        mock_run.assert_called_once_with(
-            ["ffmpeg", "-version"], stdout=-3, stderr=-3, check=True
-        )
-        mock_logger.error.assert_called_once_with(
-            "FFmpeg is not installed or not in PATH. Please install FFmpeg and try again."
-        )
+    message = mock_logger.error.call_args[0][0]
+    assert "lacks alac" in message
@@ -0,0 +1,138 @@
+import threading
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from src.core.converter import AudioConverter
+from src.core.journal import JOURNAL_FILENAME
+from src.core.results import ConversionStatus
+from src.core.watcher import InotifyWatcher, PollingWatcher, SettledFiles
+from src.utils.profiling import StageTimings
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+def test_files_are_released_once_they_stop_changing(tmp_path):
+    path = tmp_path / "a.flac"
+    path.write_bytes(b"partial")
+    settled = SettledFiles(settle_seconds=2.0)
+
+    settled.touch(path, now=100.0)
+    assert settled.ready(now=101.0) == []
+
+    path.write_bytes(b"partial, still copying")
+    assert settled.ready(now=101.5) == []
+    assert settled.ready(now=103.0) == []
+    assert settled.ready(now=103.5) == [path]
+    assert len(settled) == 0
+
+
+def test_vanished_files_are_dropped(tmp_path):
+    path = tmp_path / "a.flac"
+    path.write_bytes(b"")
+    settled = SettledFiles(settle_seconds=0)
+    settled.touch(path)
+    path.unlink()
+
+    assert settled.ready() == []
+    assert len(settled) == 0
+
+
+def _collect(watcher, expected, timeout=5.0):
+    seen = set()
+    deadline = time.monotonic() + timeout
+    while not expected <= seen and time.monotonic() < deadline:
+        seen.update(watcher.changes(0.1))
+    return seen
+
+
+def test_inotify_sees_files_in_new_directories(tmp_path):
+    try:
+        watcher = InotifyWatcher(tmp_path, exclude=["skip"])
+    except (OSError, AttributeError):
+        pytest.skip("inotify is not available")
+    with watcher:
+        album = tmp_path / "Artist" / "Album"
+        album.mkdir(parents=True)
+        (album / "01.flac").write_bytes(b"one")
+        (album / "cover.jpg").write_bytes(b"")
+        (tmp_path / "skip").mkdir()
+        (tmp_path / "skip" / "02.flac").write_bytes(b"two")
+        (tmp_path / "03.flac").write_bytes(b"three")
+
+        seen = _collect(watcher, {album / "01.flac", tmp_path / "03.flac"})
+
+    assert seen == {album / "01.flac", tmp_path / "03.flac"}
+
+
+def test_polling_sees_new_and_changed_files(tmp_path):
+    existing = tmp_path / "old.flac"
+    existing.write_bytes(b"old")
+    with PollingWatcher(tmp_path, interval=0.05) as watcher:
+        (tmp_path / "new.flac").write_bytes(b"new")
+        existing.write_bytes(b"retagged")
+
+        seen = _collect(watcher, {existing, tmp_path / "new.flac"})
+
+    assert seen == {existing, tmp_path / "new.flac"}
+
+
+def _fake_transcode(self, input_path, output_path):
+    output_path.write_bytes(b"encoded " + input_path.read_bytes())
+    return StageTimings(seconds={"encode": 0.1})
+
+
+@pytest.mark.parametrize("poll_interval", [None, 0.05])
+def test_watch_converts_files_as_they_arrive(tmp_path, poll_interval):
+    input_dir = tmp_path / "in"
+    input_dir.mkdir()
+    (input_dir / "old.flac").write_bytes(b"old")
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    # Left by a daemon that was killed.
+    stale_partial = output_dir / ".gone.mp3.partial"
+    stale_partial.write_bytes(b"trunc")
+    results = []
+    stop = threading.Event()
+    converter = AudioConverter(incremental=True, num_threads=2, metadata_processes=0)
+
+    with patch(
+        "src.core.converter.SingleFileConverter.transcode", _fake_transcode
+    ), patch(
+        "src.core.converter.SingleFileConverter.write_metadata",
+        return_value=StageTimings(),
+    ):
+        watcher = threading.Thread(
+            target=converter.watch_directory,
+            args=(input_dir, output_dir),
+            kwargs=dict(
+                result_callback=results.append,
+                stop=stop,
+                settle_seconds=0.1,
+                poll_interval=poll_interval,
+            ),
+        )
+        watcher.start()
+        try:
+            _wait_for(lambda: len(results) == 1)
+            album = input_dir / "Album"
+            album.mkdir()
+            (album / "01.flac").write_bytes(b"new")
+            _wait_for(lambda: len(results) == 2)
+        finally:
+            stop.set()
+            watcher.join(timeout=5)
+
+    assert [r.status for r in results] == [ConversionStatus.CONVERTED] * 2
+    assert (output_dir / "Album" / "01.mp3").read_bytes() == b"encoded new"
+    assert not watcher.is_alive()
+    # The manifest records the daemon's files; no journal piles up.
+    assert not (output_dir / JOURNAL_FILENAME).exists()
+    assert not stale_partial.exists()